@@ -0,0 +1,490 @@
+import asyncio
+import os
+import sys
+import time
+
+import boto3
+from botocore import xform_name
+from botocore.exceptions import ClientError, WaiterError
+
+from events import EVENTS
+from lab_layout import (
+    APP_INGRESS_RULES, DB_INGRESS_RULES, DEFAULT_UBUNTU_AMI, DEFAULT_WINDOWS_AMI, MAX_FLEET_SIZE, ROUTE_TABLE_LAYOUT,
+    RUN_ID_TAG, SUBNET_LAYOUT, launch_params, placement_group_names, read_user_data, subnet_cidr, subnet_name
+)
+from rate_limiter import AsyncEC2RateLimiter
+
+try:
+    from aiobotocore.session import get_session
+except ImportError:
+    get_session = None
+
+RETRY_DELAY = 5
+MAX_RETRIES = 5
+
+# Instance key -> (name prefix, role, AZ key, subnet key), as in main.create_all_instances
+INSTANCE_LAYOUT = {
+    'app_az1': ('polystudent-ec2', 'app', 'az1', 'public_az1'),
+    'app_az2': ('polystudent-app-az2', 'app', 'az2', 'public_az2'),
+    'db_az1': ('polystudent-db-az1', 'db', 'az1', 'private_az1'),
+    'db_az2': ('polystudent-db-az2', 'db', 'az2', 'private_az2'),
+}
+
+
+class Run:
+    """Run ID stamped on every resource, and the caller's callback recording each one in its manifest"""
+
+    def __init__(self, run_id: str, record):
+        self.run_id = run_id
+        self.record = record
+
+    def tags(self, tags: list) -> list:
+        return tags + [{'Key': RUN_ID_TAG, 'Value': self.run_id}]
+
+
+class AsyncEC2:
+    """EC2 client for asyncio: native with aiobotocore, otherwise boto3 calls on worker threads"""
+
+    def __init__(self, region: str, max_concurrency: int = 64, limiter: AsyncEC2RateLimiter | None = None):
+        self.region = region
+        # Bounds requests in flight; waiters release it between polls
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.limiter = limiter or AsyncEC2RateLimiter()
+        self.native = get_session is not None
+        self.client = None
+        self._context = None
+
+    async def __aenter__(self):
+        credentials = {
+            'aws_access_key_id': os.getenv('AWS_ACCESS_KEY_ID'),
+            'aws_secret_access_key': os.getenv('AWS_SECRET_ACCESS_KEY'),
+            'aws_session_token': os.getenv('AWS_SESSION_TOKEN'),
+            'region_name': self.region,
+        }
+        if self.native:
+            self._context = get_session().create_client('ec2', **credentials)
+            self.client = await self._context.__aenter__()
+        else:
+            self.client = boto3.client('ec2', **credentials)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._context is not None:
+            await self._context.__aexit__(*exc_info)
+
+    async def call(self, method: str, **params) -> dict:
+        await self.limiter.acquire(self.client.meta.method_to_api_mapping[method], params)
+        async with self.semaphore:
+            if self.native:
+                return await getattr(self.client, method)(**params)
+            return await asyncio.to_thread(getattr(self.client, method), **params)
+
+    def __getattr__(self, method: str):
+        # ec2.create_subnet(...) is await-able like the aiobotocore client
+        if method.startswith('_'):
+            raise AttributeError(method)
+        return lambda **params: self.call(method, **params)
+
+    async def paginate(self, method: str, key: str, **params) -> list:
+        items = []
+        while True:
+            response = await self.call(method, **params)
+            items.extend(response[key])
+            if not response.get('NextToken'):
+                return items
+            params['NextToken'] = response['NextToken']
+
+    async def wait(self, waiter_name: str, **params) -> dict:
+        """Poll with the botocore waiter definition, sleeping on the event loop between attempts"""
+        config = self.client.get_waiter(waiter_name).config
+        method = xform_name(config.operation)
+        response = {}
+        for attempt in range(config.max_attempts):
+            try:
+                response = await self.call(method, **params)
+            except ClientError as e:
+                response = e.response
+
+            state = None
+            for acceptor in config.acceptors:
+                if acceptor.matcher_func(response):
+                    state = acceptor.state
+                    break
+
+            if state == 'success':
+                return response
+            if state == 'failure' or ('Error' in response and state != 'retry'):
+                raise WaiterError(name=waiter_name, reason='waiter reached a failure state', last_response=response)
+            if attempt < config.max_attempts - 1:
+                await asyncio.sleep(config.delay)
+
+        raise WaiterError(name=waiter_name, reason='max attempts exceeded', last_response=response)
+
+
+"""
+    Provisioning
+"""
+async def gather_all(*calls):
+    """asyncio.gather that lets every call finish before raising the first error
+
+    A plain gather returns on the first error and leaves the other calls to be cancelled,
+    so resources they already created would never reach the manifest.
+    """
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+async def create_subnet(ec2: AsyncEC2, run: Run, vpc_id: str, cidr_block: str, availability_zone: str, subnet_name: str, is_public: bool) -> str:
+    response = await ec2.create_subnet(
+        VpcId=vpc_id,
+        CidrBlock=cidr_block,
+        AvailabilityZone=availability_zone,
+        TagSpecifications=[{
+            'ResourceType': 'subnet',
+            'Tags': run.tags([
+                {'Key': 'Name', 'Value': subnet_name},
+                {'Key': 'Type', 'Value': 'Public' if is_public else 'Private'}
+            ])
+        }]
+    )
+    subnet_id = response['Subnet']['SubnetId']
+    run.record('subnet', subnet_id)
+    if is_public:
+        await ec2.modify_subnet_attribute(SubnetId=subnet_id, MapPublicIpOnLaunch={'Value': True})
+    EVENTS.emit('create', 'subnet', subnet_id, subnet_name, detail=cidr_block)
+    return subnet_id
+
+
+async def create_all_subnets(ec2: AsyncEC2, run: Run, vpc_id: str, lab_index: int = 0, suffix: str = '') -> dict:
+    subnet_ids = await gather_all(*(
+        create_subnet(
+            ec2, run, vpc_id, subnet_cidr(third_octet, lab_index), f'{ec2.region}{zone}', subnet_name(key, suffix), is_public
+        )
+        for key, (third_octet, zone, is_public) in SUBNET_LAYOUT.items()
+    ))
+    return dict(zip(SUBNET_LAYOUT, subnet_ids))
+
+
+async def create_internet_gateway(ec2: AsyncEC2, run: Run, vpc_id: str, igw_name: str = 'polystudentlab-igw') -> str:
+    response = await ec2.create_internet_gateway(TagSpecifications=[{
+        'ResourceType': 'internet-gateway',
+        'Tags': run.tags([{'Key': 'Name', 'Value': igw_name}])
+    }])
+    igw_id = response['InternetGateway']['InternetGatewayId']
+    run.record('internet-gateway', igw_id)
+    await ec2.attach_internet_gateway(InternetGatewayId=igw_id, VpcId=vpc_id)
+    EVENTS.emit('create', 'internet-gateway', igw_id, igw_name, detail=f'attached to {vpc_id}')
+    return igw_id
+
+
+async def create_route_table(ec2: AsyncEC2, run: Run, vpc_id: str, igw_id: str, subnets: dict, layout: dict, suffix: str) -> str:
+    rt_name = f"{layout['name']}{suffix}"
+    response = await ec2.create_route_table(VpcId=vpc_id, TagSpecifications=[{
+        'ResourceType': 'route-table',
+        'Tags': run.tags([{'Key': 'Name', 'Value': rt_name}])
+    }])
+    rt_id = response['RouteTable']['RouteTableId']
+    run.record('route-table', rt_id)
+
+    calls = [ec2.associate_route_table(RouteTableId=rt_id, SubnetId=subnets[key]) for key in layout['subnets']]
+    if layout['internet']:
+        calls.append(ec2.create_route(RouteTableId=rt_id, DestinationCidrBlock='0.0.0.0/0', GatewayId=igw_id))
+    for response in await gather_all(*calls):
+        if 'AssociationId' in response:
+            run.record('route-table-association', response['AssociationId'])
+    EVENTS.emit('create', 'route-table', rt_id, rt_name)
+    return rt_id
+
+
+async def create_security_group(ec2: AsyncEC2, run: Run, vpc_id: str, sg_name: str, description: str, sg_type: str, permissions: list) -> str:
+    response = await ec2.create_security_group(
+        GroupName=sg_name,
+        Description=description,
+        VpcId=vpc_id,
+        TagSpecifications=[{
+            'ResourceType': 'security-group',
+            'Tags': run.tags([{'Key': 'Name', 'Value': sg_name}, {'Key': 'Type', 'Value': sg_type}])
+        }]
+    )
+    sg_id = response['GroupId']
+    run.record('security-group', sg_id)
+    await gather_all(*(
+        ec2.authorize_security_group_ingress(GroupId=sg_id, IpPermissions=[permission]) for permission in permissions
+    ))
+    EVENTS.emit('create', 'security-group', sg_id, sg_name, detail=f'{len(permissions)} ingress rule(s)')
+    return sg_id
+
+
+async def create_security_groups(ec2: AsyncEC2, run: Run, vpc_id: str, suffix: str = '') -> dict:
+    app_sg_id = await create_security_group(
+        ec2, run, vpc_id, f'polystudentlab-app-sg{suffix}',
+        'Security group for App servers - allows SSH, HTTP, HTTPS, OSSEC, and Elasticsearch', 'App-Server',
+        [{
+            'IpProtocol': rule['IpProtocol'], 'FromPort': rule['FromPort'], 'ToPort': rule['ToPort'],
+            'IpRanges': [{'CidrIp': rule['CidrIp'], 'Description': rule['Description']}]
+        } for rule in APP_INGRESS_RULES]
+    )
+    db_sg_id = await create_security_group(
+        ec2, run, vpc_id, f'polystudentlab-db-sg{suffix}',
+        'Security group for DB servers - only accessible from App servers', 'DB-Server',
+        [{
+            'IpProtocol': rule['IpProtocol'], 'FromPort': rule['FromPort'], 'ToPort': rule['ToPort'],
+            'UserIdGroupPairs': [{'GroupId': app_sg_id, 'Description': rule['Description']}]
+        } for rule in DB_INGRESS_RULES]
+    )
+    return {'app': app_sg_id, 'db': db_sg_id}
+
+
+async def create_placement_group(ec2: AsyncEC2, run: Run, group_name: str, strategy: str) -> str:
+    try:
+        await ec2.create_placement_group(GroupName=group_name, Strategy=strategy, TagSpecifications=[{
+            'ResourceType': 'placement-group',
+            'Tags': run.tags([{'Key': 'Name', 'Value': group_name}])
+        }])
+        # Placement groups are addressed by name, so the manifest records names
+        run.record('placement-group', group_name)
+        detail = strategy
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'InvalidPlacementGroup.Duplicate':
+            raise
+        detail = 'already exists, reusing it'
+    EVENTS.emit('create', 'placement-group', name=group_name, detail=detail)
+    return group_name
+
+
+async def create_placement_groups(ec2: AsyncEC2, run: Run, role: str, profile: dict, suffix: str = '') -> dict:
+    """Placement group name per AZ key for a role, as in main.placement_groups"""
+    group_names = placement_group_names(role, profile['placement'], run.run_id, suffix)
+    await gather_all(*(
+        create_placement_group(ec2, run, group_name, profile['placement']) for group_name in dict.fromkeys(group_names.values())
+    ))
+    return group_names
+
+
+async def run_instance(ec2: AsyncEC2, run: Run, instance_name: str, role: str, subnet_id: str, security_group_id: str, ami_id: str, key_name: str, profile: dict, placement_group: str | None) -> str:
+    response = await ec2.run_instances(
+        **launch_params(ami_id, key_name, subnet_id, security_group_id, profile, placement_group),
+        UserData=read_user_data('app-server.tpl' if role == 'app' else 'db-server.tpl'),
+        TagSpecifications=[{
+            'ResourceType': 'instance',
+            'Tags': run.tags([
+                {'Key': 'Name', 'Value': instance_name},
+                {'Key': 'Type', 'Value': 'App-Server' if role == 'app' else 'DB-Server'}
+            ])
+        }]
+    )
+    instance_id = response['Instances'][0]['InstanceId']
+    run.record('instance', instance_id)
+    EVENTS.emit('launch', 'instance', instance_id, instance_name)
+    return instance_id
+
+
+async def create_all_instances(ec2: AsyncEC2, run: Run, subnets: dict, security_groups: dict, key_name: str, profiles: dict, placement: dict, suffix: str = '', ubuntu_ami: str = DEFAULT_UBUNTU_AMI, windows_ami: str = DEFAULT_WINDOWS_AMI) -> dict:
+    amis = {'app': ubuntu_ami, 'db': windows_ami}
+    instance_ids = await gather_all(*(
+        run_instance(
+            ec2, run, f'{name}{suffix}', role, subnets[subnet_key], security_groups[role], amis[role],
+            key_name, profiles[role], placement[role].get(az)
+        )
+        for name, role, az, subnet_key in INSTANCE_LAYOUT.values()
+    ))
+
+    # One waiter polls all four instances with a single describe per attempt
+    with EVENTS.timed('wait', 'instance', ', '.join(instance_ids)) as event:
+        await ec2.wait('instance_running', InstanceIds=instance_ids)
+        event['detail'] = 'running'
+    return dict(zip(INSTANCE_LAYOUT, instance_ids))
+
+
+async def provision_lab(ec2: AsyncEC2, run: Run, vpc_id: str, igw_id: str, key_name: str, lab_index: int, suffix: str, profiles: dict, **amis) -> dict:
+    subnets = await create_all_subnets(ec2, run, vpc_id, lab_index, suffix)
+    route_tables, security_groups, placement = await gather_all(
+        gather_all(*(
+            create_route_table(ec2, run, vpc_id, igw_id, subnets, layout, suffix) for layout in ROUTE_TABLE_LAYOUT.values()
+        )),
+        create_security_groups(ec2, run, vpc_id, suffix),
+        gather_all(*(create_placement_groups(ec2, run, role, profile, suffix) for role, profile in profiles.items())),
+    )
+    placement = dict(zip(profiles, placement))
+    instances = await create_all_instances(ec2, run, subnets, security_groups, key_name, profiles, placement, suffix, **amis)
+    return {
+        'subnets': subnets,
+        'route_tables': dict(zip(ROUTE_TABLE_LAYOUT, route_tables)),
+        'security_groups': security_groups,
+        'instances': instances,
+    }
+
+
+async def provision_fleet(client, run: Run, vpc_id: str, key_name: str, fleet_size: int, profiles: dict, max_concurrency: int = 64, **amis) -> dict:
+    """Provision every lab on one event loop; fleet_size 1 uses the unsuffixed names of main.py
+
+    client is the caller's boto3 EC2 client (for its region), profiles the validated settings per role.
+    """
+    if fleet_size > MAX_FLEET_SIZE:
+        EVENTS.log(f'fleet size {fleet_size} exceeds the {MAX_FLEET_SIZE} CIDR slices available', 'error')
+        EVENTS.flush()
+        sys.exit(1)
+
+    async with AsyncEC2(client.meta.region_name, max_concurrency) as ec2:
+        EVENTS.log(f"provisioning {fleet_size} lab(s) with asyncio ({'aiobotocore' if ec2.native else 'boto3 threads'}), "
+              f'up to {max_concurrency} requests in flight')
+        igw_id = await create_internet_gateway(ec2, run, vpc_id)
+        suffixes = [f'-lab{i:02d}' for i in range(fleet_size)] if fleet_size > 1 else ['']
+        results = await asyncio.gather(
+            *(provision_lab(ec2, run, vpc_id, igw_id, key_name, i, suffix, profiles, **amis) for i, suffix in enumerate(suffixes)),
+            return_exceptions=True
+        )
+        calls = ec2.limiter.calls
+
+    labs = {}
+    failed = []
+    for lab_index, result in enumerate(results):
+        if isinstance(result, BaseException):
+            failed.append(lab_index)
+            EVENTS.log(f'lab {lab_index} failed: {result!r}', 'error')
+        else:
+            labs[lab_index] = result
+
+    EVENTS.log(f'fleet provisioned: {len(labs)} succeeded, {len(failed)} failed')
+    EVENTS.log(f'API calls by throttling bucket: {calls}')
+    if failed:
+        sys.exit(1)
+    return labs
+
+
+"""
+    Teardown
+"""
+async def delete_all(label: str, ids: list[str], delete, max_retries: int = MAX_RETRIES, retry_delay: float = RETRY_DELAY) -> int:
+    """Delete resources concurrently, retrying dependency errors and treating missing ones as done"""
+    remaining = list(ids)
+    deleted_count = 0
+
+    resource = label.replace(' ', '-')
+
+    async def attempt(resource_id: str):
+        start = time.monotonic()
+        try:
+            await delete(resource_id)
+            EVENTS.emit('delete', resource, resource_id, duration=time.monotonic() - start)
+            return 'deleted'
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if 'NotFound' in code or 'NotAssociated' in code:
+                return 'gone'
+            if code == 'DependencyViolation':
+                EVENTS.emit('delete', resource, resource_id, outcome='retry', detail='has dependencies')
+                return 'blocked'
+            EVENTS.emit('delete', resource, resource_id, outcome='error', detail=str(e))
+            return 'failed'
+
+    for retry in range(max_retries):
+        outcomes = await asyncio.gather(*(attempt(resource_id) for resource_id in remaining))
+        deleted_count += outcomes.count('deleted')
+        remaining = [resource_id for resource_id, outcome in zip(remaining, outcomes) if outcome == 'blocked']
+        if not remaining:
+            break
+        if retry < max_retries - 1:
+            await asyncio.sleep(retry_delay)
+
+    if remaining:
+        EVENTS.log(f'warning: {len(remaining)} {label}(s) could not be deleted', 'warning')
+    return deleted_count
+
+
+async def cleanup_vpc(ec2: AsyncEC2, vpc_id: str) -> dict:
+    """Async counterpart of cleanup.cleanup_vpc; independent deletions of a step run concurrently"""
+    vpc_filter = [{'Name': 'vpc-id', 'Values': [vpc_id]}]
+    counts = {}
+
+    reservations = await ec2.paginate('describe_instances', 'Reservations', Filters=vpc_filter + [
+        {'Name': 'instance-state-name', 'Values': ['running', 'stopped', 'pending', 'stopping']}
+    ])
+    instance_ids = [instance['InstanceId'] for reservation in reservations for instance in reservation['Instances']]
+    if instance_ids:
+        with EVENTS.timed('terminate', 'instance', name=vpc_id) as event:
+            await ec2.terminate_instances(InstanceIds=instance_ids)
+            await ec2.wait('instance_terminated', InstanceIds=instance_ids)
+            event['detail'] = f'{len(instance_ids)} instance(s)'
+    counts['instances'] = len(instance_ids)
+
+    # Placement groups are not part of the VPC; they are found by the RunId tags of its subnets
+    subnets = await ec2.paginate('describe_subnets', 'Subnets', Filters=vpc_filter)
+    run_ids = sorted({tag['Value'] for subnet in subnets for tag in subnet.get('Tags', []) if tag['Key'] == RUN_ID_TAG})
+    placement = (await ec2.describe_placement_groups(
+        Filters=[{'Name': f'tag:{RUN_ID_TAG}', 'Values': run_ids}]
+    ))['PlacementGroups'] if run_ids else []
+    counts['placement_groups'] = await delete_all(
+        'placement group', [pg['GroupName'] for pg in placement],
+        lambda group_name: ec2.delete_placement_group(GroupName=group_name)
+    )
+
+    interfaces = await ec2.paginate('describe_network_interfaces', 'NetworkInterfaces', Filters=vpc_filter)
+    attached = [eni for eni in interfaces if eni.get('Attachment', {}).get('AttachmentId')]
+    await asyncio.gather(*(
+        ec2.detach_network_interface(AttachmentId=eni['Attachment']['AttachmentId'], Force=True) for eni in attached
+    ), return_exceptions=True)
+    counts['network_interfaces'] = await delete_all(
+        'network interface', [eni['NetworkInterfaceId'] for eni in interfaces],
+        lambda eni_id: ec2.delete_network_interface(NetworkInterfaceId=eni_id)
+    )
+
+    groups = await ec2.paginate('describe_security_groups', 'SecurityGroups', Filters=vpc_filter)
+    counts['security_groups'] = await delete_all(
+        'security group', [sg['GroupId'] for sg in groups if sg['GroupName'] != 'default'],
+        lambda sg_id: ec2.delete_security_group(GroupId=sg_id), retry_delay=3
+    )
+
+    async def delete_igw(igw_id: str):
+        await ec2.detach_internet_gateway(InternetGatewayId=igw_id, VpcId=vpc_id)
+        await ec2.delete_internet_gateway(InternetGatewayId=igw_id)
+
+    gateways = await ec2.paginate('describe_internet_gateways', 'InternetGateways', Filters=[
+        {'Name': 'attachment.vpc-id', 'Values': [vpc_id]}
+    ])
+    counts['internet_gateways'] = await delete_all('internet gateway', [igw['InternetGatewayId'] for igw in gateways], delete_igw)
+
+    tables = await ec2.paginate('describe_route_tables', 'RouteTables', Filters=vpc_filter)
+    tables = [rt for rt in tables if not any(assoc.get('Main', False) for assoc in rt.get('Associations', []))]
+    await asyncio.gather(*(
+        ec2.disassociate_route_table(AssociationId=assoc['RouteTableAssociationId'])
+        for rt in tables for assoc in rt.get('Associations', [])
+    ), return_exceptions=True)
+    counts['route_tables'] = await delete_all(
+        'route table', [rt['RouteTableId'] for rt in tables],
+        lambda rt_id: ec2.delete_route_table(RouteTableId=rt_id)
+    )
+
+    subnets = await ec2.paginate('describe_subnets', 'Subnets', Filters=vpc_filter)
+    counts['subnets'] = await delete_all(
+        'subnet', [subnet['SubnetId'] for subnet in subnets],
+        lambda subnet_id: ec2.delete_subnet(SubnetId=subnet_id)
+    )
+    return counts
+
+
+async def cleanup_all(targets: list[tuple[str, str]], max_concurrency: int = 64) -> dict:
+    """Tear down every (region, vpc_id) target on one event loop, one client and rate limiter per region"""
+    results = {}
+    clients = {}
+    try:
+        for region in {region for region, _ in targets}:
+            clients[region] = await AsyncEC2(region, max_concurrency).__aenter__()
+
+        async def run(region: str, vpc_id: str):
+            start = time.time()
+            try:
+                counts = await cleanup_vpc(clients[region], vpc_id)
+                results[(region, vpc_id)] = {'status': 'ok', 'duration': time.time() - start, **counts}
+            except Exception as e:
+                results[(region, vpc_id)] = {'status': f'failed: {e}', 'duration': time.time() - start}
+            EVENTS.log(f"[{len(results)}/{len(targets)}] {region} {vpc_id}: {results[(region, vpc_id)]['status']}")
+
+        await asyncio.gather(*(run(region, vpc_id) for region, vpc_id in targets))
+    finally:
+        for client in clients.values():
+            await client.__aexit__(None, None, None)
+    return results
@@ -1,11 +1,22 @@
+import argparse
 import boto3
 import configparser
+import json
 import sys
 import os
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from describe_cache import DescribeCache
+from events import EVENTS, JsonLinesSink, LogFileSink
+from rate_limiter import EC2RateLimiter
 
 EC2_CLIENT = None
 
+DEFAULT_VPC_ID = 'vpc-0bdc139fd9ee529cc'
+DEFAULT_REGION = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+RUN_ID_TAG = 'RunId'
+FILTER_VALUES_LIMIT = 200
+
 def verify_aws_credentials():
     print('- verifying aws credentials')
     
@@ -66,7 +77,7 @@ def set_clients():
             aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
             aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
             aws_session_token=os.getenv('AWS_SESSION_TOKEN'),
-            region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+            region_name=DEFAULT_REGION
         )
         print('- boto3 client ready')
     except Exception as e:
@@ -74,15 +85,30 @@ def set_clients():
         sys.exit(1)
 
 
-def get_vpc_id(vpc_identifier: str):
+def make_client(region: str, describe_cache: bool = True):
+    """Create an EC2 client for a region with its own rate limiter, as throttling is per region"""
+    client = boto3.client(
+        'ec2',
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        aws_session_token=os.getenv('AWS_SESSION_TOKEN'),
+        region_name=region
+    )
+    if describe_cache:
+        DescribeCache().install(client)
+    return EC2RateLimiter().install(client)
+
+
+def get_vpc_id(vpc_identifier: str, client=None):
     """Find VPC by ID or name"""
+    client = client or EC2_CLIENT
     try:
         if vpc_identifier.startswith('vpc-'):
-            response = EC2_CLIENT.describe_vpcs(VpcIds=[vpc_identifier])
+            response = client.describe_vpcs(VpcIds=[vpc_identifier])
             if response['Vpcs']:
                 return response['Vpcs'][0]['VpcId']
         
-        response = EC2_CLIENT.describe_vpcs(
+        response = client.describe_vpcs(
             Filters=[{'Name': 'tag:Name', 'Values': [vpc_identifier]}]
         )
         if response['Vpcs']:
@@ -90,15 +116,51 @@ def get_vpc_id(vpc_identifier: str):
         
         return None
     except Exception as e:
-        print(f'- error finding VPC: {e}')
+        EVENTS.log(f'error finding VPC: {e}', 'error')
         return None
 
 
-def terminate_instances(vpc_id: str):
-    """Terminate all EC2 instances in the VPC"""
-    print('\n- Terminating EC2 instances...')
+def find_vpcs(identifiers: list[str], tag_filters: list[str], client=None) -> dict:
+    """Find VPCs by ID, Name tag or Key=Value tag filter, returning {vpc_id: name}"""
+    client = client or EC2_CLIENT
+    requests = []
+
+    vpc_ids = [i for i in identifiers if i.startswith('vpc-')]
+    names = [i for i in identifiers if not i.startswith('vpc-')]
+    if vpc_ids:
+        requests.append([{'Name': 'vpc-id', 'Values': vpc_ids}])
+    if names:
+        requests.append([{'Name': 'tag:Name', 'Values': names}])
+    if tag_filters:
+        filters = []
+        for tag_filter in tag_filters:
+            key, _, value = tag_filter.partition('=')
+            filters.append({'Name': f'tag:{key}', 'Values': [value]} if value else {'Name': 'tag-key', 'Values': [key]})
+        requests.append(filters)
+
+    vpcs = {}
+    for filters in requests:
+        try:
+            for page in client.get_paginator('describe_vpcs').paginate(Filters=filters):
+                for vpc in page['Vpcs']:
+                    name = 'N/A'
+                    for tag in vpc.get('Tags', []):
+                        if tag['Key'] == 'Name':
+                            name = tag['Value']
+                            break
+                    vpcs[vpc['VpcId']] = name
+        except Exception as e:
+            EVENTS.log(f'error finding VPCs: {e}', 'error')
+
+    return vpcs
+
+
+def terminate_instances(vpc_id: str, client=None) -> list[str]:
+    """Terminate all EC2 instances in the VPC and return the IDs of those terminated"""
+    client = client or EC2_CLIENT
+    EVENTS.log(f'terminating EC2 instances in {vpc_id}')
     try:
-        response = EC2_CLIENT.describe_instances(
+        response = client.describe_instances(
             Filters=[
                 {'Name': 'vpc-id', 'Values': [vpc_id]},
                 {'Name': 'instance-state-name', 'Values': ['running', 'stopped', 'pending', 'stopping']}
@@ -114,99 +176,194 @@ def terminate_instances(vpc_id: str):
                     if tag['Key'] == 'Name':
                         instance_name = tag['Value']
                         break
-                print(f"  - Found instance: {instance['InstanceId']} ({instance_name})")
+                EVENTS.emit('describe', 'instance', instance['InstanceId'], instance_name, detail='found')
         
         if instance_ids:
-            EC2_CLIENT.terminate_instances(InstanceIds=instance_ids)
-            print(f'  - Terminating {len(instance_ids)} instance(s)...')
+            with EVENTS.timed('terminate', 'instance', name=vpc_id) as event:
+                client.terminate_instances(InstanceIds=instance_ids)
+                event['detail'] = f'{len(instance_ids)} instance(s)'
             
-            waiter = EC2_CLIENT.get_waiter('instance_terminated')
-            print('  - Waiting for instances to terminate...')
-            waiter.wait(InstanceIds=instance_ids)
-            print('  - All instances terminated')
+            with EVENTS.timed('wait', 'instance', name=vpc_id) as event:
+                waiter = client.get_waiter('instance_terminated')
+                waiter.wait(InstanceIds=instance_ids)
+                event['detail'] = 'all terminated'
             
-            print('  - Waiting for network interfaces to detach...')
+            # Give the network interfaces time to detach
             time.sleep(10)
         else:
-            print('  - No instances to terminate')
+            EVENTS.log(f'no instances to terminate in {vpc_id}')
+
+        return instance_ids
             
     except Exception as e:
-        print(f'Error terminating instances: {e}')
+        EVENTS.log(f'error terminating instances: {e}', 'error')
+        return []
 
 
-def delete_network_interfaces(vpc_id: str):
-    """Delete all detached network interfaces in the VPC"""
-    print('\n- Deleting network interfaces...')
-    
-    max_retries = 5
-    retry_delay = 5
-    
-    for attempt in range(max_retries):
+def delete_network_interfaces(vpc_id: str, client=None, subnet_ids: list[str] | None = None, terminated=(),
+                              max_workers: int = 16, poll_interval: float = 2, timeout: float = 600) -> int:
+    """Delete all network interfaces in the VPC, or only those in the given subnets
+
+    Every detach is sent at once, then the detaching set is tracked with one describe per tick
+    filtered by the pending IDs; each interface is deleted as soon as it becomes available.
+    terminated holds the instances this teardown terminated: only their primary interfaces are waited for.
+    """
+    client = client or EC2_CLIENT
+    if subnet_ids:
+        # One describe per chunk of subnets, as a filter takes at most FILTER_VALUES_LIMIT values
+        filter_sets = [
+            [{'Name': 'subnet-id', 'Values': subnet_ids[i:i + FILTER_VALUES_LIMIT]}]
+            for i in range(0, len(subnet_ids), FILTER_VALUES_LIMIT)
+        ]
+    else:
+        filter_sets = [[{'Name': 'vpc-id', 'Values': [vpc_id]}]]
+    EVENTS.log(f'deleting network interfaces in {vpc_id}')
+
+    try:
+        interfaces = [
+            ni for filters in filter_sets
+            for page in client.get_paginator('describe_network_interfaces').paginate(Filters=filters)
+            for ni in page['NetworkInterfaces']
+        ]
+    except Exception as e:
+        EVENTS.log(f'error listing network interfaces: {e}', 'error')
+        return 0
+
+    if not interfaces:
+        EVENTS.log(f'no network interfaces to delete in {vpc_id}')
+        return 0
+
+    def detach(ni_id: str, attachment_id: str) -> str:
+        start = time.monotonic()
         try:
-            response = EC2_CLIENT.describe_network_interfaces(
-                Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}]
-            )
-            
-            if not response['NetworkInterfaces']:
-                print('  - No network interfaces to delete')
-                return
-            
-            deleted_count = 0
-            for ni in response['NetworkInterfaces']:
-                ni_id = ni['NetworkInterfaceId']
-                
-                if ni.get('Attachment'):
-                    attachment_id = ni['Attachment'].get('AttachmentId')
-                    if attachment_id:
-                        try:
-                            EC2_CLIENT.detach_network_interface(
-                                AttachmentId=attachment_id,
-                                Force=True
-                            )
-                            print(f"  - Detached network interface: {ni_id}")
-                            time.sleep(2)
-                        except Exception as e:
-                            print(f"  - Could not detach {ni_id}: {e}")
-                            continue
-                
-                try:
-                    EC2_CLIENT.delete_network_interface(NetworkInterfaceId=ni_id)
-                    print(f"  - Deleted network interface: {ni_id}")
-                    deleted_count += 1
-                except Exception as e:
-                    if 'InvalidNetworkInterfaceID.NotFound' not in str(e):
-                        print(f"  - Could not delete {ni_id}: {e}")
-            
-            if deleted_count == 0 and attempt < max_retries - 1:
-                print(f'  - Waiting {retry_delay}s before retry...')
-                time.sleep(retry_delay)
-            elif deleted_count > 0:
-                print(f'  - Deleted {deleted_count} network interface(s)')
-                if attempt < max_retries - 1:
-                    time.sleep(3)
-                    
+            client.detach_network_interface(AttachmentId=attachment_id, Force=True)
+            EVENTS.emit('detach', 'network-interface', ni_id, duration=time.monotonic() - start)
+            return 'detaching'
         except Exception as e:
-            print(f'Error managing network interfaces: {e}')
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
+            if 'InvalidAttachmentID.NotFound' in str(e):
+                return 'detaching'
+            EVENTS.emit('detach', 'network-interface', ni_id, outcome='error', detail=str(e))
+            return 'failed'
+
+    def delete(ni_id: str) -> str:
+        start = time.monotonic()
+        try:
+            client.delete_network_interface(NetworkInterfaceId=ni_id)
+            EVENTS.emit('delete', 'network-interface', ni_id, duration=time.monotonic() - start)
+            return 'deleted'
+        except Exception as e:
+            if 'InvalidNetworkInterfaceID.NotFound' in str(e):
+                return 'gone'
+            if 'InvalidNetworkInterface.InUse' in str(e) or 'is currently in use' in str(e):
+                # Described as available before the detachment fully settled
+                return 'in-use'
+            EVENTS.emit('delete', 'network-interface', ni_id, outcome='error', detail=str(e))
+            return 'failed'
+
+    def describe_pending(pending: set[str]) -> dict[str, str]:
+        """Status of each pending interface that still exists"""
+        ids = sorted(pending)
+        statuses = {}
+        for i in range(0, len(ids), FILTER_VALUES_LIMIT):
+            chunk = [{'Name': 'network-interface-id', 'Values': ids[i:i + FILTER_VALUES_LIMIT]}]
+            for page in client.get_paginator('describe_network_interfaces').paginate(Filters=chunk):
+                for ni in page['NetworkInterfaces']:
+                    statuses[ni['NetworkInterfaceId']] = ni['Status']
+        return statuses
 
+    deleted_count = 0
+    skipped = 0
+    pending: set[str] = set()
+    terminated = set(terminated)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for ni in interfaces:
+            ni_id = ni['NetworkInterfaceId']
+            attachment = ni.get('Attachment') or {}
+            if ni['Status'] == 'available':
+                futures[executor.submit(delete, ni_id)] = ni_id
+                continue
+            # Interfaces managed by another service (Lambda, load balancers) are only released by it,
+            # and primary interfaces only with their instance: waiting for those would last until the timeout
+            if ni.get('RequesterManaged'):
+                EVENTS.emit('delete', 'network-interface', ni_id, outcome='skipped', detail=f"managed by {ni.get('RequesterId', 'another service')}")
+                skipped += 1
+                continue
+            if attachment.get('DeviceIndex') == 0 and attachment.get('InstanceId') not in terminated:
+                EVENTS.emit('delete', 'network-interface', ni_id, outcome='skipped',
+                            detail=f"primary interface of {attachment.get('InstanceId')}, which is not being terminated")
+                skipped += 1
+                continue
+            pending.add(ni_id)
+            if attachment.get('AttachmentId') and attachment.get('DeviceIndex') != 0:
+                futures[executor.submit(detach, ni_id, attachment['AttachmentId'])] = ni_id
 
-def delete_subnets(vpc_id: str):
+        deadline = time.monotonic() + timeout
+        next_tick = time.monotonic() + poll_interval
+        while pending or futures:
+            done, _ = wait(futures, timeout=max(0, next_tick - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not futures:
+                time.sleep(max(0, next_tick - time.monotonic()))
+
+            for future in done:
+                ni_id = futures.pop(future)
+                outcome = future.result()
+                if outcome == 'deleted':
+                    deleted_count += 1
+                elif outcome == 'in-use':
+                    pending.add(ni_id)
+                elif outcome == 'failed':
+                    pending.discard(ni_id)
+
+            if not pending or time.monotonic() < next_tick:
+                continue
+            if time.monotonic() > deadline:
+                break
+            try:
+                statuses = describe_pending(pending)
+            except Exception as e:
+                EVENTS.log(f'error tracking network interfaces: {e}', 'error')
+                statuses = None
+            if statuses is not None:
+                for ni_id in list(pending):
+                    if ni_id not in statuses:
+                        # Deleted along with its instance or by its managing service
+                        pending.discard(ni_id)
+                    elif statuses[ni_id] == 'available':
+                        pending.discard(ni_id)
+                        futures[executor.submit(delete, ni_id)] = ni_id
+            next_tick = time.monotonic() + poll_interval
+
+        # Deletes still in flight when tracking timed out
+        for future in as_completed(futures):
+            if future.result() == 'deleted':
+                deleted_count += 1
+
+    if skipped:
+        EVENTS.log(f'warning: skipped {skipped} network interface(s) this teardown cannot release', 'warning')
+    if pending:
+        EVENTS.log(f'warning: {len(pending)} network interface(s) still attached after {timeout:.0f}s', 'warning')
+    return deleted_count
+
+
+def delete_subnets(vpc_id: str, client=None) -> int:
     """Delete all subnets in the VPC"""
-    print('\n- Deleting subnets...')
+    client = client or EC2_CLIENT
+    EVENTS.log(f'deleting subnets in {vpc_id}')
     
     max_retries = 5
     retry_delay = 5
+    total_deleted = 0
     
     for attempt in range(max_retries):
         try:
-            response = EC2_CLIENT.describe_subnets(
+            response = client.describe_subnets(
                 Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}]
             )
             
             if not response['Subnets']:
-                print('  - No subnets to delete')
-                return
+                EVENTS.log(f'no subnets to delete in {vpc_id}')
+                return total_deleted
             
             deleted_count = 0
             remaining_subnets = []
@@ -219,48 +376,49 @@ def delete_subnets(vpc_id: str):
                         subnet_name = tag['Value']
                         break
                 
+                start = time.monotonic()
                 try:
-                    EC2_CLIENT.delete_subnet(SubnetId=subnet_id)
-                    print(f"  - Deleted subnet: {subnet_id} ({subnet_name})")
+                    client.delete_subnet(SubnetId=subnet_id)
+                    EVENTS.emit('delete', 'subnet', subnet_id, subnet_name, duration=time.monotonic() - start)
                     deleted_count += 1
                 except Exception as e:
                     if 'DependencyViolation' in str(e):
-                        print(f"  - Subnet {subnet_id} ({subnet_name}) has dependencies, will retry")
+                        EVENTS.emit('delete', 'subnet', subnet_id, subnet_name, outcome='retry', detail='has dependencies')
                         remaining_subnets.append(subnet_id)
                     else:
-                        print(f"  - Could not delete subnet {subnet_id}: {e}")
+                        EVENTS.emit('delete', 'subnet', subnet_id, subnet_name, outcome='error', detail=str(e))
             
-            if deleted_count > 0:
-                print(f'  - Deleted {deleted_count} subnet(s)')
+            total_deleted += deleted_count
             
             if not remaining_subnets:
-                print('  - All subnets deleted successfully')
-                return
+                return total_deleted
             
             if attempt < max_retries - 1:
-                print(f'  - {len(remaining_subnets)} subnet(s) remaining, waiting {retry_delay}s...')
                 time.sleep(retry_delay)
                 
         except Exception as e:
-            print(f'Error deleting subnets: {e}')
+            EVENTS.log(f'error deleting subnets: {e}', 'error')
             if attempt < max_retries - 1:
                 time.sleep(retry_delay)
     
     try:
-        response = EC2_CLIENT.describe_subnets(
+        response = client.describe_subnets(
             Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}]
         )
         if response['Subnets']:
-            print(f"  - Warning: {len(response['Subnets'])} subnet(s) could not be deleted")
+            EVENTS.log(f"warning: {len(response['Subnets'])} subnet(s) could not be deleted", 'warning')
     except:
         pass
 
+    return total_deleted
+
 
-def delete_route_tables(vpc_id: str):
+def delete_route_tables(vpc_id: str, client=None) -> int:
     """Delete all non-main route tables in the VPC"""
-    print('\n- Deleting route tables...')
+    client = client or EC2_CLIENT
+    EVENTS.log(f'deleting route tables in {vpc_id}')
     try:
-        response = EC2_CLIENT.describe_route_tables(
+        response = client.describe_route_tables(
             Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}]
         )
         
@@ -278,118 +436,437 @@ def delete_route_tables(vpc_id: str):
                 for assoc in rt.get('Associations', []):
                     if not assoc.get('Main', False):
                         try:
-                            EC2_CLIENT.disassociate_route_table(
+                            client.disassociate_route_table(
                                 AssociationId=assoc['RouteTableAssociationId']
                             )
-                            print(f"  - Disassociated route table {rt_id}")
+                            EVENTS.emit('disassociate', 'route-table', rt_id, rt_name)
                         except Exception as e:
-                            print(f"  - Could not disassociate {rt_id}: {e}")
+                            EVENTS.emit('disassociate', 'route-table', rt_id, rt_name, outcome='error', detail=str(e))
                 
+                start = time.monotonic()
                 try:
-                    EC2_CLIENT.delete_route_table(RouteTableId=rt_id)
-                    print(f'  - Deleted route table: {rt_id} ({rt_name})')
+                    client.delete_route_table(RouteTableId=rt_id)
+                    EVENTS.emit('delete', 'route-table', rt_id, rt_name, duration=time.monotonic() - start)
                     deleted_count += 1
                 except Exception as e:
-                    print(f"  - Could not delete route table {rt_id}: {e}")
+                    EVENTS.emit('delete', 'route-table', rt_id, rt_name, outcome='error', detail=str(e))
         
         if deleted_count == 0:
-            print('  - No custom route tables to delete')
-        else:
-            print(f'  - Deleted {deleted_count} route table(s)')
+            EVENTS.log(f'no custom route tables to delete in {vpc_id}')
+
+        return deleted_count
                 
     except Exception as e:
-        print(f'Error deleting route tables: {e}')
+        EVENTS.log(f'error deleting route tables: {e}', 'error')
+        return 0
 
 
-def detach_and_delete_igw(vpc_id: str):
+def detach_and_delete_igw(vpc_id: str, client=None) -> int:
     """Detach and delete internet gateway"""
-    print('\n- Deleting Internet Gateway...')
+    client = client or EC2_CLIENT
+    EVENTS.log(f'deleting Internet Gateway of {vpc_id}')
     try:
-        response = EC2_CLIENT.describe_internet_gateways(
+        response = client.describe_internet_gateways(
             Filters=[{'Name': 'attachment.vpc-id', 'Values': [vpc_id]}]
         )
         
         for igw in response['InternetGateways']:
             igw_id = igw['InternetGatewayId']
-            EC2_CLIENT.detach_internet_gateway(InternetGatewayId=igw_id, VpcId=vpc_id)
-            print(f'  - Detached IGW: {igw_id}')
+            with EVENTS.timed('detach', 'internet-gateway', igw_id):
+                client.detach_internet_gateway(InternetGatewayId=igw_id, VpcId=vpc_id)
             
-            EC2_CLIENT.delete_internet_gateway(InternetGatewayId=igw_id)
-            print(f'  - Deleted IGW: {igw_id}')
+            with EVENTS.timed('delete', 'internet-gateway', igw_id):
+                client.delete_internet_gateway(InternetGatewayId=igw_id)
         
         if not response['InternetGateways']:
-            print('  - No Internet Gateway to delete')
+            EVENTS.log(f'no Internet Gateway to delete in {vpc_id}')
+
+        return len(response['InternetGateways'])
             
     except Exception as e:
-        print(f'Error with Internet Gateway: {e}')
+        EVENTS.log(f'error with Internet Gateway: {e}', 'error')
+        return 0
 
 
-def delete_security_groups(vpc_id: str):
+def delete_security_groups(vpc_id: str, client=None) -> int:
     """Delete all security groups in the VPC (except default)"""
-    print('\n- Deleting security groups...')
+    client = client or EC2_CLIENT
+    EVENTS.log(f'deleting security groups in {vpc_id}')
     
     max_retries = 5
     retry_delay = 3
+    total_deleted = 0
     
     for attempt in range(max_retries):
         try:
-            response = EC2_CLIENT.describe_security_groups(
+            response = client.describe_security_groups(
                 Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}]
             )
             
             remaining_sgs = [sg for sg in response['SecurityGroups'] if sg['GroupName'] != 'default']
             
             if not remaining_sgs:
-                print('  - All security groups deleted')
-                return
+                return total_deleted
             
             deleted_any = False
             for sg in remaining_sgs:
+                start = time.monotonic()
                 try:
-                    EC2_CLIENT.delete_security_group(GroupId=sg['GroupId'])
-                    print(f"  - Deleted security group: {sg['GroupName']} ({sg['GroupId']})")
+                    client.delete_security_group(GroupId=sg['GroupId'])
+                    EVENTS.emit('delete', 'security-group', sg['GroupId'], sg['GroupName'], duration=time.monotonic() - start)
                     deleted_any = True
+                    total_deleted += 1
                 except Exception as e:
                     if 'DependencyViolation' in str(e):
-                        print(f"  - Skipping {sg['GroupName']} (has dependencies)")
+                        EVENTS.emit('delete', 'security-group', sg['GroupId'], sg['GroupName'], outcome='retry', detail='has dependencies')
                     else:
-                        print(f"  - Could not delete {sg['GroupName']}: {e}")
+                        EVENTS.emit('delete', 'security-group', sg['GroupId'], sg['GroupName'], outcome='error', detail=str(e))
             
             if deleted_any and attempt < max_retries - 1:
-                print(f'  - Waiting {retry_delay}s before retry...')
                 time.sleep(retry_delay)
         
         except Exception as e:
-            print(f'Error deleting security groups: {e}')
+            EVENTS.log(f'error deleting security groups: {e}', 'error')
             if attempt < max_retries - 1:
                 time.sleep(retry_delay)
     
-    response = EC2_CLIENT.describe_security_groups(
+    response = client.describe_security_groups(
         Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}]
     )
     remaining = [sg for sg in response['SecurityGroups'] if sg['GroupName'] != 'default']
     if remaining:
-        print(f'  - Warning: {len(remaining)} security group(s) could not be deleted')
+        EVENTS.log(f'warning: {len(remaining)} security group(s) could not be deleted', 'warning')
+
+    return total_deleted
+
+
+def delete_placement_groups(vpc_id: str, client=None) -> int:
+    """Delete the placement groups of the runs that provisioned the VPC
+
+    Placement groups are not part of a VPC; they are found by the RunId tags of its subnets.
+    """
+    client = client or EC2_CLIENT
+    try:
+        run_ids = set()
+        for page in client.get_paginator('describe_subnets').paginate(Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}]):
+            for subnet in page['Subnets']:
+                run_ids.update(tag['Value'] for tag in subnet.get('Tags', []) if tag['Key'] == RUN_ID_TAG)
+
+        run_ids = sorted(run_ids)
+        group_names = []
+        for i in range(0, len(run_ids), FILTER_VALUES_LIMIT):
+            response = client.describe_placement_groups(
+                Filters=[{'Name': f'tag:{RUN_ID_TAG}', 'Values': run_ids[i:i + FILTER_VALUES_LIMIT]}]
+            )
+            group_names.extend(pg['GroupName'] for pg in response['PlacementGroups'])
+    except Exception as e:
+        EVENTS.log(f'error listing placement groups: {e}', 'error')
+        return 0
+
+    if not group_names:
+        EVENTS.log(f'no placement groups to delete for {vpc_id}')
+        return 0
+    return delete_ids('placement group', group_names, lambda group_name: client.delete_placement_group(GroupName=group_name))
+
+
+def cleanup_vpc(vpc_id: str, client=None) -> dict:
+    """Run the full teardown sequence for one VPC and return deleted counts per resource type"""
+    client = client or EC2_CLIENT
+    terminated = terminate_instances(vpc_id, client)
+    return {
+        'instances': len(terminated),
+        # Once their instances are terminated, and while the subnets still carry the run IDs
+        'placement_groups': delete_placement_groups(vpc_id, client),
+        'network_interfaces': delete_network_interfaces(vpc_id, client, terminated=terminated),
+        'security_groups': delete_security_groups(vpc_id, client),
+        'internet_gateways': detach_and_delete_igw(vpc_id, client),
+        'route_tables': delete_route_tables(vpc_id, client),
+        'subnets': delete_subnets(vpc_id, client),
+    }
+
+
+"""
+    Manifest / run ID cleanup
+"""
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        EVENTS.log(f'error reading manifest {path}: {e}', 'error')
+        EVENTS.flush()
+        sys.exit(1)
+
+
+def discover_run(run_id: str, region: str, client=None) -> dict:
+    """Build a manifest for a run from server-side tag filters instead of a saved file"""
+    client = client or EC2_CLIENT
+    tag_filter = [{'Name': f'tag:{RUN_ID_TAG}', 'Values': [run_id]}]
+    resources = {}
+    vpc_id = None
+
+    for page in client.get_paginator('describe_instances').paginate(
+        Filters=tag_filter + [{'Name': 'instance-state-name', 'Values': ['running', 'stopped', 'pending', 'stopping']}]
+    ):
+        for reservation in page['Reservations']:
+            resources.setdefault('instance', []).extend(i['InstanceId'] for i in reservation['Instances'])
+
+    for page in client.get_paginator('describe_subnets').paginate(Filters=tag_filter):
+        for subnet in page['Subnets']:
+            resources.setdefault('subnet', []).append(subnet['SubnetId'])
+            vpc_id = subnet['VpcId']
+
+    for page in client.get_paginator('describe_security_groups').paginate(Filters=tag_filter):
+        resources.setdefault('security-group', []).extend(sg['GroupId'] for sg in page['SecurityGroups'])
+
+    for page in client.get_paginator('describe_route_tables').paginate(Filters=tag_filter):
+        for rt in page['RouteTables']:
+            resources.setdefault('route-table', []).append(rt['RouteTableId'])
+            resources.setdefault('route-table-association', []).extend(
+                assoc['RouteTableAssociationId'] for assoc in rt.get('Associations', []) if not assoc.get('Main', False)
+            )
+
+    # Placement groups are not in the VPC and are deleted by name
+    response = client.describe_placement_groups(Filters=tag_filter)
+    resources.setdefault('placement-group', []).extend(pg['GroupName'] for pg in response['PlacementGroups'])
+
+    for page in client.get_paginator('describe_internet_gateways').paginate(Filters=tag_filter):
+        for igw in page['InternetGateways']:
+            resources.setdefault('internet-gateway', []).append(igw['InternetGatewayId'])
+            for attachment in igw.get('Attachments', []):
+                vpc_id = attachment['VpcId']
+
+    return {'run_id': run_id, 'region': region, 'vpc_id': vpc_id, 'resources': resources}
+
+
+def delete_ids(label: str, ids: list[str], delete, max_retries: int = 5, retry_delay: int = 5) -> int:
+    """Delete resources by ID, retrying dependency errors and treating missing ones as done"""
+    EVENTS.log(f'deleting {len(ids)} {label}(s)')
+    remaining = list(ids)
+    deleted_count = 0
+
+    for attempt in range(max_retries):
+        blocked = []
+        for resource_id in remaining:
+            start = time.monotonic()
+            try:
+                delete(resource_id)
+                EVENTS.emit('delete', label.replace(' ', '-'), resource_id, duration=time.monotonic() - start)
+                deleted_count += 1
+            except Exception as e:
+                if 'NotFound' in str(e) or 'NotAssociated' in str(e) or '.Unknown' in str(e):
+                    continue
+                if 'DependencyViolation' in str(e):
+                    blocked.append(resource_id)
+                else:
+                    EVENTS.emit('delete', label.replace(' ', '-'), resource_id, outcome='error', detail=str(e))
+
+        remaining = blocked
+        if not remaining:
+            break
+        if attempt < max_retries - 1:
+            EVENTS.log(f'{len(remaining)} {label}(s) have dependencies, waiting {retry_delay}s')
+            time.sleep(retry_delay)
+
+    if remaining:
+        EVENTS.log(f'warning: {len(remaining)} {label}(s) could not be deleted', 'warning')
+    return deleted_count
+
+
+def cleanup_manifest(manifest: dict, client=None) -> dict:
+    """Delete exactly the resources listed in a provisioning manifest"""
+    client = client or EC2_CLIENT
+    resources = manifest.get('resources', {})
+    vpc_id = manifest.get('vpc_id')
+    counts = {}
+
+    EVENTS.log('terminating EC2 instances')
+    instance_ids = resources.get('instance', [])
+    live_ids = []
+    for i in range(0, len(instance_ids), FILTER_VALUES_LIMIT):
+        # A single filtered describe per chunk; unlike InstanceIds it does not fail on already-gone IDs
+        response = client.describe_instances(Filters=[
+            {'Name': 'instance-id', 'Values': instance_ids[i:i + FILTER_VALUES_LIMIT]},
+            {'Name': 'instance-state-name', 'Values': ['running', 'stopped', 'pending', 'stopping']}
+        ])
+        for reservation in response['Reservations']:
+            live_ids.extend(instance['InstanceId'] for instance in reservation['Instances'])
+
+    if live_ids:
+        with EVENTS.timed('terminate', 'instance') as event:
+            client.terminate_instances(InstanceIds=live_ids)
+            event['detail'] = f'{len(live_ids)} instance(s)'
+        with EVENTS.timed('wait', 'instance') as event:
+            client.get_waiter('instance_terminated').wait(InstanceIds=live_ids)
+            event['detail'] = 'all terminated'
+    else:
+        EVENTS.log('no instances to terminate')
+    counts['instances'] = len(live_ids)
+
+    counts['placement_groups'] = delete_ids(
+        'placement group', resources.get('placement-group', []),
+        lambda group_name: client.delete_placement_group(GroupName=group_name)
+    )
+
+    subnet_ids = resources.get('subnet', [])
+    counts['network_interfaces'] = delete_network_interfaces(vpc_id, client, subnet_ids, live_ids) if subnet_ids else 0
+
+    counts['security_groups'] = delete_ids(
+        'security group', resources.get('security-group', []),
+        lambda sg_id: client.delete_security_group(GroupId=sg_id), retry_delay=3
+    )
+
+    def delete_igw(igw_id: str):
+        if vpc_id:
+            try:
+                client.detach_internet_gateway(InternetGatewayId=igw_id, VpcId=vpc_id)
+            except Exception as e:
+                if 'Gateway.NotAttached' not in str(e):
+                    raise
+        client.delete_internet_gateway(InternetGatewayId=igw_id)
+
+    counts['internet_gateways'] = delete_ids('internet gateway', resources.get('internet-gateway', []), delete_igw)
+
+    for association_id in resources.get('route-table-association', []):
+        try:
+            client.disassociate_route_table(AssociationId=association_id)
+        except Exception as e:
+            if 'NotFound' not in str(e):
+                EVENTS.emit('disassociate', 'route-table', association_id, outcome='error', detail=str(e))
+    counts['route_tables'] = delete_ids(
+        'route table', resources.get('route-table', []),
+        lambda rt_id: client.delete_route_table(RouteTableId=rt_id)
+    )
+
+    counts['subnets'] = delete_ids(
+        'subnet', subnet_ids,
+        lambda subnet_id: client.delete_subnet(SubnetId=subnet_id)
+    )
+    return counts
+
+
+def cleanup_all(targets: list[tuple[str, str]], clients: dict, max_workers: int) -> dict:
+    """Tear down every (region, vpc_id) target in parallel, one worker per VPC"""
+    results = {}
+    done = 0
+
+    def run(region: str, vpc_id: str):
+        start = time.time()
+        counts = cleanup_vpc(vpc_id, clients[region])
+        return counts, time.time() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cleanup') as pool:
+        futures = {pool.submit(run, region, vpc_id): (region, vpc_id) for region, vpc_id in targets}
+        for future in as_completed(futures):
+            region, vpc_id = futures[future]
+            try:
+                counts, duration = future.result()
+                results[(region, vpc_id)] = {'status': 'ok', 'duration': duration, **counts}
+            except Exception as e:
+                results[(region, vpc_id)] = {'status': f'failed: {e}', 'duration': 0}
+
+            done += 1
+            EVENTS.log(f'[{done}/{len(targets)}] {region} {vpc_id}: {results[(region, vpc_id)]["status"]}')
+
+    return results
+
+
+def print_summary(results: dict, elapsed: float):
+    EVENTS.flush()
+    columns = ['instances', 'placement_groups', 'network_interfaces', 'security_groups', 'internet_gateways', 'route_tables', 'subnets']
+    print('\n' + '='*70)
+    print('CLEANUP SUMMARY')
+    print('='*70)
+    print(f"{'region':<16}{'vpc':<24}{'inst':>5}{'pg':>5}{'eni':>5}{'sg':>5}{'igw':>5}{'rtb':>5}{'sub':>5}{'time':>8}  status")
+    for (region, vpc_id), result in sorted(results.items()):
+        counts = ''.join(f'{result.get(column, 0):>5}' for column in columns)
+        print(f"{region:<16}{vpc_id:<24}{counts}{result['duration']:>7.0f}s  {result['status']}")
+
+    totals = {column: sum(result.get(column, 0) for result in results.values()) for column in columns}
+    print(f'\n- {len(results)} VPC(s) processed in {elapsed:.0f}s: ' + ', '.join(f'{v} {k}' for k, v in totals.items()))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Delete lab resources from one or more VPCs')
+    parser.add_argument('--vpc', action='append', default=[], help='VPC ID or Name tag (repeatable)')
+    parser.add_argument('--tag', action='append', default=[], help='Key=Value tag filter selecting VPCs (repeatable)')
+    parser.add_argument('--region', action='append', default=[], help=f'region to search (repeatable, default {DEFAULT_REGION})')
+    parser.add_argument('--max-workers', type=int, default=8, help='VPCs torn down concurrently')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='tear down on one asyncio event loop')
+    parser.add_argument('--max-concurrency', type=int, default=64, help='API requests in flight per region with --async')
+    parser.add_argument('--manifest', default=None, help='delete exactly the resources listed in a main.py manifest')
+    parser.add_argument('--run-id', default=None, help=f'delete the resources tagged {RUN_ID_TAG}=<run-id>')
+    parser.add_argument('--events-jsonl', default=None, help='also write every progress event as JSON lines to this file')
+    parser.add_argument('--log-file', default=None, help='also write progress events to this log file')
+    return parser.parse_args()
+
+
+def main_manifest(args):
+    if args.manifest:
+        manifest = load_manifest(args.manifest)
+    else:
+        region = args.region[0] if args.region else DEFAULT_REGION
+        manifest = discover_run(args.run_id, region, make_client(region))
+
+    region = manifest.get('region') or DEFAULT_REGION
+    client = make_client(region)
+    resources = manifest.get('resources', {})
+
+    EVENTS.flush()
+    print(f"\n- Run {manifest.get('run_id')} in {region} ({manifest.get('vpc_id')}):")
+    for resource_type, ids in resources.items():
+        print(f'  - {len(ids)} {resource_type}(s)')
+
+    if not any(resources.values()):
+        print('\n- Nothing to clean up.')
+        return
+
+    confirm = input('\nAre you SURE you want to delete these resources? (type "yes" to confirm): ').strip()
+    if confirm != 'yes':
+        print('- Cleanup cancelled')
+        return
+
+    start = time.time()
+    counts = cleanup_manifest(manifest, client)
+    key = (region, manifest.get('vpc_id') or 'N/A')
+    print_summary({key: {'status': 'ok', 'duration': time.time() - start, **counts}}, time.time() - start)
 
 
 def main():
+    args = parse_args()
+
     print('='*70)
     print('AWS INFRASTRUCTURE CLEANUP SCRIPT')
     print('='*70)
+
+    if args.events_jsonl:
+        EVENTS.add_sink(JsonLinesSink(args.events_jsonl))
+    if args.log_file:
+        EVENTS.add_sink(LogFileSink(args.log_file))
     
     verify_aws_credentials()
     set_clients()
-    
-    vpc_identifier = 'vpc-0bdc139fd9ee529cc'
-    vpc_id = get_vpc_id(vpc_identifier)
-    
-    if not vpc_id:
-        print(f'\n- VPC "{vpc_identifier}" not found. Nothing to clean up.')
+
+    if args.manifest or args.run_id:
+        main_manifest(args)
         return
+
+    regions = args.region or [DEFAULT_REGION]
+    identifiers = args.vpc or ([] if args.tag else [DEFAULT_VPC_ID])
+    clients = {region: make_client(region) for region in regions}
+
+    targets = []
+    for region in regions:
+        for vpc_id, vpc_name in find_vpcs(identifiers, args.tag, clients[region]).items():
+            EVENTS.emit('describe', 'vpc', vpc_id, vpc_name, detail=f'found in {region}')
+            targets.append((region, vpc_id))
+    EVENTS.flush()
     
-    print(f'\n- Found VPC: {vpc_id}')
+    if not targets:
+        print(f'\n- No VPC matching {identifiers + args.tag} found. Nothing to clean up.')
+        return
     
-    print('\nThis will delete:')
+    print(f'\nThis will delete, in {len(targets)} VPC(s):')
     print('  - All EC2 instances')
     print('  - All network interfaces')
     print('  - All security groups (except default)')
@@ -407,12 +884,14 @@ def main():
     print('STARTING CLEANUP')
     print('='*70)
     
-    terminate_instances(vpc_id)
-    delete_network_interfaces(vpc_id)
-    delete_security_groups(vpc_id)
-    detach_and_delete_igw(vpc_id)
-    delete_route_tables(vpc_id)
-    delete_subnets(vpc_id)
+    start = time.time()
+    if args.use_async:
+        import asyncio
+        from async_ec2 import cleanup_all as cleanup_all_async
+        results = asyncio.run(cleanup_all_async(targets, args.max_concurrency))
+    else:
+        results = cleanup_all(targets, clients, args.max_workers)
+    print_summary(results, time.time() - start)
     
     print('\n' + '='*70)
     print('CLEANUP COMPLETE')
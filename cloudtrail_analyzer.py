@@ -0,0 +1,180 @@
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_EVENTS = ('RunInstances', 'AuthorizeSecurityGroupIngress', 'DeleteSecurityGroup')
+
+COLUMNS = ('event_time', 'event_name', 'principal', 'source_ip', 'region', 'resources', 'error_code')
+
+RESOURCE_ID_RE = re.compile(r'^(?:vpc|sg|subnet|i|eni|igw|rtb|acl|vol|ami)-[0-9a-f]{8,17}$')
+
+
+"""
+    Record extraction
+"""
+def find_resource_ids(node, found: set):
+    """Collect every EC2 resource ID referenced anywhere in a request or response"""
+    if isinstance(node, dict):
+        for value in node.values():
+            find_resource_ids(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            find_resource_ids(value, found)
+    elif isinstance(node, str) and RESOURCE_ID_RE.match(node):
+        found.add(node)
+
+
+def get_principal(record: dict) -> str:
+    identity = record.get('userIdentity') or {}
+    return identity.get('arn') or identity.get('principalId') or identity.get('type') or 'unknown'
+
+
+def scan_file(path: str, events: frozenset, resources: frozenset, principals: tuple) -> tuple[dict, str | None]:
+    """Scan one CloudTrail archive and return its matching events as columns, and why it was skipped if unreadable"""
+    columns = {name: [] for name in COLUMNS}
+
+    # A truncated or corrupt archive fails in gzip (OSError, EOFError, zlib.error) or in the JSON body (ValueError)
+    try:
+        with gzip.open(path, 'rb') as f:
+            raw = f.read()
+    except (OSError, EOFError, zlib.error, ValueError) as e:
+        return columns, str(e) or type(e).__name__
+
+    # Cheap byte-level checks first so most files are never JSON-decoded
+    if not any(f'"{event}"'.encode() in raw for event in events):
+        return columns, None
+    if resources and not any(resource.encode() in raw for resource in resources):
+        return columns, None
+    if principals and not any(principal.encode() in raw for principal in principals):
+        return columns, None
+
+    try:
+        records = json.loads(raw).get('Records', [])
+    except (ValueError, AttributeError) as e:
+        return columns, f'not a CloudTrail archive: {e}'
+
+    for record in records:
+        if record.get('eventName') not in events:
+            continue
+
+        principal = get_principal(record)
+        if principals and not any(p in principal for p in principals):
+            continue
+
+        found = set()
+        find_resource_ids(record.get('requestParameters'), found)
+        find_resource_ids(record.get('responseElements'), found)
+        if resources and not (found & resources):
+            continue
+
+        columns['event_time'].append(record.get('eventTime'))
+        columns['event_name'].append(record['eventName'])
+        columns['principal'].append(principal)
+        columns['source_ip'].append(record.get('sourceIPAddress'))
+        columns['region'].append(record.get('awsRegion'))
+        columns['resources'].append(' '.join(sorted(found)))
+        columns['error_code'].append(record.get('errorCode'))
+
+    return columns, None
+
+
+def _scan_file_args(args: tuple) -> tuple[dict, str | None]:
+    return scan_file(*args)
+
+
+"""
+    Analysis
+"""
+def find_trail_files(root: str) -> list[str]:
+    paths = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name.endswith('.json.gz'):
+                paths.append(os.path.join(directory, name))
+    return sorted(paths)
+
+
+def analyze(root: str, events=DEFAULT_EVENTS, resources=(), principals=(), workers: int | None = None) -> tuple[dict, dict]:
+    """Scan every archive under root in a process pool and merge the matches column by column
+
+    Returns the columns and the archives that could not be read, with the reason for each.
+    """
+    paths = find_trail_files(root)
+    result = {name: [] for name in COLUMNS}
+    skipped = {}
+    if not paths:
+        return result, skipped
+
+    events = frozenset(events)
+    resources = frozenset(resources)
+    principals = tuple(principals)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (workers * 8))
+
+    tasks = ((path, events, resources, principals) for path in paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, (columns, error) in zip(paths, pool.map(_scan_file_args, tasks, chunksize=chunksize)):
+            if error is not None:
+                skipped[path] = error
+            for name in COLUMNS:
+                result[name].extend(columns[name])
+
+    return result, skipped
+
+
+def summarize(columns: dict) -> Counter:
+    return Counter(zip(columns['event_name'], columns['principal']))
+
+
+def write_output(columns: dict, path: str):
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(zip(*(columns[name] for name in COLUMNS)))
+    else:
+        with open(path, 'w') as f:
+            json.dump(columns, f, separators=(',', ':'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Audit EC2 API calls in local CloudTrail archives')
+    parser.add_argument('root', help='directory tree containing CloudTrail .json.gz files')
+    parser.add_argument('--event', action='append', dest='events', help='eventName to keep (repeatable)')
+    parser.add_argument('--resource', action='append', default=[], help='resource ID to keep, e.g. a vpc-/sg- ID (repeatable)')
+    parser.add_argument('--principal', action='append', default=[], help='substring of the caller ARN (repeatable)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None, help='write columns to a .json or .csv file')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f'- directory {args.root} not found')
+        sys.exit(1)
+
+    print(f'- scanning CloudTrail archives under {args.root}')
+    start = time.time()
+    columns, skipped = analyze(args.root, args.events or DEFAULT_EVENTS, args.resource, args.principal, args.workers)
+    print(f"- found {len(columns['event_name'])} matching event(s) in {time.time() - start:.1f}s")
+    if skipped:
+        print(f'- skipped {len(skipped)} unreadable archive(s)')
+        for path, error in skipped.items():
+            print(f'  - {path}: {error}')
+
+    for (event_name, principal), count in summarize(columns).most_common():
+        print(f'  - {event_name:<32} {count:>8}  {principal}')
+
+    if args.output:
+        write_output(columns, args.output)
+        print(f'- results saved to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+from inventory import Inventory, collect, content_digest, load
+
+WORLD = ['0.0.0.0/0', '::/0']
+# Protocols that can carry a TCP port: security groups name them, network ACLs number them
+TCP_PROTOCOLS = frozenset(['tcp', '6', '-1', -1])
+# Bumped when a predicate changes meaning, so results saved by an older engine are not reused
+PREDICATES_VERSION = 3
+
+# Declarative controls mapped to CSA Cloud Controls Matrix domains.
+# 'where' limits a control to matching resources; 'check' must hold for the resource to pass.
+CONTROLS = [
+    {
+        'id': 'IVS-03.1', 'severity': 'high', 'resource_type': 'security-group',
+        'title': 'SSH is not open to the internet',
+        'check': {'field': 'ingress', 'none': {'all': [{'field': 'source', 'in': WORLD}, {'covers_port': 22}]}},
+    },
+    {
+        'id': 'IVS-03.2', 'severity': 'high', 'resource_type': 'security-group',
+        'title': 'RDP is not open to the internet',
+        'check': {'field': 'ingress', 'none': {'all': [{'field': 'source', 'in': WORLD}, {'covers_port': 3389}]}},
+    },
+    {
+        'id': 'IVS-03.3', 'severity': 'high', 'resource_type': 'security-group',
+        'title': 'Database and Elasticsearch ports are not open to the internet',
+        'check': {'field': 'ingress', 'none': {'all': [
+            {'field': 'source', 'in': WORLD},
+            {'any': [{'covers_port': port} for port in (1433, 3306, 5432, 9200, 9300)]},
+        ]}},
+    },
+    {
+        'id': 'IVS-03.4', 'severity': 'critical', 'resource_type': 'security-group',
+        'title': 'No rule allows all traffic from the internet',
+        'check': {'field': 'ingress', 'none': {'all': [{'field': 'source', 'in': WORLD}, {'field': 'protocol', 'equals': '-1'}]}},
+    },
+    {
+        'id': 'IVS-06.1', 'severity': 'medium', 'resource_type': 'security-group',
+        'title': 'The default security group restricts all traffic',
+        'where': {'field': 'group_name', 'equals': 'default'},
+        'check': {'all': [{'field': 'ingress', 'empty': True}, {'field': 'egress', 'empty': True}]},
+    },
+    {
+        'id': 'IVS-06.2', 'severity': 'medium', 'resource_type': 'subnet',
+        'title': 'Private subnets do not assign public IPs',
+        'where': {'field': 'tags.Name', 'matches': r'private'},
+        'check': {'field': 'map_public_ip', 'equals': False},
+    },
+    {
+        'id': 'IVS-06.3', 'severity': 'high', 'resource_type': 'route-table',
+        'title': 'Private route tables have no route to an internet gateway',
+        'where': {'field': 'tags.Name', 'matches': r'private'},
+        'check': {'field': 'routes', 'none': {'field': 'target', 'matches': r'^igw-'}},
+    },
+    {
+        'id': 'IVS-09.1', 'severity': 'medium', 'resource_type': 'network-acl',
+        'title': 'Network ACLs do not allow SSH or RDP from the internet',
+        # Entries are kept in rule-number order and the first one covering a port decides it,
+        # so an allow shadowed by a lower-numbered deny does not open anything
+        'check': {'all': [
+            {'field': 'entries', 'first': {'all': [
+                {'field': 'egress', 'equals': False}, {'field': 'cidr', 'equals': cidr}, {'covers_port': port},
+            ]}, 'check': {'field': 'action', 'equals': 'deny'}}
+            for cidr in WORLD for port in (22, 3389)
+        ]},
+    },
+    {
+        'id': 'IVS-04.1', 'severity': 'high', 'resource_type': 'instance',
+        'title': 'Instances require IMDSv2',
+        'check': {'field': 'http_tokens', 'equals': 'required'},
+    },
+    {
+        'id': 'LOG-03.1', 'severity': 'low', 'resource_type': 'instance',
+        'title': 'Detailed monitoring is enabled',
+        'check': {'field': 'monitoring', 'in': ['enabled', 'pending']},
+    },
+    {
+        'id': 'IAM-16.1', 'severity': 'medium', 'resource_type': 'instance',
+        'title': 'Instances use an IAM instance profile instead of stored keys',
+        'check': {'field': 'iam_profile', 'exists': True},
+    },
+    {
+        'id': 'IVS-06.4', 'severity': 'medium', 'resource_type': 'instance',
+        'title': 'Database servers have no public IP',
+        'where': {'field': 'tags.Type', 'equals': 'DB-Server'},
+        'check': {'field': 'public_ip', 'exists': False},
+    },
+]
+
+SEVERITY_ORDER = ['critical', 'high', 'medium', 'low']
+
+
+"""
+    Predicate compilation
+"""
+def compile_getter(field: str):
+    """Fields read Resource.data; 'tags.<Key>' reads a tag instead"""
+    if field.startswith('tags.'):
+        key = field[5:]
+        return lambda item: item.tags.get(key) if hasattr(item, 'tags') else None
+    return lambda item: (item.data if hasattr(item, 'data') else item).get(field)
+
+
+def compile_condition(spec: dict):
+    """Turn one declarative condition into a predicate taking a Resource or a list item (rule, route, entry)"""
+    if 'all' in spec:
+        parts = [compile_condition(part) for part in spec['all']]
+        return lambda item: all(part(item) for part in parts)
+    if 'any' in spec:
+        parts = [compile_condition(part) for part in spec['any']]
+        return lambda item: any(part(item) for part in parts)
+    if 'not' in spec:
+        inner = compile_condition(spec['not'])
+        return lambda item: not inner(item)
+    if 'covers_port' in spec:
+        port = spec['covers_port']
+        # Every port watched here is TCP; protocol -1 (or a missing range) means every port
+        return lambda item: item.get('protocol') in TCP_PROTOCOLS and (
+            item.get('protocol') in ('-1', -1) or item.get('from', -1) == -1
+            or item['from'] <= port <= item['to']
+        )
+
+    get = compile_getter(spec['field'])
+    if 'equals' in spec:
+        expected = spec['equals']
+        return lambda item: get(item) == expected
+    if 'in' in spec:
+        allowed = frozenset(spec['in'])
+        return lambda item: get(item) in allowed
+    if 'matches' in spec:
+        pattern = re.compile(spec['matches'], re.IGNORECASE)
+        return lambda item: pattern.search(get(item) or '') is not None
+    if 'exists' in spec:
+        expected = spec['exists']
+        return lambda item: (get(item) not in (None, '')) == expected
+    if 'empty' in spec:
+        expected = spec['empty']
+        return lambda item: (not get(item)) == expected
+    if 'none' in spec:
+        inner = compile_condition(spec['none'])
+        return lambda item: not any(inner(element) for element in get(item) or [])
+    if 'first' in spec:
+        # Only the first element matching 'first' is checked; the condition holds when none matches
+        select = compile_condition(spec['first'])
+        inner = compile_condition(spec['check'])
+        return lambda item: next((inner(element) for element in get(item) or [] if select(element)), True)
+    if 'every' in spec:
+        inner = compile_condition(spec['every'])
+        return lambda item: all(inner(element) for element in get(item) or [])
+    raise ValueError(f'unknown condition: {spec}')
+
+
+class Control:
+    __slots__ = ('control_id', 'title', 'severity', 'resource_type', 'where', 'check')
+
+    def __init__(self, spec: dict):
+        self.control_id = spec['id']
+        self.title = spec['title']
+        self.severity = spec['severity']
+        self.resource_type = spec['resource_type']
+        self.where = compile_condition(spec['where']) if 'where' in spec else None
+        self.check = compile_condition(spec['check'])
+
+
+"""
+    Engine
+"""
+class ComplianceEngine:
+    """Evaluate compiled controls over inventories, re-checking only resources whose digest changed"""
+
+    def __init__(self, controls: list[dict] = CONTROLS, state_path: str | None = None):
+        self.controls: dict[str, list[Control]] = {}
+        for spec in controls:
+            self.controls.setdefault(spec['resource_type'], []).append(Control(spec))
+        self.controls_digest = content_digest({}, {'controls': controls, 'predicates': PREDICATES_VERSION})
+        self.state_path = state_path
+        # resource ID -> (digest, {control ID: passed})
+        self.results: dict[str, tuple[str, dict[str, bool]]] = {}
+        self.evaluated = 0
+        self.reused = 0
+        if state_path:
+            self.load_state()
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, 'r') as f:
+            state = json.load(f)
+        # Cached results are only valid for the same set of controls
+        if state.get('controls_digest') == self.controls_digest:
+            self.results = {resource_id: tuple(entry) for resource_id, entry in state['results'].items()}
+
+    def save_state(self):
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'controls_digest': self.controls_digest, 'results': self.results}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.state_path)
+
+    def evaluate_resource(self, resource) -> dict[str, bool]:
+        outcome = {}
+        for control in self.controls[resource.resource_type]:
+            if control.where is None or control.where(resource):
+                outcome[control.control_id] = control.check(resource)
+        return outcome
+
+    def evaluate(self, inventory: Inventory) -> dict[str, dict[str, bool]]:
+        """Control outcomes per resource; only the types that have controls are visited"""
+        outcomes = {}
+        for resource_type in self.controls:
+            for resource in inventory.by_type(resource_type):
+                cached = self.results.get(resource.resource_id)
+                if cached and cached[0] == resource.digest:
+                    outcome = cached[1]
+                    self.reused += 1
+                else:
+                    outcome = self.evaluate_resource(resource)
+                    self.results[resource.resource_id] = (resource.digest, outcome)
+                    self.evaluated += 1
+                outcomes[resource.resource_id] = outcome
+        return outcomes
+
+    def findings(self, inventories: list[Inventory]) -> list[dict]:
+        """Failed controls across every inventory, most severe first"""
+        controls = {control.control_id: control for group in self.controls.values() for control in group}
+        findings = []
+        for inventory in inventories:
+            for resource_id, outcome in self.evaluate(inventory).items():
+                resource = inventory.get(resource_id)
+                for control_id, passed in outcome.items():
+                    if passed:
+                        continue
+                    control = controls[control_id]
+                    findings.append({
+                        'control': control_id,
+                        'title': control.title,
+                        'severity': control.severity,
+                        'resource_id': resource_id,
+                        'resource_type': resource.resource_type,
+                        'name': resource.name,
+                        'vpc_id': resource.vpc_id,
+                        'region': inventory.meta.get('region'),
+                    })
+        findings.sort(key=lambda f: (SEVERITY_ORDER.index(f['severity']), f['control'], f['resource_id']))
+        return findings
+
+
+def print_findings(findings: list[dict], checked: int):
+    for finding in findings:
+        print(f"  - [{finding['severity'].upper():<8}] {finding['control']:<9} {finding['resource_type']:<15} "
+              f"{finding['resource_id']:<24} {finding['name']}, failed: {finding['title']}")
+    counts = {severity: sum(f['severity'] == severity for f in findings) for severity in SEVERITY_ORDER}
+    print(f'- {checked} resource(s) checked, {len(findings)} finding(s): ' + ', '.join(f'{v} {k}' for k, v in counts.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check VPC inventories against CSA-aligned security controls')
+    parser.add_argument('snapshots', nargs='*', help='inventory snapshots (from inventory.py snapshot) to check')
+    parser.add_argument('--vpc', action='append', default=[], help='collect and check a live VPC instead (repeatable)')
+    parser.add_argument('--region', default=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'))
+    parser.add_argument('--state', default=None, help='cache of previous results; unchanged resources are not re-checked')
+    parser.add_argument('--output', default=None, help='write findings as JSON')
+    args = parser.parse_args()
+
+    if not args.snapshots and not args.vpc:
+        parser.error('give at least one snapshot or --vpc')
+
+    inventories = []
+    try:
+        inventories.extend(load(path) for path in args.snapshots)
+    except FileNotFoundError as e:
+        print(f'- snapshot {e} not found')
+        sys.exit(1)
+    if args.vpc:
+        from cleanup import make_client, verify_aws_credentials
+        verify_aws_credentials()
+        client = make_client(args.region)
+        for vpc_id in args.vpc:
+            print(f'- capturing inventory of {vpc_id}')
+            inventories.append(collect(vpc_id, client))
+
+    start = time.time()
+    engine = ComplianceEngine(state_path=args.state)
+    findings = engine.findings(inventories)
+    print_findings(findings, engine.evaluated + engine.reused)
+    print(f'- {engine.evaluated} evaluated, {engine.reused} unchanged, in {time.time() - start:.2f}s')
+
+    if args.state:
+        engine.save_state()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(findings, f, indent=2)
+        print(f'- findings saved to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
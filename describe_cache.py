@@ -0,0 +1,250 @@
+import copy
+import json
+import threading
+import time
+
+from botocore.awsrequest import AWSResponse
+
+# Describe operation -> (resource type, list key in the response, ID key of each item).
+# Instances, network interfaces and placement groups change state on the server side
+# (pending -> running, attaching -> detached) and are polled by waiters, so they are never cached.
+CACHED_OPERATIONS = {
+    'DescribeVpcs': ('vpc', 'Vpcs', 'VpcId'),
+    'DescribeSubnets': ('subnet', 'Subnets', 'SubnetId'),
+    'DescribeRouteTables': ('route-table', 'RouteTables', 'RouteTableId'),
+    'DescribeInternetGateways': ('internet-gateway', 'InternetGateways', 'InternetGatewayId'),
+    'DescribeSecurityGroups': ('security-group', 'SecurityGroups', 'GroupId'),
+    'DescribeKeyPairs': ('key-pair', 'KeyPairs', 'KeyPairId'),
+    'DescribeInstanceTypes': ('instance-type', 'InstanceTypes', 'InstanceType'),
+}
+
+# Seconds a cached describe stays valid; instance types only change with AWS releases
+DEFAULT_TTL = 30
+TTLS = {'instance-type': 3600}
+
+# After a mutation, EC2 may keep returning the old state for a moment:
+# responses for the affected type are not stored again until this many seconds have passed
+SETTLE_TIME = 2
+
+# Mutating operation -> resource types whose cached describes it can change
+MUTATIONS = {
+    'CreateVpc': ('vpc',),
+    'DeleteVpc': ('vpc', 'subnet', 'route-table', 'internet-gateway', 'security-group'),
+    'ModifyVpcAttribute': ('vpc',),
+    'CreateSubnet': ('subnet',),
+    'DeleteSubnet': ('subnet', 'route-table'),
+    'ModifySubnetAttribute': ('subnet',),
+    'CreateRouteTable': ('route-table',),
+    'DeleteRouteTable': ('route-table',),
+    'AssociateRouteTable': ('route-table',),
+    'DisassociateRouteTable': ('route-table',),
+    'CreateRoute': ('route-table',),
+    'DeleteRoute': ('route-table',),
+    'ReplaceRoute': ('route-table',),
+    'CreateInternetGateway': ('internet-gateway',),
+    'DeleteInternetGateway': ('internet-gateway', 'route-table'),
+    'AttachInternetGateway': ('internet-gateway',),
+    'DetachInternetGateway': ('internet-gateway', 'route-table'),
+    'CreateSecurityGroup': ('security-group',),
+    'DeleteSecurityGroup': ('security-group',),
+    'AuthorizeSecurityGroupIngress': ('security-group',),
+    'AuthorizeSecurityGroupEgress': ('security-group',),
+    'RevokeSecurityGroupIngress': ('security-group',),
+    'RevokeSecurityGroupEgress': ('security-group',),
+    'CreateKeyPair': ('key-pair',),
+    'ImportKeyPair': ('key-pair',),
+    'DeleteKeyPair': ('key-pair',),
+}
+
+# Mutations that only touch resource types this cache never stores
+UNCACHED_MUTATIONS = {
+    'RunInstances', 'StartInstances', 'StopInstances', 'TerminateInstances', 'RebootInstances',
+    'MonitorInstances', 'UnmonitorInstances', 'ModifyInstanceMetadataOptions',
+    'CreateNetworkInterface', 'DeleteNetworkInterface', 'AttachNetworkInterface', 'DetachNetworkInterface',
+    'CreatePlacementGroup', 'DeletePlacementGroup',
+}
+
+# CreateTags/DeleteTags name resources by ID only; the prefix gives their type
+ID_PREFIXES = {
+    'vpc-': 'vpc', 'subnet-': 'subnet', 'rtb-': 'route-table', 'igw-': 'internet-gateway',
+    'sg-': 'security-group', 'key-': 'key-pair',
+}
+
+VPC_FILTERS = ('vpc-id', 'attachment.vpc-id')
+
+
+def request_ids(params: dict) -> set[str]:
+    """Every resource ID named in the parameters of a call (SubnetId, GroupIds, Resources, ...)"""
+    ids = set()
+    for key, value in params.items():
+        if not (key.endswith('Id') or key.endswith('Ids') or key == 'Resources'):
+            continue
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, str):
+                ids.add(item)
+    return ids
+
+
+def item_vpc(item: dict) -> str | None:
+    """VPC of one describe item; internet gateways only have it in their attachments"""
+    if item.get('VpcId'):
+        return item['VpcId']
+    for attachment in item.get('Attachments', []):
+        if attachment.get('VpcId'):
+            return attachment['VpcId']
+    return None
+
+
+class Entry:
+    __slots__ = ('response', 'expires', 'resource_type', 'ids', 'vpcs', 'scoped')
+
+    def __init__(self, response: dict, expires: float, resource_type: str, ids: set, vpcs: set, scoped: bool):
+        self.response = response
+        self.expires = expires
+        self.resource_type = resource_type
+        self.ids = ids
+        self.vpcs = vpcs
+        # Unscoped entries (no VPC filter, no IDs) can contain any resource of their type
+        self.scoped = scoped
+
+
+class DescribeCache:
+    """Read-through cache of EC2 describe calls, invalidated by the mutating calls made through the same clients"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, ttls: dict = TTLS, settle_time: float = SETTLE_TIME):
+        self.ttl = ttl
+        self.ttls = ttls
+        self.settle_time = settle_time
+        self.entries: dict[tuple, Entry] = {}
+        # Resource ID -> VPC, learned from cached responses to scope invalidations
+        self.vpc_of: dict[str, str] = {}
+        # Resource type -> invalidation counter / time before which responses may still be stale
+        self.generation: dict[str, int] = {}
+        self.settled_at: dict[str, float] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'invalidated': 0}
+        self.lock = threading.Lock()
+
+    def key(self, operation_name: str, params: dict, region: str | None) -> tuple:
+        return region, operation_name, json.dumps(params, sort_keys=True, default=str)
+
+    def lookup(self, key: tuple) -> dict | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.expires < time.monotonic():
+                self.entries.pop(key, None)
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            return copy.deepcopy(entry.response)
+
+    def store(self, key: tuple, operation_name: str, params: dict, response: dict, generation: int):
+        resource_type, list_key, id_key = CACHED_OPERATIONS[operation_name]
+        items = response.get(list_key, [])
+        ids = request_ids(params)
+        vpcs = {
+            value for spec in params.get('Filters', []) if spec.get('Name') in VPC_FILTERS for value in spec.get('Values', [])
+        }
+        scoped = bool(ids or vpcs)
+        for item in items:
+            if item.get(id_key):
+                ids.add(item[id_key])
+            vpc_id = item_vpc(item)
+            if vpc_id:
+                vpcs.add(vpc_id)
+
+        with self.lock:
+            for item in items:
+                vpc_id = item_vpc(item)
+                if vpc_id and item.get(id_key):
+                    self.vpc_of[item[id_key]] = vpc_id
+            # A mutation of this type finished while the describe was in flight, or is too recent
+            if self.generation.get(resource_type, 0) != generation:
+                return
+            if time.monotonic() < self.settled_at.get(resource_type, 0):
+                return
+            ttl = self.ttls.get(resource_type, self.ttl)
+            self.entries[key] = Entry(copy.deepcopy(response), time.monotonic() + ttl, resource_type, ids, vpcs, scoped)
+
+    def invalidate(self, operation_name: str, params: dict):
+        """Drop the entries a mutating call can have changed; unknown mutations drop everything"""
+        ids = request_ids(params)
+        if operation_name in MUTATIONS:
+            resource_types = set(MUTATIONS[operation_name])
+        elif operation_name in ('CreateTags', 'DeleteTags'):
+            resource_types = {
+                resource_type for resource_id in ids
+                for prefix, resource_type in ID_PREFIXES.items() if resource_id.startswith(prefix)
+            }
+        else:
+            resource_types = {resource_type for resource_type, _, _ in CACHED_OPERATIONS.values()}
+
+        with self.lock:
+            vpcs = {self.vpc_of[resource_id] for resource_id in ids if resource_id in self.vpc_of}
+            vpcs |= {resource_id for resource_id in ids if resource_id.startswith('vpc-')}
+            # Without a known VPC the mutation can affect any entry of its types
+            targeted = bool(vpcs)
+            stale = [
+                key for key, entry in self.entries.items()
+                if entry.resource_type in resource_types and (
+                    not targeted or not entry.scoped or entry.ids & ids or entry.vpcs & vpcs
+                )
+            ]
+            for key in stale:
+                del self.entries[key]
+            self.stats['invalidated'] += len(stale)
+            settled_at = time.monotonic() + self.settle_time
+            for resource_type in resource_types:
+                self.generation[resource_type] = self.generation.get(resource_type, 0) + 1
+                self.settled_at[resource_type] = settled_at
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    """
+        botocore hooks
+    """
+    def _provide_params(self, params, model, context, **kwargs):
+        operation_name = model.name
+        if operation_name in CACHED_OPERATIONS:
+            resource_type = CACHED_OPERATIONS[operation_name][0]
+            key = self.key(operation_name, params, context.get('client_region'))
+            context['describe_cache'] = (key, dict(params), self.generation.get(resource_type, 0))
+            response = self.lookup(key)
+            if response is not None:
+                # Read by the rate limiter, which does not spend a token on cache hits
+                context['cached_response'] = response
+        elif operation_name in UNCACHED_MUTATIONS or operation_name.startswith(('Describe', 'Get', 'List', 'Search')):
+            return
+        else:
+            context['describe_cache_mutation'] = (operation_name, dict(params))
+
+    def _before_call(self, context, **kwargs):
+        if 'cached_response' in context:
+            return AWSResponse(None, 200, {}, None), context['cached_response']
+        return None
+
+    def _after_call(self, http_response, parsed, model, context, **kwargs):
+        if 'cached_response' in context:
+            return
+        if 'describe_cache_mutation' in context:
+            # Failed mutations (DependencyViolation, ...) changed nothing
+            if http_response.status_code < 300:
+                self.invalidate(*context['describe_cache_mutation'])
+        elif 'describe_cache' in context and http_response.status_code < 300:
+            key, params, generation = context['describe_cache']
+            self.store(key, model.name, params, parsed, generation)
+
+    def _after_call_error(self, context, **kwargs):
+        # The request may or may not have been applied
+        if 'describe_cache_mutation' in context:
+            self.invalidate(*context['describe_cache_mutation'])
+
+    def install(self, client):
+        """Serve repeated describes of a boto3 EC2 client from the cache; register before the rate limiter"""
+        events = client.meta.events
+        events.register_first('provide-client-params.ec2', self._provide_params, unique_id=f'describe-cache-params-{id(self)}')
+        events.register_first('before-call.ec2', self._before_call, unique_id=f'describe-cache-before-{id(self)}')
+        events.register('after-call.ec2', self._after_call, unique_id=f'describe-cache-after-{id(self)}')
+        events.register('after-call-error.ec2', self._after_call_error, unique_id=f'describe-cache-error-{id(self)}')
+        return client
@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import time
+
+from inventory import content_digest, from_route_table, from_security_group
+from lab_layout import APP_INGRESS_RULES, DB_INGRESS_RULES, DEFAULT_VPC_ID, ROUTE_TABLE_LAYOUT
+
+
+"""
+    Desired state
+"""
+def rule_key(rule: dict) -> tuple:
+    return (rule['protocol'], rule['from'], rule['to'], rule['source'])
+
+
+def route_key(route: dict) -> tuple:
+    return (route['destination'], route['target'], route['state'])
+
+
+def desired_state(suffix: str = '') -> dict:
+    """Describe what main.py builds for one lab, keyed by Name tag; '@name' marks a reference to another resource"""
+    app_sg = f'polystudentlab-app-sg{suffix}'
+    desired = {
+        app_sg: {
+            'resource_type': 'security-group',
+            'ingress': [('tcp', r['FromPort'], r['ToPort'], r['CidrIp']) for r in APP_INGRESS_RULES],
+        },
+        f'polystudentlab-db-sg{suffix}': {
+            'resource_type': 'security-group',
+            'ingress': [('tcp', r['FromPort'], r['ToPort'], f'@{app_sg}') for r in DB_INGRESS_RULES],
+        },
+    }
+
+    for layout in ROUTE_TABLE_LAYOUT.values():
+        desired[f"{layout['name']}{suffix}"] = {
+            'resource_type': 'route-table',
+            'routes': [('0.0.0.0/0', '@igw', 'active')] if layout['internet'] else [],
+            'subnets': [f"@polystudentlab-{key.replace('_', '-')}{suffix}" for key in layout['subnets']],
+        }
+
+    return desired
+
+
+def resolve(value, refs: dict):
+    if isinstance(value, str) and value.startswith('@'):
+        return refs.get(value[1:], value)
+    return value
+
+
+"""
+    Monitor
+"""
+class DriftMonitor:
+    """Compare live security groups and route tables against the desired lab layout on a schedule"""
+
+    def __init__(self, vpc_id: str, client, suffixes=('',), on_event=None):
+        self.vpc_id = vpc_id
+        self.client = client
+        self.desired = {}
+        for suffix in suffixes:
+            self.desired.update(desired_state(suffix))
+        self.on_event = on_event or print_event
+        # Name -> (content digest, digest of resolved references, drifted)
+        self.seen: dict[str, tuple[str, str, bool]] = {}
+        self.api_calls = 0
+
+    def fetch(self) -> tuple[dict, dict]:
+        """One filtered describe per resource type; returns live resources by Name and the name -> ID references"""
+        vpc_filter = {'Name': 'vpc-id', 'Values': [self.vpc_id]}
+        names = {'security-group': [], 'route-table': []}
+        for name, spec in self.desired.items():
+            names[spec['resource_type']].append(name)
+        subnet_names = sorted({ref[1:] for spec in self.desired.values() for ref in spec.get('subnets', [])})
+
+        live = {}
+        refs = {}
+
+        for page in self.client.get_paginator('describe_security_groups').paginate(
+            Filters=[vpc_filter, {'Name': 'tag:Name', 'Values': names['security-group']}]
+        ):
+            self.api_calls += 1
+            for sg in page['SecurityGroups']:
+                resource = from_security_group(sg)
+                live[resource.name] = resource
+                refs[resource.name] = resource.resource_id
+
+        for page in self.client.get_paginator('describe_route_tables').paginate(
+            Filters=[vpc_filter, {'Name': 'tag:Name', 'Values': names['route-table']}]
+        ):
+            self.api_calls += 1
+            for rt in page['RouteTables']:
+                resource = from_route_table(rt)
+                live[resource.name] = resource
+
+        if subnet_names:
+            response = self.client.describe_subnets(Filters=[vpc_filter, {'Name': 'tag:Name', 'Values': subnet_names}])
+            self.api_calls += 1
+            for subnet in response['Subnets']:
+                for tag in subnet.get('Tags', []):
+                    if tag['Key'] == 'Name':
+                        refs[tag['Value']] = subnet['SubnetId']
+                        break
+
+        response = self.client.describe_internet_gateways(Filters=[{'Name': 'attachment.vpc-id', 'Values': [self.vpc_id]}])
+        self.api_calls += 1
+        for igw in response['InternetGateways']:
+            refs['igw'] = igw['InternetGatewayId']
+
+        return live, refs
+
+    def compare(self, name: str, spec: dict, resource, refs: dict) -> dict:
+        """Full comparison of one live resource against its desired spec"""
+        details = {}
+        if spec['resource_type'] == 'security-group':
+            desired = {tuple(resolve(v, refs) for v in rule) for rule in spec['ingress']}
+            actual = {rule_key(rule) for rule in resource.data['ingress']}
+            missing, extra = desired - actual, actual - desired
+            if missing:
+                details['missing_ingress'] = sorted(missing)
+            if extra:
+                details['extra_ingress'] = sorted(extra)
+
+        elif spec['resource_type'] == 'route-table':
+            desired = {tuple(resolve(v, refs) for v in route) for route in spec['routes']}
+            actual = {route_key(route) for route in resource.data['routes'] if route['target'] != 'local'}
+            missing, extra = desired - actual, actual - desired
+            if missing:
+                details['missing_routes'] = sorted(missing)
+            if extra:
+                details['extra_routes'] = sorted(extra)
+
+            desired_subnets = {resolve(ref, refs) for ref in spec['subnets']}
+            actual_subnets = set(resource.data['subnets'])
+            if desired_subnets != actual_subnets:
+                details['subnets'] = {'expected': sorted(desired_subnets), 'actual': sorted(actual_subnets)}
+
+        return details
+
+    def check(self) -> list[dict]:
+        """Run one cycle; only resources whose content or references changed are compared in full"""
+        live, refs = self.fetch()
+        refs_digest = content_digest(refs, {})
+        events = []
+
+        for name, spec in self.desired.items():
+            resource = live.get(name)
+            previous = self.seen.get(name)
+
+            if resource is None:
+                if previous is None or previous[0] != 'missing':
+                    events.append(self.event('missing', name, spec['resource_type'], None, {}))
+                self.seen[name] = ('missing', refs_digest, True)
+                continue
+
+            if previous and previous[0] == resource.digest and previous[1] == refs_digest:
+                continue
+
+            details = self.compare(name, spec, resource, refs)
+            drifted = bool(details)
+            if drifted:
+                events.append(self.event('drift', name, spec['resource_type'], resource.resource_id, details))
+            elif previous and previous[2]:
+                events.append(self.event('resolved', name, spec['resource_type'], resource.resource_id, {}))
+            self.seen[name] = (resource.digest, refs_digest, drifted)
+
+        for event in events:
+            self.on_event(event)
+        return events
+
+    def event(self, kind: str, name: str, resource_type: str, resource_id: str | None, details: dict) -> dict:
+        return {
+            'time': time.time(),
+            'event': kind,
+            'vpc_id': self.vpc_id,
+            'resource_type': resource_type,
+            'resource_id': resource_id,
+            'name': name,
+            'details': details,
+        }
+
+    def run(self, interval: float, cycles: int | None = None):
+        cycle = 0
+        while cycles is None or cycle < cycles:
+            start = time.time()
+            calls_before = self.api_calls
+            events = self.check()
+            cycle += 1
+            print(f'- cycle {cycle}: {len(events)} event(s), {self.api_calls - calls_before} API call(s), {time.time() - start:.1f}s')
+            if cycles is None or cycle < cycles:
+                time.sleep(max(0.0, interval - (time.time() - start)))
+
+
+def print_event(event: dict):
+    resource = f"{event['resource_type']} {event['name']} ({event['resource_id'] or 'not found'})"
+    print(f"  - {event['event'].upper()}: {resource}")
+    for key, value in event['details'].items():
+        print(f'      {key}: {value}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch the lab security groups and route tables for drift')
+    parser.add_argument('--vpc', default=DEFAULT_VPC_ID)
+    parser.add_argument('--region', default=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'))
+    parser.add_argument('--suffix', action='append', default=None, help='lab name suffix, e.g. -lab00 (repeatable)')
+    parser.add_argument('--interval', type=float, default=300, help='seconds between cycles')
+    parser.add_argument('--cycles', type=int, default=None, help='stop after this many cycles')
+    parser.add_argument('--events-file', default=None, help='append drift events as JSON lines')
+    args = parser.parse_args()
+
+    from cleanup import make_client, verify_aws_credentials
+    verify_aws_credentials()
+
+    def on_event(event: dict):
+        print_event(event)
+        if args.events_file:
+            with open(args.events_file, 'a') as f:
+                f.write(json.dumps(event, default=list) + '\n')
+
+    # Drift comes from outside this process, so describes must always reach EC2
+    monitor = DriftMonitor(args.vpc, make_client(args.region, describe_cache=False), args.suffix or [''], on_event)
+    print(f'- monitoring {len(monitor.desired)} resource(s) in {args.vpc} every {args.interval:.0f}s')
+    try:
+        monitor.run(args.interval, args.cycles)
+    except KeyboardInterrupt:
+        print('- drift monitor stopped')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+import argparse
+import gzip
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+DEFAULT_ES_URL = 'http://localhost:9200'
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_MAX_DOCS = 1000
+DEFAULT_MAX_IN_FLIGHT = 2
+DEFAULT_MAX_RETRIES = 5
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(',', ':'), default=str).encode('utf-8')
+
+
+class BulkShipper:
+    """Ship documents to Elasticsearch with the _bulk API in size-bounded batches"""
+
+    def __init__(
+        self,
+        url: str = DEFAULT_ES_URL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_docs: int = DEFAULT_MAX_DOCS,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        compress: bool = True,
+        timeout: float = 30.0,
+        backoff: float = 0.5,
+    ):
+        self.url = url.rstrip('/') + '/_bulk'
+        self.max_bytes = max_bytes
+        self.max_docs = max_docs
+        self.max_retries = max_retries
+        self.compress = compress
+        self.timeout = timeout
+        self.backoff = backoff
+
+        self._items: list[bytes] = []
+        self._size = 0
+        self._window = threading.BoundedSemaphore(max_in_flight)
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='es-bulk')
+        self._futures = []
+        self._lock = threading.Lock()
+        self.stats = {'sent': 0, 'failed': 0, 'retried': 0, 'requests': 0, 'bytes': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    """
+        Batching
+    """
+    def add(self, action: dict, body: dict | None = None):
+        """Queue one bulk action, with its document or update body when the action needs one"""
+        item = _dumps(action) + b'\n'
+        if body is not None:
+            item += _dumps(body) + b'\n'
+
+        if self._items and self._size + len(item) > self.max_bytes:
+            self.flush()
+
+        self._items.append(item)
+        self._size += len(item)
+
+        if len(self._items) >= self.max_docs or self._size >= self.max_bytes:
+            self.flush()
+
+    def index(self, index: str, document: dict, doc_id: str | None = None):
+        action = {'_index': index}
+        if doc_id is not None:
+            action['_id'] = doc_id
+        self.add({'index': action}, document)
+
+    def ship(self, index: str, records: Iterable[dict], id_field: str | None = None) -> dict:
+        """Index every record from an iterable, then wait for all batches"""
+        for record in records:
+            self.index(index, record, str(record[id_field]) if id_field and record.get(id_field) is not None else None)
+        self.wait()
+        return self.stats
+
+    def flush(self):
+        """Hand the current batch to the sender pool, blocking while the window is full"""
+        if not self._items:
+            return
+
+        items = self._items
+        self._items = []
+        self._size = 0
+
+        self._window.acquire()
+        future = self._pool.submit(self._send_with_retries, items)
+        future.add_done_callback(lambda _: self._window.release())
+        # Failed batches stay until wait() so their exception is not lost
+        self._futures = [f for f in self._futures if not f.done() or f.exception() is not None]
+        self._futures.append(future)
+
+    def wait(self):
+        """Flush, then block until every batch is done and re-raise the first error a sender hit"""
+        self.flush()
+        futures, self._futures = self._futures, []
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    """
+        Sending
+    """
+    def _post(self, payload: bytes) -> tuple[int, dict | None]:
+        headers = {'Content-Type': 'application/x-ndjson'}
+        if self.compress:
+            payload = gzip.compress(payload, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
+
+        request = urllib.request.Request(self.url, data=payload, headers=headers, method='POST')
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += len(payload)
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+        # Raises ValueError on a truncated or garbled body, retried like a dropped connection
+        result = json.loads(body)
+        if not isinstance(result, dict):
+            raise ValueError(f'unexpected bulk response: {body[:100]!r}')
+        return status, result
+
+    def _send_with_retries(self, items: list[bytes]):
+        attempt = 0
+        while items:
+            try:
+                status, result = self._post(b''.join(items))
+            except (urllib.error.URLError, OSError, http.client.HTTPException, ValueError) as e:
+                status, result = None, None
+                print(f'- bulk request failed: {e}')
+
+            if status == 200 and result is not None:
+                rejected = []
+                failed = 0
+                outcomes = result.get('items', [])
+                for item, outcome in zip(items, outcomes):
+                    item_status = next(iter(outcome.values()), {}).get('status', 500)
+                    if item_status == 429:
+                        rejected.append(item)
+                    elif item_status >= 300:
+                        failed += 1
+                # Items the response does not mention may not have been applied
+                if len(outcomes) < len(items):
+                    print(f'- bulk response lists {len(outcomes)} of {len(items)} item(s), counting the rest as failed')
+                    failed += len(items) - len(outcomes)
+
+                with self._lock:
+                    self.stats['sent'] += len(items) - len(rejected) - failed
+                    self.stats['failed'] += failed
+                items = rejected
+            elif status is not None and status != 429 and status < 500:
+                print(f'- bulk request rejected with HTTP {status}, dropping {len(items)} item(s)')
+                with self._lock:
+                    self.stats['failed'] += len(items)
+                return
+
+            if not items:
+                return
+
+            attempt += 1
+            if attempt > self.max_retries:
+                print(f'- giving up on {len(items)} item(s) after {self.max_retries} retries')
+                with self._lock:
+                    self.stats['failed'] += len(items)
+                return
+
+            with self._lock:
+                self.stats['retried'] += len(items)
+            time.sleep(self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ship JSON lines from stdin to Elasticsearch')
+    parser.add_argument('index', help='target index')
+    parser.add_argument('--url', default=DEFAULT_ES_URL)
+    parser.add_argument('--id-field', default=None, help='record field used as document _id')
+    parser.add_argument('--max-bytes', type=int, default=DEFAULT_MAX_BYTES)
+    parser.add_argument('--max-docs', type=int, default=DEFAULT_MAX_DOCS)
+    parser.add_argument('--in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT)
+    parser.add_argument('--no-gzip', action='store_true')
+    args = parser.parse_args()
+
+    records = (json.loads(line) for line in sys.stdin if line.strip())
+    with BulkShipper(args.url, args.max_bytes, args.max_docs, args.in_flight, compress=not args.no_gzip) as shipper:
+        stats = shipper.ship(args.index, records, args.id_field)
+
+    print(f"- shipped {stats['sent']} document(s), {stats['failed']} failed, "
+          f"{stats['retried']} retried in {stats['requests']} request(s)")
+
+
+if __name__ == '__main__':
+    main()
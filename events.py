@@ -0,0 +1,218 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+def render(event: dict) -> str:
+    """One human-readable line per event, in the '- ...' style of the scripts"""
+    if event['action'] == 'log':
+        return f"- {event['detail']}"
+    parts = [event['action'], event['resource']]
+    if event.get('resource_id'):
+        parts.append(event['resource_id'])
+    if event.get('name'):
+        parts.append(f"({event['name']})")
+    line = ' '.join(parts)
+    if event.get('duration') is not None:
+        line += f" in {event['duration']:.2f}s"
+    if event['outcome'] != 'ok':
+        line = f"{event['outcome']}: {line}"
+    if event.get('detail'):
+        line += f": {event['detail']}"
+    return f'- {line}'
+
+
+"""
+    Sinks
+"""
+class TTYSink:
+    """Compact live status line on a terminal; one line per event when output is piped"""
+
+    def __init__(self, stream=None, live: bool | None = None):
+        self.output = stream
+        self.live = live
+        self.counts: dict[str, int] = {}
+        self.status_shown = False
+
+    @property
+    def stream(self):
+        # Looked up on every write: sys.stdout may be replaced (or closed) after the sink is created
+        return self.output or sys.stdout
+
+    def write(self, event: dict):
+        if not (self.stream.isatty() if self.live is None else self.live):
+            self.stream.write(render(event) + '\n')
+            return
+
+        if event['action'] == 'log' or event['outcome'] == 'error':
+            # Messages and errors stay on screen above the status line
+            self.clear_status()
+            self.stream.write(render(event) + '\n')
+        if event['action'] != 'log':
+            key = event['outcome'] if event['outcome'] != 'ok' else event['action']
+            self.counts[key] = self.counts.get(key, 0) + 1
+            summary = ', '.join(f'{count} {key}' for key, count in sorted(self.counts.items()))
+            self.stream.write(f'\r\x1b[K- {summary} | last: {render(event)[2:]}')
+            self.status_shown = True
+        self.stream.flush()
+
+    def clear_status(self):
+        if self.status_shown:
+            self.stream.write('\r\x1b[K')
+            self.status_shown = False
+
+    def flush(self):
+        # Leave the last status line on screen so regular prints start on a new line
+        if self.status_shown:
+            self.stream.write('\n')
+            self.status_shown = False
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class JsonLinesSink:
+    """Every event as one JSON object per line, for timing analysis"""
+
+    def __init__(self, path: str):
+        self.file = open(path, 'a')
+
+    def write(self, event: dict):
+        self.file.write(json.dumps(event, default=str) + '\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class LogFileSink:
+    """Timestamped rendered events in a plain log file"""
+
+    def __init__(self, path: str):
+        self.logger = logging.getLogger(f'polystudentlab.events.{id(self)}')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.handler = logging.FileHandler(path)
+        self.handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+        self.logger.addHandler(self.handler)
+
+    def write(self, event: dict):
+        level = logging.ERROR if event['outcome'] == 'error' else logging.INFO
+        self.logger.log(level, render(event)[2:])
+
+    def flush(self):
+        self.handler.flush()
+
+    def close(self):
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+
+
+"""
+    Bus
+"""
+class EventBus:
+    """Buffer typed progress events in a queue and hand them to the sinks from one background thread"""
+
+    def __init__(self, sinks: list | None = None, context: dict | None = None):
+        self.sinks = sinks if sinks is not None else [TTYSink()]
+        # Fields added to every event, e.g. the run ID
+        self.context = context or {}
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread = None
+        self.start_lock = threading.Lock()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def _start(self):
+        with self.start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._dispatch, name='events', daemon=True)
+                self.thread.start()
+
+    def _dispatch(self):
+        while True:
+            event = self.queue.get()
+            if isinstance(event, threading.Event):
+                # Flush marker: everything queued before it has been written
+                for sink in self.sinks:
+                    try:
+                        sink.flush()
+                    except Exception:
+                        pass
+                event.set()
+                continue
+            for sink in self.sinks:
+                try:
+                    sink.write(event)
+                except Exception:
+                    pass
+
+    def emit(self, action: str, resource: str, resource_id: str | None = None, name: str | None = None,
+             outcome: str = 'ok', duration: float | None = None, detail: str | None = None):
+        if self.thread is None:
+            self._start()
+        self.queue.put({
+            'time': time.time(),
+            'action': action,
+            'resource': resource,
+            'resource_id': resource_id,
+            'name': name,
+            'outcome': outcome,
+            'duration': duration,
+            'detail': detail,
+            **self.context,
+        })
+
+    def log(self, message: str, outcome: str = 'info'):
+        self.emit('log', 'message', outcome=outcome, detail=message)
+
+    def error(self, message: str, error: BaseException):
+        """Log an error, unless the timed step that raised it already emitted it"""
+        if not getattr(error, 'reported_by_event', False):
+            self.log(f'{message}: {error}', 'error')
+
+    @contextmanager
+    def timed(self, action: str, resource: str, resource_id: str | None = None, name: str | None = None):
+        """Emit one event for the wrapped step with its duration; fields set on the yielded dict are kept"""
+        fields = {'resource_id': resource_id, 'name': name, 'detail': None}
+        start = time.monotonic()
+        try:
+            yield fields
+        except BaseException as e:
+            self.emit(action, resource, fields['resource_id'], fields['name'], 'error', time.monotonic() - start, str(e) or repr(e))
+            try:
+                e.reported_by_event = True
+            except AttributeError:
+                pass
+            raise
+        self.emit(action, resource, fields['resource_id'], fields['name'], 'ok', time.monotonic() - start, fields['detail'])
+
+    def flush(self, timeout: float = 5.0):
+        if self.thread is None:
+            return
+        marker = threading.Event()
+        self.queue.put(marker)
+        marker.wait(timeout)
+
+    def close(self):
+        self.flush()
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except (OSError, ValueError):
+                # At interpreter exit the stream or file may already be closed
+                pass
+
+
+EVENTS = EventBus()
+atexit.register(EVENTS.close)
@@ -0,0 +1,363 @@
+import argparse
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from es_shipper import DEFAULT_ES_URL, BulkShipper
+
+ALERTS_INDEX_PREFIX = 'ossec-alerts-'
+CVES_INDEX = 'trivy-cves'
+ALERTS_ROLLUP_INDEX = 'rollup-alerts-hourly'
+CVES_ROLLUP_INDEX = 'rollup-cves-image'
+
+# Pending rollup increments are sent after this many findings, pre-aggregated per rollup document
+DEFAULT_ROLLUP_EVERY = 10000
+
+# OSSEC rule level (0-15) -> severity, first threshold reached wins
+OSSEC_SEVERITY = [(12, 'critical'), (8, 'high'), (4, 'medium'), (0, 'low')]
+
+# Single-node lab cluster with a 256 MB heap: one shard, no replicas
+BASE_SETTINGS = {'number_of_shards': 1, 'number_of_replicas': 0}
+
+INDEX_TEMPLATES = {
+    'ossec-alerts': {
+        'index_patterns': [f'{ALERTS_INDEX_PREFIX}*'],
+        'template': {
+            'settings': {**BASE_SETTINGS, 'refresh_interval': '30s', 'codec': 'best_compression'},
+            'mappings': {
+                # Parser fields that are not mapped stay in _source without growing the mapping
+                'dynamic': False,
+                # The raw log lines stay searchable but are not stored again; alerts.log keeps them
+                '_source': {'excludes': ['log']},
+                'properties': {
+                    'id': {'type': 'keyword'},
+                    'timestamp': {'type': 'date', 'format': 'epoch_second'},
+                    'groups': {'type': 'keyword'},
+                    'agent': {'type': 'keyword'},
+                    'host': {'type': 'keyword'},
+                    'location': {'type': 'keyword', 'ignore_above': 512},
+                    'rule_id': {'type': 'keyword'},
+                    'level': {'type': 'short'},
+                    'severity': {'type': 'keyword'},
+                    'description': {'type': 'keyword', 'ignore_above': 512},
+                    'srcip': {'type': 'ip', 'ignore_malformed': True},
+                    'dstip': {'type': 'ip', 'ignore_malformed': True},
+                    'srcport': {'type': 'keyword'},
+                    'dstport': {'type': 'keyword'},
+                    'user': {'type': 'keyword'},
+                    'log': {'type': 'text', 'norms': False, 'index_options': 'docs'},
+                },
+            },
+        },
+    },
+    'trivy-cves': {
+        'index_patterns': [CVES_INDEX],
+        'template': {
+            'settings': {**BASE_SETTINGS, 'refresh_interval': '30s', 'codec': 'best_compression'},
+            'mappings': {
+                'dynamic': False,
+                'properties': {
+                    'image': {'type': 'keyword'},
+                    'target': {'type': 'keyword'},
+                    'cve_id': {'type': 'keyword'},
+                    'package': {'type': 'keyword'},
+                    'installed_version': {'type': 'keyword'},
+                    'fixed_version': {'type': 'keyword'},
+                    'severity': {'type': 'keyword'},
+                    'title': {'type': 'text', 'norms': False},
+                    'scanned_at': {'type': 'date', 'format': 'epoch_second'},
+                },
+            },
+        },
+    },
+    # Rollups keep _source: scripted updates read and rewrite it
+    'rollup-alerts-hourly': {
+        'index_patterns': [ALERTS_ROLLUP_INDEX],
+        'template': {
+            'settings': {**BASE_SETTINGS, 'refresh_interval': '5s'},
+            'mappings': {
+                'dynamic': 'strict',
+                'properties': {
+                    'hour': {'type': 'date', 'format': 'epoch_second'},
+                    'host': {'type': 'keyword'},
+                    'rule_id': {'type': 'keyword'},
+                    'severity': {'type': 'keyword'},
+                    'level': {'type': 'short'},
+                    'description': {'type': 'keyword', 'ignore_above': 512},
+                    'count': {'type': 'long'},
+                    # Only read by the update script to count each alert once, however often it is shipped
+                    'alert_ids': {'type': 'keyword', 'index': False, 'doc_values': False},
+                    'last_seen': {'type': 'date', 'format': 'epoch_second'},
+                },
+            },
+        },
+    },
+    'rollup-cves-image': {
+        'index_patterns': [CVES_ROLLUP_INDEX],
+        'template': {
+            'settings': {**BASE_SETTINGS, 'refresh_interval': '5s'},
+            'mappings': {
+                'dynamic': 'strict',
+                'properties': {
+                    'image': {'type': 'keyword'},
+                    'severity': {'type': 'keyword'},
+                    'count': {'type': 'long'},
+                    # Only read by the update script to count each CVE once per image
+                    'cve_ids': {'type': 'keyword', 'index': False, 'doc_values': False},
+                    'updated_at': {'type': 'date', 'format': 'epoch_second'},
+                },
+            },
+        },
+    },
+}
+
+# Inline scripts keep the same source for every update, so Elasticsearch compiles each once.
+# Both only count IDs the rollup has not seen, so re-shipping a file or retrying a bulk request is a no-op.
+ALERT_ROLLUP_SCRIPT = (
+    'Set seen = new HashSet(ctx._source.alert_ids); int added = params.unnamed; '
+    'for (alertId in params.alert_ids) { if (seen.add(alertId)) { ctx._source.alert_ids.add(alertId); added++ } } '
+    "if (added == 0) { ctx.op = 'noop' } else { ctx._source.count += added; "
+    'if (params.last_seen > ctx._source.last_seen) { ctx._source.last_seen = params.last_seen } }'
+)
+CVE_ROLLUP_SCRIPT = (
+    'int added = 0; '
+    'for (cve in params.cve_ids) { if (!ctx._source.cve_ids.contains(cve)) { ctx._source.cve_ids.add(cve); added++ } } '
+    "if (added == 0) { ctx.op = 'noop' } else { ctx._source.count += added; ctx._source.updated_at = params.updated_at }"
+)
+
+
+def alert_severity(level: int | None) -> str:
+    for threshold, severity in OSSEC_SEVERITY:
+        if (level or 0) >= threshold:
+            return severity
+    return 'low'
+
+
+def trivy_findings(report, image: str | None = None) -> list[dict]:
+    """Flatten a Trivy JSON report (object with Results, or the older bare list) into one document per CVE"""
+    if isinstance(report, dict):
+        image = image or report.get('ArtifactName')
+        results = report.get('Results') or []
+    else:
+        results = report
+    scanned_at = int(time.time())
+
+    findings = []
+    for result in results:
+        for vulnerability in result.get('Vulnerabilities') or []:
+            findings.append({
+                'image': image or result.get('Target'),
+                'target': result.get('Target'),
+                'cve_id': vulnerability['VulnerabilityID'],
+                'package': vulnerability.get('PkgName'),
+                'installed_version': vulnerability.get('InstalledVersion'),
+                'fixed_version': vulnerability.get('FixedVersion'),
+                'severity': (vulnerability.get('Severity') or 'UNKNOWN').lower(),
+                'title': vulnerability.get('Title'),
+                'scanned_at': scanned_at,
+            })
+    return findings
+
+
+class FindingsStore:
+    """Index raw OSSEC alerts and Trivy CVEs, and keep small rollup documents up to date at ingest
+
+    Rollup increments are pre-aggregated in memory and sent as scripted upserts on the same
+    _bulk stream as the raw documents, so dashboards only ever query the rollup indices.
+    """
+
+    def __init__(self, url: str = DEFAULT_ES_URL, shipper: BulkShipper | None = None,
+                 rollup_every: int = DEFAULT_ROLLUP_EVERY, timeout: float = 30.0):
+        self.url = url.rstrip('/')
+        self.shipper = shipper or BulkShipper(url)
+        self.rollup_every = rollup_every
+        self.timeout = timeout
+        # (hour, host, rule_id, severity) -> pending alert IDs; (image, severity) -> pending CVE IDs
+        self.alert_counts: dict[tuple, dict] = {}
+        self.image_cves: dict[tuple, set[str]] = {}
+        self.pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, method: str, path: str, body: dict | None = None) -> dict:
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(
+            f'{self.url}/{path.lstrip("/")}', data=data, method=method,
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read() or b'{}')
+
+    def install_templates(self):
+        """Create or update the index templates; they apply to indices created afterwards"""
+        for name, template in INDEX_TEMPLATES.items():
+            self.request('PUT', f'_index_template/{name}', {**template, 'priority': 100})
+
+    """
+        Ingest
+    """
+    def add_alert(self, record: dict):
+        severity = alert_severity(record.get('level'))
+        timestamp = record.get('timestamp') or int(time.time())
+        index = ALERTS_INDEX_PREFIX + time.strftime('%Y.%m.%d', time.gmtime(timestamp))
+        # Alert IDs are unique in alerts.log, so re-shipping the same alert overwrites it
+        self.shipper.index(index, {**record, 'severity': severity}, record.get('id'))
+
+        key = (timestamp - timestamp % 3600, record.get('host'), str(record.get('rule_id') or ''), severity)
+        rollup = self.alert_counts.get(key)
+        if rollup is None:
+            rollup = self.alert_counts[key] = {
+                'level': record.get('level'), 'description': record.get('description'),
+                'alert_ids': set(), 'unnamed': 0, 'last_seen': timestamp,
+            }
+        # Alerts without an ID (not produced by ossec_parser) cannot be told apart and are always counted
+        if record.get('id'):
+            rollup['alert_ids'].add(record['id'])
+        else:
+            rollup['unnamed'] += 1
+        rollup['last_seen'] = max(rollup['last_seen'], timestamp)
+        self.added()
+
+    def add_cve(self, finding: dict):
+        doc_id = f"{finding['image']}|{finding['target']}|{finding['cve_id']}|{finding['package']}"
+        self.shipper.index(CVES_INDEX, finding, doc_id)
+        self.image_cves.setdefault((finding['image'], finding['severity']), set()).add(finding['cve_id'])
+        self.added()
+
+    def added(self):
+        self.pending += 1
+        if self.pending >= self.rollup_every:
+            self.flush_rollups()
+
+    def flush_rollups(self):
+        """Queue one scripted upsert per touched rollup document"""
+        for (hour, host, rule_id, severity), rollup in self.alert_counts.items():
+            alert_ids = sorted(rollup['alert_ids'])
+            self.shipper.add(
+                {'update': {'_index': ALERTS_ROLLUP_INDEX, '_id': f'{hour}|{host}|{rule_id}|{severity}', 'retry_on_conflict': 5}},
+                {
+                    'script': {'source': ALERT_ROLLUP_SCRIPT, 'lang': 'painless',
+                               'params': {'alert_ids': alert_ids, 'unnamed': rollup['unnamed'], 'last_seen': rollup['last_seen']}},
+                    'upsert': {'hour': hour, 'host': host, 'rule_id': rule_id, 'severity': severity,
+                               'level': rollup['level'], 'description': rollup['description'],
+                               'count': len(alert_ids) + rollup['unnamed'], 'alert_ids': alert_ids, 'last_seen': rollup['last_seen']},
+                }
+            )
+
+        updated_at = int(time.time())
+        for (image, severity), cve_ids in self.image_cves.items():
+            cve_ids = sorted(cve_ids)
+            self.shipper.add(
+                {'update': {'_index': CVES_ROLLUP_INDEX, '_id': f'{image}|{severity}', 'retry_on_conflict': 5}},
+                {
+                    'script': {'source': CVE_ROLLUP_SCRIPT, 'lang': 'painless',
+                               'params': {'cve_ids': cve_ids, 'updated_at': updated_at}},
+                    'upsert': {'image': image, 'severity': severity, 'count': len(cve_ids),
+                               'cve_ids': cve_ids, 'updated_at': updated_at},
+                }
+            )
+
+        self.alert_counts = {}
+        self.image_cves = {}
+        self.pending = 0
+
+    def close(self):
+        self.flush_rollups()
+        self.shipper.close()
+
+    """
+        Dashboard queries, over the rollup indices only
+    """
+    def alert_summary(self, hours: float = 24, by: str = 'host', size: int = 10) -> list[tuple[str, int]]:
+        """Alert counts of the last hours grouped by host, rule_id or severity, largest first"""
+        since = int(time.time() - hours * 3600)
+        response = self.request('POST', f'{ALERTS_ROLLUP_INDEX}/_search', {
+            'size': 0,
+            'query': {'range': {'hour': {'gte': since - since % 3600}}},
+            'aggs': {'groups': {
+                'terms': {'field': by, 'size': size, 'order': {'alerts': 'desc'}},
+                'aggs': {'alerts': {'sum': {'field': 'count'}}},
+            }},
+        })
+        return [(bucket['key'], int(bucket['alerts']['value'])) for bucket in response['aggregations']['groups']['buckets']]
+
+    def cve_summary(self, size: int = 50) -> dict[str, dict[str, int]]:
+        """Distinct CVE counts per image and severity"""
+        response = self.request('POST', f'{CVES_ROLLUP_INDEX}/_search', {
+            'size': size,
+            '_source': ['image', 'severity', 'count'],
+            'query': {'match_all': {}},
+        })
+        summary = {}
+        for hit in response['hits']['hits']:
+            source = hit['_source']
+            summary.setdefault(source['image'], {})[source['severity']] = source['count']
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Store OSSEC alerts and Trivy CVEs in Elasticsearch with rollups')
+    parser.add_argument('--url', default=DEFAULT_ES_URL)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('setup', help='install the index templates')
+
+    alerts = commands.add_parser('alerts', help='ingest an OSSEC alerts.log')
+    alerts.add_argument('path', help='alerts.log path, or - to read stdin')
+    alerts.add_argument('--state', default=None, help='offset state file, to only ship new alerts')
+
+    cves = commands.add_parser('cves', help='ingest a Trivy JSON report')
+    cves.add_argument('path')
+    cves.add_argument('--image', default=None, help='image name, when the report does not carry it')
+
+    summary = commands.add_parser('summary', help='print dashboard summaries from the rollups')
+    summary.add_argument('--hours', type=float, default=24)
+    summary.add_argument('--by', choices=['host', 'rule_id', 'severity'], default='host')
+    args = parser.parse_args()
+
+    store = FindingsStore(args.url)
+    start = time.time()
+    try:
+        if args.command == 'setup':
+            store.install_templates()
+            print(f'- installed {len(INDEX_TEMPLATES)} index template(s)')
+
+        elif args.command == 'alerts':
+            from ossec_parser import read_alerts, read_stream
+            records = read_stream(sys.stdin.buffer) if args.path == '-' else read_alerts(args.path, args.state)
+            count = 0
+            for record in records:
+                store.add_alert(record)
+                count += 1
+            store.close()
+            print(f'- ingested {count} alert(s) in {time.time() - start:.1f}s: {store.shipper.stats}')
+
+        elif args.command == 'cves':
+            with open(args.path, 'r') as f:
+                findings = trivy_findings(json.load(f), args.image)
+            for finding in findings:
+                store.add_cve(finding)
+            store.close()
+            print(f'- ingested {len(findings)} CVE finding(s) in {time.time() - start:.1f}s: {store.shipper.stats}')
+
+        elif args.command == 'summary':
+            print(f'- alerts of the last {args.hours:.0f}h by {args.by}:')
+            for key, count in store.alert_summary(args.hours, args.by):
+                print(f'  - {key}: {count}')
+            print('- CVEs per image:')
+            for image, counts in store.cve_summary().items():
+                print(f'  - {image}: ' + ', '.join(f'{count} {severity}' for severity, count in sorted(counts.items())))
+
+    except (urllib.error.URLError, OSError) as e:
+        print(f'- request to {args.url} failed: {e}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
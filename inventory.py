@@ -0,0 +1,355 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS resources (
+    resource_id TEXT PRIMARY KEY,
+    resource_type TEXT NOT NULL,
+    vpc_id TEXT,
+    name TEXT,
+    digest TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (resource_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS resources_type ON resources (resource_type);
+CREATE INDEX IF NOT EXISTS tags_key_value ON tags (key, value);
+CREATE INDEX IF NOT EXISTS tags_resource ON tags (resource_id);
+"""
+
+
+class Resource:
+    """Compact record of one EC2 resource: its IDs, tags and the fields the tools compare"""
+
+    __slots__ = ('resource_id', 'resource_type', 'vpc_id', 'name', 'tags', 'data', 'digest')
+
+    def __init__(self, resource_id: str, resource_type: str, vpc_id: str | None, tags: dict, data: dict, digest: str | None = None):
+        self.resource_id = resource_id
+        self.resource_type = resource_type
+        self.vpc_id = vpc_id
+        self.tags = tags
+        self.name = tags.get('Name', 'N/A')
+        self.data = data
+        self.digest = digest or content_digest(tags, data)
+
+    def __repr__(self):
+        return f'Resource({self.resource_type} {self.resource_id} {self.name})'
+
+
+class Inventory:
+    """Set of resources indexed by ID, type and tag"""
+
+    def __init__(self, meta: dict | None = None):
+        self.meta = meta or {}
+        self.resources: dict[str, Resource] = {}
+        self.by_type_index: dict[str, list[Resource]] = {}
+        self.tag_index: dict[tuple[str, str], list[Resource]] = {}
+
+    def __len__(self):
+        return len(self.resources)
+
+    def __iter__(self):
+        return iter(self.resources.values())
+
+    def add(self, resource: Resource):
+        self.resources[resource.resource_id] = resource
+        self.by_type_index.setdefault(resource.resource_type, []).append(resource)
+        for item in resource.tags.items():
+            self.tag_index.setdefault(item, []).append(resource)
+
+    def get(self, resource_id: str) -> Resource | None:
+        return self.resources.get(resource_id)
+
+    def by_type(self, resource_type: str) -> list[Resource]:
+        return self.by_type_index.get(resource_type, [])
+
+    def by_tag(self, key: str, value: str) -> list[Resource]:
+        return self.tag_index.get((key, value), [])
+
+    def name(self, resource_id: str) -> str:
+        resource = self.resources.get(resource_id)
+        return resource.name if resource else 'N/A'
+
+
+"""
+    Normalization
+"""
+def content_digest(tags: dict, data: dict) -> str:
+    payload = json.dumps([tags, data], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def tags_to_dict(tags: list | None) -> dict:
+    return {tag['Key']: tag['Value'] for tag in tags or []}
+
+
+def normalize_permissions(permissions: list) -> list[dict]:
+    """Flatten IpPermissions into one sorted rule per (protocol, port range, source)"""
+    rules = []
+    for permission in permissions:
+        base = {
+            'protocol': permission.get('IpProtocol', '-1'),
+            'from': permission.get('FromPort', -1),
+            'to': permission.get('ToPort', -1),
+        }
+        for ip_range in permission.get('IpRanges', []):
+            rules.append({**base, 'source': ip_range['CidrIp']})
+        for ip_range in permission.get('Ipv6Ranges', []):
+            rules.append({**base, 'source': ip_range['CidrIpv6']})
+        for pair in permission.get('UserIdGroupPairs', []):
+            rules.append({**base, 'source': pair['GroupId']})
+        for prefix_list in permission.get('PrefixListIds', []):
+            rules.append({**base, 'source': prefix_list['PrefixListId']})
+    return sorted(rules, key=lambda r: (r['protocol'], r['from'], r['to'], r['source']))
+
+
+def normalize_routes(routes: list) -> list[dict]:
+    normalized = []
+    for route in routes:
+        destination = route.get('DestinationCidrBlock') or route.get('DestinationIpv6CidrBlock') or route.get('DestinationPrefixListId')
+        target = (route.get('GatewayId') or route.get('NatGatewayId') or route.get('NetworkInterfaceId')
+                  or route.get('TransitGatewayId') or route.get('VpcPeeringConnectionId') or route.get('InstanceId'))
+        normalized.append({'destination': destination, 'target': target, 'state': route.get('State', 'active')})
+    return sorted(normalized, key=lambda r: (r['destination'] or '', r['target'] or ''))
+
+
+def from_instance(instance: dict) -> Resource:
+    return Resource(instance['InstanceId'], 'instance', instance.get('VpcId'), tags_to_dict(instance.get('Tags')), {
+        'state': instance['State']['Name'],
+        'instance_type': instance.get('InstanceType'),
+        'image_id': instance.get('ImageId'),
+        'subnet_id': instance.get('SubnetId'),
+        'private_ip': instance.get('PrivateIpAddress'),
+        'public_ip': instance.get('PublicIpAddress'),
+        'security_groups': sorted(sg['GroupId'] for sg in instance.get('SecurityGroups', [])),
+        'monitoring': instance.get('Monitoring', {}).get('State'),
+        'http_tokens': instance.get('MetadataOptions', {}).get('HttpTokens'),
+        'iam_profile': instance.get('IamInstanceProfile', {}).get('Arn'),
+        'ebs_optimized': instance.get('EbsOptimized', False),
+    })
+
+
+def from_subnet(subnet: dict) -> Resource:
+    return Resource(subnet['SubnetId'], 'subnet', subnet['VpcId'], tags_to_dict(subnet.get('Tags')), {
+        'cidr': subnet['CidrBlock'],
+        'availability_zone': subnet['AvailabilityZone'],
+        'map_public_ip': subnet.get('MapPublicIpOnLaunch', False),
+    })
+
+
+def from_route_table(rt: dict) -> Resource:
+    associations = rt.get('Associations', [])
+    return Resource(rt['RouteTableId'], 'route-table', rt['VpcId'], tags_to_dict(rt.get('Tags')), {
+        'main': any(assoc.get('Main', False) for assoc in associations),
+        'subnets': sorted(assoc['SubnetId'] for assoc in associations if assoc.get('SubnetId')),
+        'routes': normalize_routes(rt.get('Routes', [])),
+    })
+
+
+def from_security_group(sg: dict) -> Resource:
+    return Resource(sg['GroupId'], 'security-group', sg.get('VpcId'), tags_to_dict(sg.get('Tags')), {
+        'group_name': sg['GroupName'],
+        'ingress': normalize_permissions(sg.get('IpPermissions', [])),
+        'egress': normalize_permissions(sg.get('IpPermissionsEgress', [])),
+    })
+
+
+def from_network_acl(acl: dict) -> Resource:
+    entries = []
+    for entry in acl.get('Entries', []):
+        port_range = entry.get('PortRange', {})
+        entries.append({
+            'rule_number': entry['RuleNumber'],
+            'egress': entry['Egress'],
+            'protocol': entry['Protocol'],
+            'action': entry['RuleAction'],
+            'cidr': entry.get('CidrBlock') or entry.get('Ipv6CidrBlock'),
+            'from': port_range.get('From', -1),
+            'to': port_range.get('To', -1),
+        })
+    return Resource(acl['NetworkAclId'], 'network-acl', acl['VpcId'], tags_to_dict(acl.get('Tags')), {
+        'default': acl.get('IsDefault', False),
+        'subnets': sorted(assoc['SubnetId'] for assoc in acl.get('Associations', [])),
+        'entries': sorted(entries, key=lambda e: (e['egress'], e['rule_number'])),
+    })
+
+
+def from_internet_gateway(igw: dict) -> Resource:
+    vpc_ids = sorted(attachment['VpcId'] for attachment in igw.get('Attachments', []))
+    return Resource(igw['InternetGatewayId'], 'internet-gateway', vpc_ids[0] if vpc_ids else None, tags_to_dict(igw.get('Tags')), {
+        'vpcs': vpc_ids,
+    })
+
+
+def from_network_interface(eni: dict) -> Resource:
+    return Resource(eni['NetworkInterfaceId'], 'network-interface', eni['VpcId'], tags_to_dict(eni.get('TagSet')), {
+        'status': eni['Status'],
+        'subnet_id': eni['SubnetId'],
+        'private_ip': eni.get('PrivateIpAddress'),
+        'instance_id': eni.get('Attachment', {}).get('InstanceId'),
+        'security_groups': sorted(group['GroupId'] for group in eni.get('Groups', [])),
+    })
+
+
+def from_vpc(vpc: dict) -> Resource:
+    return Resource(vpc['VpcId'], 'vpc', vpc['VpcId'], tags_to_dict(vpc.get('Tags')), {
+        'cidr': vpc['CidrBlock'],
+    })
+
+
+# resource type -> (describe operation, response key, filter name for the VPC, converter)
+COLLECTORS = {
+    'vpc': ('describe_vpcs', 'Vpcs', 'vpc-id', from_vpc),
+    'subnet': ('describe_subnets', 'Subnets', 'vpc-id', from_subnet),
+    'route-table': ('describe_route_tables', 'RouteTables', 'vpc-id', from_route_table),
+    'internet-gateway': ('describe_internet_gateways', 'InternetGateways', 'attachment.vpc-id', from_internet_gateway),
+    'security-group': ('describe_security_groups', 'SecurityGroups', 'vpc-id', from_security_group),
+    'network-acl': ('describe_network_acls', 'NetworkAcls', 'vpc-id', from_network_acl),
+    'network-interface': ('describe_network_interfaces', 'NetworkInterfaces', 'vpc-id', from_network_interface),
+    'instance': ('describe_instances', 'Reservations', 'vpc-id', from_instance),
+}
+
+
+"""
+    Snapshot
+"""
+def collect(vpc_id: str, client, resource_types=None) -> Inventory:
+    """Describe every resource type in a VPC once and keep only the compact records"""
+    inventory = Inventory({'vpc_id': vpc_id, 'region': client.meta.region_name, 'captured_at': time.time()})
+
+    for resource_type in resource_types or COLLECTORS:
+        operation, key, filter_name, convert = COLLECTORS[resource_type]
+        filters = [{'Name': filter_name, 'Values': [vpc_id]}]
+        if resource_type == 'instance':
+            filters.append({'Name': 'instance-state-name', 'Values': ['pending', 'running', 'stopping', 'stopped']})
+
+        for page in client.get_paginator(operation).paginate(Filters=filters):
+            for item in page[key]:
+                if resource_type == 'instance':
+                    for instance in item['Instances']:
+                        inventory.add(convert(instance))
+                else:
+                    inventory.add(convert(item))
+
+    return inventory
+
+
+def save(inventory: Inventory, path: str):
+    tmp_path = f'{path}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    with sqlite3.connect(tmp_path) as db:
+        db.executescript(SCHEMA)
+        db.executemany('INSERT INTO meta VALUES (?, ?)', ((k, json.dumps(v)) for k, v in inventory.meta.items()))
+        db.executemany('INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?)', (
+            (r.resource_id, r.resource_type, r.vpc_id, r.name, r.digest, json.dumps(r.data, separators=(',', ':')))
+            for r in inventory
+        ))
+        db.executemany('INSERT INTO tags VALUES (?, ?, ?)', (
+            (r.resource_id, key, value) for r in inventory for key, value in r.tags.items()
+        ))
+    db.close()
+    os.replace(tmp_path, path)
+
+
+def load(path: str) -> Inventory:
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+
+    db = sqlite3.connect(path)
+    try:
+        meta = {key: json.loads(value) for key, value in db.execute('SELECT key, value FROM meta')}
+        tags = {}
+        for resource_id, key, value in db.execute('SELECT resource_id, key, value FROM tags'):
+            tags.setdefault(resource_id, {})[key] = value
+
+        inventory = Inventory(meta)
+        for resource_id, resource_type, vpc_id, digest, data in db.execute(
+            'SELECT resource_id, resource_type, vpc_id, digest, data FROM resources'
+        ):
+            inventory.add(Resource(resource_id, resource_type, vpc_id, tags.get(resource_id, {}), json.loads(data), digest))
+    finally:
+        db.close()
+
+    return inventory
+
+
+def diff(old: Inventory, new: Inventory) -> dict:
+    """Compare two snapshots by content digest"""
+    old_ids = old.resources.keys()
+    new_ids = new.resources.keys()
+    return {
+        'added': sorted(new_ids - old_ids),
+        'removed': sorted(old_ids - new_ids),
+        'changed': sorted(
+            resource_id for resource_id in old_ids & new_ids
+            if old.resources[resource_id].digest != new.resources[resource_id].digest
+        ),
+    }
+
+
+def print_diff(changes: dict, old: Inventory, new: Inventory):
+    for label, symbol, source in (('added', '+', new), ('removed', '-', old), ('changed', '~', new)):
+        for resource_id in changes[label]:
+            resource = source.get(resource_id)
+            print(f'  {symbol} {resource.resource_type:<18} {resource_id:<24} {resource.name}')
+    print(f"- {len(changes['added'])} added, {len(changes['removed'])} removed, {len(changes['changed'])} changed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snapshot, inspect and diff VPC inventories')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    snapshot = commands.add_parser('snapshot', help='capture a VPC into a SQLite snapshot')
+    snapshot.add_argument('vpc', help='VPC ID')
+    snapshot.add_argument('output', help='snapshot file to write')
+    snapshot.add_argument('--region', default=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'))
+
+    show = commands.add_parser('show', help='list resources in a snapshot')
+    show.add_argument('snapshot')
+    show.add_argument('--type', default=None)
+    show.add_argument('--tag', default=None, help='Key=Value')
+
+    compare = commands.add_parser('diff', help='compare two snapshots')
+    compare.add_argument('old')
+    compare.add_argument('new')
+
+    args = parser.parse_args()
+
+    if args.command == 'snapshot':
+        from cleanup import make_client, verify_aws_credentials
+        verify_aws_credentials()
+        print(f'- capturing inventory of {args.vpc}')
+        inventory = collect(args.vpc, make_client(args.region))
+        save(inventory, args.output)
+        print(f'- saved {len(inventory)} resource(s) to {args.output}')
+
+    elif args.command == 'show':
+        inventory = load(args.snapshot)
+        if args.tag:
+            key, _, value = args.tag.partition('=')
+            resources = inventory.by_tag(key, value)
+        else:
+            resources = list(inventory)
+        for resource in resources:
+            if args.type and resource.resource_type != args.type:
+                continue
+            print(f'  - {resource.resource_type:<18} {resource.resource_id:<24} {resource.name}')
+
+    elif args.command == 'diff':
+        try:
+            old, new = load(args.old), load(args.new)
+        except FileNotFoundError as e:
+            print(f'- snapshot {e} not found')
+            sys.exit(1)
+        print_diff(diff(old, new), old, new)
+
+
+if __name__ == '__main__':
+    main()
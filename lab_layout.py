@@ -0,0 +1,141 @@
+import os
+import sys
+
+from events import EVENTS
+
+# Static definition of a polystudent lab, shared by main.py, async_ec2.py, preflight.py, planner.py and drift.py.
+# Run state (client, run ID, manifest) stays in main.py and is passed explicitly.
+
+DEFAULT_VPC_ID = 'vpc-0bdc139fd9ee529cc'
+DEFAULT_UBUNTU_AMI = 'ami-0ecb62995f68bb549'
+DEFAULT_WINDOWS_AMI = 'ami-0b4bc1e90f30ca1ec'
+DEFAULT_IAM_PROFILE = 'LabInstanceProfile'
+DEFAULT_PROFILE = 'dev'
+MAX_FLEET_SIZE = 16
+
+RUN_ID_TAG = 'RunId'
+
+APP_INGRESS_RULES = [
+    {'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'CidrIp': '0.0.0.0/0', 'Description': 'SSH'},
+    {'IpProtocol': 'tcp', 'FromPort': 80, 'ToPort': 80, 'CidrIp': '0.0.0.0/0', 'Description': 'HTTP'},
+    {'IpProtocol': 'tcp', 'FromPort': 443, 'ToPort': 443, 'CidrIp': '0.0.0.0/0', 'Description': 'HTTPS'},
+    {'IpProtocol': 'tcp', 'FromPort': 1514, 'ToPort': 1514, 'CidrIp': '0.0.0.0/0', 'Description': 'OSSEC'},
+    {'IpProtocol': 'tcp', 'FromPort': 9200, 'ToPort': 9300, 'CidrIp': '0.0.0.0/0', 'Description': 'Elasticsearch'},
+]
+
+# DB rules only allow traffic from the App security group
+DB_INGRESS_RULES = [
+    {'IpProtocol': 'tcp', 'FromPort': 3306, 'ToPort': 3306, 'Description': 'MySQL from App servers'},
+    {'IpProtocol': 'tcp', 'FromPort': 1433, 'ToPort': 1433, 'Description': 'MSSQL from App servers'},
+    {'IpProtocol': 'tcp', 'FromPort': 5432, 'ToPort': 5432, 'Description': 'PostgreSQL from App servers'},
+    {'IpProtocol': 'tcp', 'FromPort': 3389, 'ToPort': 3389, 'Description': 'RDP from App servers'},
+    {'IpProtocol': 'tcp', 'FromPort': 1514, 'ToPort': 1514, 'Description': 'OSSEC from App servers'},
+]
+
+# Per-role sizing; gp3 allows 3000-16000 IOPS (at most 500 per GiB) and 125-1000 MiB/s (at most 0.25 per IOPS).
+# placement is None, 'spread' (one group per role, across AZs) or 'cluster' (one group per role and AZ).
+PERFORMANCE_PROFILES = {
+    'dev': {
+        'app': {'instance_type': 't2.micro', 'volume_size': 80, 'iops': 3000, 'throughput': 125, 'ebs_optimized': False, 'placement': None},
+        'db': {'instance_type': 't3.micro', 'volume_size': 30, 'iops': 3000, 'throughput': 125, 'ebs_optimized': False, 'placement': None},
+    },
+    'standard': {
+        'app': {'instance_type': 'm6i.large', 'volume_size': 100, 'iops': 4000, 'throughput': 250, 'ebs_optimized': True, 'placement': 'spread'},
+        'db': {'instance_type': 'r6i.large', 'volume_size': 100, 'iops': 6000, 'throughput': 250, 'ebs_optimized': True, 'placement': 'spread'},
+    },
+    'io-heavy': {
+        'app': {'instance_type': 'r6i.xlarge', 'volume_size': 200, 'iops': 12000, 'throughput': 500, 'ebs_optimized': True, 'placement': 'spread'},
+        'db': {'instance_type': 'r6i.2xlarge', 'volume_size': 250, 'iops': 16000, 'throughput': 1000, 'ebs_optimized': True, 'placement': 'spread'},
+    },
+}
+
+# Subnet key -> (third octet of the lab's first /24, AZ letter, public)
+SUBNET_LAYOUT = {
+    'public_az1': (0, 'a', True),
+    'private_az1': (128, 'a', False),
+    'public_az2': (16, 'b', True),
+    'private_az2': (144, 'b', False),
+}
+
+# Route table name -> whether it routes 0.0.0.0/0 to the Internet Gateway, and the subnets it serves
+ROUTE_TABLE_LAYOUT = {
+    'public': {'name': 'polystudentlab-public-rt', 'internet': True, 'subnets': ['public_az1', 'public_az2']},
+    'private': {'name': 'polystudentlab-private-rt', 'internet': False, 'subnets': ['private_az1', 'private_az2']},
+}
+
+
+def role_profiles(app_profile: str = DEFAULT_PROFILE, db_profile: str = DEFAULT_PROFILE) -> dict:
+    """Settings of each role, taken from the profile chosen for its tier"""
+    return {'app': PERFORMANCE_PROFILES[app_profile]['app'], 'db': PERFORMANCE_PROFILES[db_profile]['db']}
+
+
+def subnet_cidr(third_octet: int, lab_index: int = 0) -> str:
+    # Each fleet lab gets the next /24 after the base one, so up to MAX_FLEET_SIZE labs fit side by side
+    return f'10.0.{third_octet + lab_index}.0/24'
+
+
+def subnet_name(subnet_key: str, suffix: str = '') -> str:
+    return f"polystudentlab-{subnet_key.replace('_', '-')}{suffix}"
+
+
+def placement_group_names(role: str, strategy: str | None, run_id: str, suffix: str = '') -> dict:
+    """Placement group name per AZ key for a role; empty when the profile does not ask for one"""
+    if strategy is None:
+        return {}
+    if strategy == 'cluster':
+        # A cluster group lives in a single AZ
+        return {az: f'polystudentlab-{role}-cluster-{az}{suffix}-{run_id}' for az in ('az1', 'az2')}
+    group_name = f'polystudentlab-{role}-{strategy}{suffix}-{run_id}'
+    return {'az1': group_name, 'az2': group_name}
+
+
+def instance_options(profile: dict, placement_group: str | None = None) -> dict:
+    """run_instances arguments for a role's instance type, root volume and placement"""
+    options = {
+        'InstanceType': profile['instance_type'],
+        'BlockDeviceMappings': [
+            {
+                'DeviceName': '/dev/sda1',
+                'Ebs': {
+                    'VolumeSize': profile['volume_size'],
+                    'VolumeType': 'gp3',
+                    'Iops': profile['iops'],
+                    'Throughput': profile['throughput'],
+                    'DeleteOnTermination': True
+                }
+            }
+        ],
+    }
+    if profile['ebs_optimized']:
+        options['EbsOptimized'] = True
+    if placement_group:
+        options['Placement'] = {'GroupName': placement_group}
+    return options
+
+
+def launch_params(ami_id: str, key_name: str, subnet_id: str, security_group_id: str, profile: dict,
+                  placement_group: str | None = None, iam_profile: str = DEFAULT_IAM_PROFILE) -> dict:
+    """run_instances arguments of one lab instance, apart from its user data and tags"""
+    return {
+        'ImageId': ami_id,
+        'KeyName': key_name,
+        'SecurityGroupIds': [security_group_id],
+        'SubnetId': subnet_id,
+        'IamInstanceProfile': {'Name': iam_profile},
+        **instance_options(profile, placement_group),
+        'Monitoring': {'Enabled': True},
+        'MinCount': 1,
+        'MaxCount': 1,
+    }
+
+
+def read_user_data(filename: str) -> str:
+    global filepath
+    try:
+        filepath = os.path.join('user-data', filename)
+        with open(filepath, 'r') as f:
+            return f.read()
+
+    except Exception:
+        EVENTS.log(f'error reading user data file {filepath}', 'error')
+        sys.exit(1)
@@ -1,24 +1,51 @@
+import argparse
 import boto3
 import configparser
+import json
 import sys
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from describe_cache import DescribeCache
+from events import EVENTS, JsonLinesSink, LogFileSink
+from lab_layout import (
+    APP_INGRESS_RULES, DB_INGRESS_RULES, DEFAULT_IAM_PROFILE, DEFAULT_PROFILE, DEFAULT_UBUNTU_AMI, DEFAULT_VPC_ID, DEFAULT_WINDOWS_AMI,
+    MAX_FLEET_SIZE, PERFORMANCE_PROFILES, ROUTE_TABLE_LAYOUT, RUN_ID_TAG, SUBNET_LAYOUT,
+    launch_params, placement_group_names, read_user_data, role_profiles, subnet_cidr, subnet_name
+)
 from mypy_boto3_ec2 import EC2Client
+from preflight import run_preflight
+from rate_limiter import EC2RateLimiter
 
 EC2_CLIENT: EC2Client | None = None
+RATE_LIMITER = EC2RateLimiter()
+DESCRIBE_CACHE = DescribeCache()
+
+DEFAULT_KEY_NAME = 'polystudent-keypair'
+
+RUN_ID = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+MANIFEST = {'run_id': RUN_ID, 'region': None, 'vpc_id': None, 'resources': {}}
+MANIFEST_LOCK = threading.Lock()
 
 """
     Utility Methods
 """
-def read_user_data(filename: str) -> str:
-    global filepath
-    try:
-        filepath = os.path.join('user-data', filename)
-        with open(filepath, 'r') as f:
-            return f.read()
+def run_tags(tags: list) -> list:
+    return tags + [{'Key': RUN_ID_TAG, 'Value': RUN_ID}]
 
-    except Exception:
-        print(f'- error reading user data file {filepath}')
-        sys.exit(1)
+
+def record_resource(resource_type: str, resource_id: str):
+    with MANIFEST_LOCK:
+        MANIFEST['resources'].setdefault(resource_type, []).append(resource_id)
+
+
+def write_manifest(path: str):
+    with MANIFEST_LOCK:
+        with open(path, 'w') as f:
+            json.dump(MANIFEST, f, indent=2)
+    EVENTS.log(f'manifest of created resources saved to {path}')
 
 
 """
@@ -89,6 +116,8 @@ def set_clients():
             aws_session_token=os.getenv('AWS_SESSION_TOKEN'),
             region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
         )
+        RATE_LIMITER.install(EC2_CLIENT)
+        DESCRIBE_CACHE.install(EC2_CLIENT)
         print('- finished setting up the boto3 clients')
     except Exception:
         print('- failed to set the boto3 clients')
@@ -98,375 +127,321 @@ def set_clients():
     INFRA
 """
 def get_vpc(vpc_id: str) -> str:
-    print(f'- retrieving VPC {vpc_id}')
     try:
-        response = EC2_CLIENT.describe_vpcs(
-            VpcIds=[vpc_id]
-        )
+        with EVENTS.timed('describe', 'vpc', vpc_id) as event:
+            response = EC2_CLIENT.describe_vpcs(
+                VpcIds=[vpc_id]
+            )
+            if response['Vpcs']:
+                event['detail'] = f"CIDR {response['Vpcs'][0]['CidrBlock']}"
         
         if response['Vpcs']:
-            vpc = response['Vpcs'][0]
-            vpc_id = vpc['VpcId']
-            cidr_block = vpc['CidrBlock']
-            print(f'- found VPC: {vpc_id} with CIDR {cidr_block}')
-            
-            EC2_CLIENT.modify_vpc_attribute(
-                VpcId=vpc_id,
-                EnableDnsHostnames={'Value': True}
-            )
+            vpc_id = response['Vpcs'][0]['VpcId']
             
-            EC2_CLIENT.modify_vpc_attribute(
-                VpcId=vpc_id,
-                EnableDnsSupport={'Value': True}
-            )
+            with EVENTS.timed('modify', 'vpc', vpc_id) as event:
+                EC2_CLIENT.modify_vpc_attribute(
+                    VpcId=vpc_id,
+                    EnableDnsHostnames={'Value': True}
+                )
+                
+                EC2_CLIENT.modify_vpc_attribute(
+                    VpcId=vpc_id,
+                    EnableDnsSupport={'Value': True}
+                )
+                event['detail'] = 'DNS hostnames and support enabled'
             
-            print(f'- VPC {vpc_id} configured successfully')
             return vpc_id
         else:
-            print(f'- VPC {vpc_id} not found')
+            EVENTS.emit('describe', 'vpc', vpc_id, outcome='error', detail='not found')
             sys.exit(1)
             
     except Exception as e:
-        print(f'- error retrieving VPC: {e}')
+        EVENTS.error('error retrieving VPC', e)
         sys.exit(1)
 
 
 def create_subnet(vpc_id: str, cidr_block: str, availability_zone: str, subnet_name: str, is_public: bool = False) -> str:
-    print(f'- creating subnet {subnet_name} with CIDR {cidr_block} in {availability_zone}')
     try:
-        response = EC2_CLIENT.create_subnet(
-            VpcId=vpc_id,
-            CidrBlock=cidr_block,
-            AvailabilityZone=availability_zone,
-            TagSpecifications=[
-                {
-                    'ResourceType': 'subnet',
-                    'Tags': [
-                        {'Key': 'Name', 'Value': subnet_name},
-                        {'Key': 'Type', 'Value': 'Public' if is_public else 'Private'}
-                    ]
-                }
-            ]
-        )
-        
-        subnet_id = response['Subnet']['SubnetId']
-        print(f'- created subnet: {subnet_id}')
+        with EVENTS.timed('create', 'subnet', name=subnet_name) as event:
+            response = EC2_CLIENT.create_subnet(
+                VpcId=vpc_id,
+                CidrBlock=cidr_block,
+                AvailabilityZone=availability_zone,
+                TagSpecifications=[
+                    {
+                        'ResourceType': 'subnet',
+                        'Tags': run_tags([
+                            {'Key': 'Name', 'Value': subnet_name},
+                            {'Key': 'Type', 'Value': 'Public' if is_public else 'Private'}
+                        ])
+                    }
+                ]
+            )
+            
+            subnet_id = response['Subnet']['SubnetId']
+            record_resource('subnet', subnet_id)
+            event['resource_id'] = subnet_id
+            event['detail'] = f'{cidr_block} in {availability_zone}'
         
         if is_public:
-            EC2_CLIENT.modify_subnet_attribute(
-                SubnetId=subnet_id,
-                MapPublicIpOnLaunch={'Value': True}
-            )
-            print(f'- enabled auto-assign public IP for {subnet_name}')
+            with EVENTS.timed('modify', 'subnet', subnet_id, subnet_name) as event:
+                EC2_CLIENT.modify_subnet_attribute(
+                    SubnetId=subnet_id,
+                    MapPublicIpOnLaunch={'Value': True}
+                )
+                event['detail'] = 'auto-assign public IP enabled'
         
         return subnet_id
         
     except Exception as e:
-        print(f'- error creating subnet {subnet_name}: {e}')
+        EVENTS.error(f'error creating subnet {subnet_name}', e)
         sys.exit(1)
 
 
-def create_all_subnets(vpc_id: str, region: str = 'us-east-1') -> dict:
-    print('\n- creating all subnets')
+def create_all_subnets(vpc_id: str, region: str = 'us-east-1', lab_index: int = 0, suffix: str = '') -> dict:
+    EVENTS.log(f'creating all subnets{suffix}')
     
     subnets = {}
     
-    # AZ1 (us-east-1a)
-    subnets['public_az1'] = create_subnet(
-        vpc_id=vpc_id,
-        cidr_block='10.0.0.0/24',
-        availability_zone=f'{region}a',
-        subnet_name='polystudentlab-public-az1',
-        is_public=True
-    )
-    
-    subnets['private_az1'] = create_subnet(
-        vpc_id=vpc_id,
-        cidr_block='10.0.128.0/24',
-        availability_zone=f'{region}a',
-        subnet_name='polystudentlab-private-az1',
-        is_public=False
-    )
-    
-    # AZ2 (us-east-1b)
-    subnets['public_az2'] = create_subnet(
-        vpc_id=vpc_id,
-        cidr_block='10.0.16.0/24',
-        availability_zone=f'{region}b',
-        subnet_name='polystudentlab-public-az2',
-        is_public=True
-    )
-    
-    subnets['private_az2'] = create_subnet(
-        vpc_id=vpc_id,
-        cidr_block='10.0.144.0/24',
-        availability_zone=f'{region}b',
-        subnet_name='polystudentlab-private-az2',
-        is_public=False
-    )
-    
-    print('- all subnets created successfully')
-    print(f'  - Public AZ1: {subnets["public_az1"]}')
-    print(f'  - Private AZ1: {subnets["private_az1"]}')
-    print(f'  - Public AZ2: {subnets["public_az2"]}')
-    print(f'  - Private AZ2: {subnets["private_az2"]}')
+    # AZ1 (us-east-1a) and AZ2 (us-east-1b), public and private in each
+    for subnet_key, (third_octet, zone, is_public) in SUBNET_LAYOUT.items():
+        subnets[subnet_key] = create_subnet(
+            vpc_id=vpc_id,
+            cidr_block=subnet_cidr(third_octet, lab_index),
+            availability_zone=f'{region}{zone}',
+            subnet_name=subnet_name(subnet_key, suffix),
+            is_public=is_public
+        )
     
+    EVENTS.log(f'all subnets created{suffix}: ' + ', '.join(f"{key.replace('_', ' ')} {subnet_id}" for key, subnet_id in subnets.items()))
     return subnets
 
 
 def create_internet_gateway(vpc_id: str, igw_name: str = 'polystudentlab-igw') -> str:
-    print(f'\n- creating Internet Gateway {igw_name}')
     try:
-        response = EC2_CLIENT.create_internet_gateway(
-            TagSpecifications=[
-                {
-                    'ResourceType': 'internet-gateway',
-                    'Tags': [
-                        {'Key': 'Name', 'Value': igw_name}
-                    ]
-                }
-            ]
-        )
-        
-        igw_id = response['InternetGateway']['InternetGatewayId']
-        print(f'- created Internet Gateway: {igw_id}')
-        
-        EC2_CLIENT.attach_internet_gateway(
-            InternetGatewayId=igw_id,
-            VpcId=vpc_id
-        )
-        print(f'- attached Internet Gateway {igw_id} to VPC {vpc_id}')
+        with EVENTS.timed('create', 'internet-gateway', name=igw_name) as event:
+            response = EC2_CLIENT.create_internet_gateway(
+                TagSpecifications=[
+                    {
+                        'ResourceType': 'internet-gateway',
+                        'Tags': run_tags([
+                            {'Key': 'Name', 'Value': igw_name}
+                        ])
+                    }
+                ]
+            )
+            
+            igw_id = response['InternetGateway']['InternetGatewayId']
+            record_resource('internet-gateway', igw_id)
+            event['resource_id'] = igw_id
+        
+        with EVENTS.timed('attach', 'internet-gateway', igw_id, igw_name) as event:
+            EC2_CLIENT.attach_internet_gateway(
+                InternetGatewayId=igw_id,
+                VpcId=vpc_id
+            )
+            event['detail'] = f'to {vpc_id}'
         
         return igw_id
         
     except Exception as e:
-        print(f'- error creating/attaching Internet Gateway: {e}')
+        EVENTS.error('error creating/attaching Internet Gateway', e)
         sys.exit(1)
 
 
 def create_route_table(vpc_id: str, rt_name: str, igw_id: str = None) -> str:
-    print(f'\n- creating route table {rt_name}')
     try:
-        response = EC2_CLIENT.create_route_table(
-            VpcId=vpc_id,
-            TagSpecifications=[
-                {
-                    'ResourceType': 'route-table',
-                    'Tags': [
-                        {'Key': 'Name', 'Value': rt_name}
-                    ]
-                }
-            ]
-        )
-        
-        rt_id = response['RouteTable']['RouteTableId']
-        print(f'- created route table: {rt_id}')
+        with EVENTS.timed('create', 'route-table', name=rt_name) as event:
+            response = EC2_CLIENT.create_route_table(
+                VpcId=vpc_id,
+                TagSpecifications=[
+                    {
+                        'ResourceType': 'route-table',
+                        'Tags': run_tags([
+                            {'Key': 'Name', 'Value': rt_name}
+                        ])
+                    }
+                ]
+            )
+            
+            rt_id = response['RouteTable']['RouteTableId']
+            record_resource('route-table', rt_id)
+            event['resource_id'] = rt_id
         
         if igw_id:
-            EC2_CLIENT.create_route(
-                RouteTableId=rt_id,
-                DestinationCidrBlock='0.0.0.0/0',
-                GatewayId=igw_id
-            )
-            print(f'- added route 0.0.0.0/0 -> {igw_id} to route table {rt_id}')
+            with EVENTS.timed('create', 'route', rt_id, rt_name) as event:
+                EC2_CLIENT.create_route(
+                    RouteTableId=rt_id,
+                    DestinationCidrBlock='0.0.0.0/0',
+                    GatewayId=igw_id
+                )
+                event['detail'] = f'0.0.0.0/0 -> {igw_id}'
         
         return rt_id
         
     except Exception as e:
-        print(f'- error creating route table: {e}')
+        EVENTS.error(f'error creating route table {rt_name}', e)
         sys.exit(1)
 
 
 def associate_route_table(rt_id: str, subnet_id: str, subnet_name: str = '') -> str:
-    print(f'- associating route table {rt_id} with subnet {subnet_name or subnet_id}')
     try:
-        response = EC2_CLIENT.associate_route_table(
-            RouteTableId=rt_id,
-            SubnetId=subnet_id
-        )
-        
-        association_id = response['AssociationId']
-        print('- successfully associated route table with subnet')
+        with EVENTS.timed('associate', 'route-table', rt_id) as event:
+            response = EC2_CLIENT.associate_route_table(
+                RouteTableId=rt_id,
+                SubnetId=subnet_id
+            )
+            
+            association_id = response['AssociationId']
+            record_resource('route-table-association', association_id)
+            event['detail'] = f'with {subnet_name or subnet_id} ({association_id})'
         return association_id
         
     except Exception as e:
-        print(f'- error associating route table with subnet: {e}')
+        EVENTS.error(f'error associating route table {rt_id} with subnet {subnet_name or subnet_id}', e)
         sys.exit(1)
 
 
-def configure_route_tables(vpc_id: str, igw_id: str, subnets: dict) -> dict:
-    print('\n- configuring route tables')
+def configure_route_tables(vpc_id: str, igw_id: str, subnets: dict, suffix: str = '') -> dict:
+    EVENTS.log(f'configuring route tables{suffix}')
     
     route_tables = {}
     
-    public_rt_id = create_route_table(
-        vpc_id=vpc_id,
-        rt_name='polystudentlab-public-rt',
-        igw_id=igw_id
-    )
-    route_tables['public'] = public_rt_id
-    
-    associate_route_table(public_rt_id, subnets['public_az1'], 'public-az1')
-    associate_route_table(public_rt_id, subnets['public_az2'], 'public-az2')
-    
-    private_rt_id = create_route_table(
-        vpc_id=vpc_id,
-        rt_name='polystudentlab-private-rt',
-        igw_id=None
-    )
-    route_tables['private'] = private_rt_id
-    
-    associate_route_table(private_rt_id, subnets['private_az1'], 'private-az1')
-    associate_route_table(private_rt_id, subnets['private_az2'], 'private-az2')
-    
-    print('- route tables configured successfully')
-    print(f'  - Public RT: {public_rt_id} (with internet access)')
-    print(f'  - Private RT: {private_rt_id} (no internet access)')
+    for key, layout in ROUTE_TABLE_LAYOUT.items():
+        rt_id = create_route_table(
+            vpc_id=vpc_id,
+            rt_name=f"{layout['name']}{suffix}",
+            igw_id=igw_id if layout['internet'] else None
+        )
+        route_tables[key] = rt_id
+
+        for subnet_key in layout['subnets']:
+            associate_route_table(rt_id, subnets[subnet_key], subnet_key.replace('_', '-'))
     
+    EVENTS.log(f'route tables configured{suffix}: ' + ', '.join(
+        f"{key} {rt_id} ({'with' if ROUTE_TABLE_LAYOUT[key]['internet'] else 'no'} internet access)" for key, rt_id in route_tables.items()
+    ))
     return route_tables
 
 
 def create_app_security_group(vpc_id: str, sg_name: str = 'polystudentlab-app-sg') -> str:
-    print(f'\n- creating App server security group {sg_name}')
-    
     try:
-        response = EC2_CLIENT.create_security_group(
-            GroupName=sg_name,
-            Description='Security group for App servers - allows SSH, HTTP, HTTPS, OSSEC, and Elasticsearch',
-            VpcId=vpc_id,
-            TagSpecifications=[
-                {
-                    'ResourceType': 'security-group',
-                    'Tags': [
-                        {'Key': 'Name', 'Value': sg_name},
-                        {'Key': 'Type', 'Value': 'App-Server'}
-                    ]
-                }
-            ]
-        )
-        
-        sg_id = response['GroupId']
-        print(f'- created App security group: {sg_id}')
-        
-        ingress_rules = [
-            {'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'CidrIp': '0.0.0.0/0', 'Description': 'SSH'},
-            {'IpProtocol': 'tcp', 'FromPort': 80, 'ToPort': 80, 'CidrIp': '0.0.0.0/0', 'Description': 'HTTP'},
-            {'IpProtocol': 'tcp', 'FromPort': 443, 'ToPort': 443, 'CidrIp': '0.0.0.0/0', 'Description': 'HTTPS'},
-            {'IpProtocol': 'tcp', 'FromPort': 1514, 'ToPort': 1514, 'CidrIp': '0.0.0.0/0', 'Description': 'OSSEC'},
-            {'IpProtocol': 'tcp', 'FromPort': 9200, 'ToPort': 9300, 'CidrIp': '0.0.0.0/0', 'Description': 'Elasticsearch'},
-        ]
-        
-        for rule in ingress_rules:
-            EC2_CLIENT.authorize_security_group_ingress(
-                GroupId=sg_id,
-                IpPermissions=[{
-                    'IpProtocol': rule['IpProtocol'],
-                    'FromPort': rule['FromPort'],
-                    'ToPort': rule['ToPort'],
-                    'IpRanges': [{'CidrIp': rule['CidrIp'], 'Description': rule['Description']}]
-                }]
+        with EVENTS.timed('create', 'security-group', name=sg_name) as event:
+            response = EC2_CLIENT.create_security_group(
+                GroupName=sg_name,
+                Description='Security group for App servers - allows SSH, HTTP, HTTPS, OSSEC, and Elasticsearch',
+                VpcId=vpc_id,
+                TagSpecifications=[
+                    {
+                        'ResourceType': 'security-group',
+                        'Tags': run_tags([
+                            {'Key': 'Name', 'Value': sg_name},
+                            {'Key': 'Type', 'Value': 'App-Server'}
+                        ])
+                    }
+                ]
             )
-            print(f'- added ingress rule: {rule["Description"]} ({rule["IpProtocol"]} port {rule["FromPort"]}-{rule["ToPort"]})')
-        
-        print(f'- App security group {sg_name} configured successfully')
+            
+            sg_id = response['GroupId']
+            record_resource('security-group', sg_id)
+            event['resource_id'] = sg_id
+        
+        for rule in APP_INGRESS_RULES:
+            with EVENTS.timed('authorize', 'ingress-rule', sg_id, sg_name) as event:
+                EC2_CLIENT.authorize_security_group_ingress(
+                    GroupId=sg_id,
+                    IpPermissions=[{
+                        'IpProtocol': rule['IpProtocol'],
+                        'FromPort': rule['FromPort'],
+                        'ToPort': rule['ToPort'],
+                        'IpRanges': [{'CidrIp': rule['CidrIp'], 'Description': rule['Description']}]
+                    }]
+                )
+                event['detail'] = f"{rule['Description']} ({rule['IpProtocol']} port {rule['FromPort']}-{rule['ToPort']})"
         
         return sg_id
         
     except Exception as e:
-        print(f'- error creating App security group: {e}')
+        EVENTS.error(f'error creating App security group {sg_name}', e)
         sys.exit(1)
 
 
 def create_db_security_group(vpc_id: str, app_sg_id: str, sg_name: str = 'polystudentlab-db-sg') -> str:
-    print(f'\n- creating DB server security group {sg_name}')
-    
     try:
-        response = EC2_CLIENT.create_security_group(
-            GroupName=sg_name,
-            Description='Security group for DB servers - only accessible from App servers',
-            VpcId=vpc_id,
-            TagSpecifications=[
-                {
-                    'ResourceType': 'security-group',
-                    'Tags': [
-                        {'Key': 'Name', 'Value': sg_name},
-                        {'Key': 'Type', 'Value': 'DB-Server'}
-                    ]
-                }
-            ]
-        )
-        
-        sg_id = response['GroupId']
-        print(f'- created DB security group: {sg_id}')
-        
-        ingress_rules = [
-            {'IpProtocol': 'tcp', 'FromPort': 3306, 'ToPort': 3306, 'Description': 'MySQL from App servers'},
-            {'IpProtocol': 'tcp', 'FromPort': 1433, 'ToPort': 1433, 'Description': 'MSSQL from App servers'},
-            {'IpProtocol': 'tcp', 'FromPort': 5432, 'ToPort': 5432, 'Description': 'PostgreSQL from App servers'},
-            {'IpProtocol': 'tcp', 'FromPort': 3389, 'ToPort': 3389, 'Description': 'RDP from App servers'},
-            {'IpProtocol': 'tcp', 'FromPort': 1514, 'ToPort': 1514, 'Description': 'OSSEC from App servers'},
-        ]
-        
-        for rule in ingress_rules:
-            EC2_CLIENT.authorize_security_group_ingress(
-                GroupId=sg_id,
-                IpPermissions=[{
-                    'IpProtocol': rule['IpProtocol'],
-                    'FromPort': rule['FromPort'],
-                    'ToPort': rule['ToPort'],
-                    'UserIdGroupPairs': [{'GroupId': app_sg_id, 'Description': rule['Description']}]
-                }]
+        with EVENTS.timed('create', 'security-group', name=sg_name) as event:
+            response = EC2_CLIENT.create_security_group(
+                GroupName=sg_name,
+                Description='Security group for DB servers - only accessible from App servers',
+                VpcId=vpc_id,
+                TagSpecifications=[
+                    {
+                        'ResourceType': 'security-group',
+                        'Tags': run_tags([
+                            {'Key': 'Name', 'Value': sg_name},
+                            {'Key': 'Type', 'Value': 'DB-Server'}
+                        ])
+                    }
+                ]
             )
-            print(f'- added ingress rule: {rule["Description"]} ({rule["IpProtocol"]} port {rule["FromPort"]}-{rule["ToPort"]})')
-        
-        print(f'- DB security group {sg_name} configured successfully')
-        print('- DB servers are ONLY accessible from App servers')
+            
+            sg_id = response['GroupId']
+            record_resource('security-group', sg_id)
+            event['resource_id'] = sg_id
+        
+        for rule in DB_INGRESS_RULES:
+            with EVENTS.timed('authorize', 'ingress-rule', sg_id, sg_name) as event:
+                EC2_CLIENT.authorize_security_group_ingress(
+                    GroupId=sg_id,
+                    IpPermissions=[{
+                        'IpProtocol': rule['IpProtocol'],
+                        'FromPort': rule['FromPort'],
+                        'ToPort': rule['ToPort'],
+                        'UserIdGroupPairs': [{'GroupId': app_sg_id, 'Description': rule['Description']}]
+                    }]
+                )
+                event['detail'] = f"{rule['Description']} ({rule['IpProtocol']} port {rule['FromPort']}-{rule['ToPort']})"
         
         return sg_id
         
     except Exception as e:
-        print(f'- error creating DB security group: {e}')
+        EVENTS.error(f'error creating DB security group {sg_name}', e)
         sys.exit(1)
 
 
-def create_security_groups(vpc_id: str) -> dict:
-    print('\n- Creating Security groups')
+def create_security_groups(vpc_id: str, suffix: str = '') -> dict:
+    EVENTS.log(f'creating security groups{suffix}')
     
     security_groups = {}
     
-    app_sg_id = create_app_security_group(vpc_id)
+    app_sg_id = create_app_security_group(vpc_id, f'polystudentlab-app-sg{suffix}')
     security_groups['app'] = app_sg_id
     
-    db_sg_id = create_db_security_group(vpc_id, app_sg_id)
+    db_sg_id = create_db_security_group(vpc_id, app_sg_id, f'polystudentlab-db-sg{suffix}')
     security_groups['db'] = db_sg_id
     
-    print('\n- Security groups created successfully:')
-    print(f'  - App SG: {app_sg_id} (public access)')
-    print(f'  - DB SG: {db_sg_id} (only accessible from App servers)')
-    
+    EVENTS.log(f'security groups created{suffix}: app {app_sg_id} (public access), db {db_sg_id} (only accessible from App servers)')
     return security_groups
 
 
-def create_or_get_key_pair(key_name: str = 'polystudent-keypair') -> str:
-    print(f'\n- Checking for key pair {key_name}')
+def create_or_get_key_pair(key_name: str = DEFAULT_KEY_NAME) -> str:
     try:
         EC2_CLIENT.describe_key_pairs(KeyNames=[key_name])
-        print(f'- Key pair {key_name} already exists')
+        EVENTS.emit('describe', 'key-pair', name=key_name, detail='already exists')
         return key_name
     except:
-        print(f'- Creating new key pair {key_name}')
         try:
-            response = EC2_CLIENT.create_key_pair(
-                KeyName=key_name,
-                TagSpecifications=[
-                    {
-                        'ResourceType': 'key-pair',
-                        'Tags': [
-                            {'Key': 'Name', 'Value': key_name}
-                        ]
-                    }
-                ]
-            )
+            with EVENTS.timed('create', 'key-pair', name=key_name) as event:
+                response = EC2_CLIENT.create_key_pair(
+                    KeyName=key_name,
+                    TagSpecifications=[
+                        {
+                            'ResourceType': 'key-pair',
+                            'Tags': [
+                                {'Key': 'Name', 'Value': key_name}
+                            ]
+                        }
+                    ]
+                )
             
             key_material = response['KeyMaterial']
             key_file = f'{key_name}.pem'
@@ -478,187 +453,395 @@ def create_or_get_key_pair(key_name: str = 'polystudent-keypair') -> str:
             if platform.system() != 'Windows':
                 os.chmod(key_file, 0o400)
             
-            print(f'- Created key pair {key_name}')
-            print(f'- Private key saved to {key_file}')
+            EVENTS.log(f'private key saved to {key_file}')
             
             return key_name
             
         except Exception as e:
-            print(f'- Error creating key pair: {e}')
+            EVENTS.error(f'error creating key pair {key_name}', e)
             sys.exit(1)
 
 
-def create_app_server(instance_name: str, subnet_id: str, security_group_id: str, ami_id: str, key_name: str = 'polystudent-keypair', iam_profile: str = 'LabInstanceProfile') -> str:
-    print(f'\n- creating App server instance: {instance_name}')
-    
+def validate_profiles(roles: dict) -> None:
+    """Check the role settings against gp3 limits and one batched DescribeInstanceTypes"""
+    problems = []
+    for role, profile in roles.items():
+        iops, throughput, size = profile['iops'], profile['throughput'], profile['volume_size']
+        if not 3000 <= iops <= min(16000, max(3000, 500 * size)):
+            problems.append(f'{role}: {iops} IOPS is outside the gp3 range for {size} GiB')
+        if not 125 <= throughput <= min(1000, iops // 4):
+            problems.append(f'{role}: {throughput} MiB/s is outside the gp3 range for {iops} IOPS')
+
+    instance_types = sorted({profile['instance_type'] for profile in roles.values()})
+    try:
+        with EVENTS.timed('describe', 'instance-type', name=', '.join(instance_types)):
+            response = EC2_CLIENT.describe_instance_types(
+                Filters=[{'Name': 'instance-type', 'Values': instance_types}]
+            )
+    except Exception as e:
+        EVENTS.error('error describing instance types', e)
+        sys.exit(1)
+    offered = {item['InstanceType']: item for item in response['InstanceTypes']}
+
+    for role, profile in roles.items():
+        info = offered.get(profile['instance_type'])
+        if info is None:
+            problems.append(f"{role}: {profile['instance_type']} is not offered in this region")
+            continue
+        ebs = info.get('EbsInfo', {})
+        if profile['ebs_optimized'] and ebs.get('EbsOptimizedSupport') == 'unsupported':
+            problems.append(f"{role}: {profile['instance_type']} cannot be EBS-optimized")
+        strategies = info.get('PlacementGroupInfo', {}).get('SupportedStrategies', [])
+        if profile['placement'] and profile['placement'] not in strategies:
+            problems.append(f"{role}: {profile['instance_type']} does not support {profile['placement']} placement")
+        max_iops = ebs.get('EbsOptimizedInfo', {}).get('MaximumIops')
+        if max_iops and profile['iops'] > max_iops:
+            EVENTS.log(f"warning: {role} volume IOPS {profile['iops']} exceed the {profile['instance_type']} EBS limit of {max_iops}", 'warning')
+
+    if problems:
+        for problem in problems:
+            EVENTS.log(f'invalid performance profile, {problem}', 'error')
+        sys.exit(1)
+    summary = ', '.join(f"{role}={profile['instance_type']}" for role, profile in roles.items())
+    EVENTS.log(f'performance profiles validated: {summary}')
+
+
+def create_placement_group(group_name: str, strategy: str) -> str:
+    try:
+        with EVENTS.timed('create', 'placement-group', name=group_name) as event:
+            try:
+                EC2_CLIENT.create_placement_group(
+                    GroupName=group_name,
+                    Strategy=strategy,
+                    TagSpecifications=[
+                        {
+                            'ResourceType': 'placement-group',
+                            'Tags': run_tags([{'Key': 'Name', 'Value': group_name}])
+                        }
+                    ]
+                )
+                # Placement groups are addressed by name, so the manifest records names
+                record_resource('placement-group', group_name)
+                event['detail'] = strategy
+            except Exception as e:
+                if 'InvalidPlacementGroup.Duplicate' not in str(e):
+                    raise
+                event['detail'] = 'already exists, reusing it'
+        return group_name
+        
+    except Exception as e:
+        EVENTS.error(f'error creating placement group {group_name}', e)
+        sys.exit(1)
+
+
+def placement_groups(role: str, profile: dict, suffix: str = '') -> dict:
+    """Placement group name per AZ key for a role, creating the groups the profile asks for"""
+    group_names = placement_group_names(role, profile['placement'], RUN_ID, suffix)
+    for group_name in dict.fromkeys(group_names.values()):
+        create_placement_group(group_name, profile['placement'])
+    return group_names
+
+
+def create_app_server(instance_name: str, subnet_id: str, security_group_id: str, ami_id: str, key_name: str = DEFAULT_KEY_NAME, iam_profile: str = DEFAULT_IAM_PROFILE, profile: dict | None = None, placement_group: str | None = None) -> str:
     try:
         user_data = read_user_data('app-server.tpl')
         
-        response = EC2_CLIENT.run_instances(
-            ImageId=ami_id,
-            InstanceType='t2.micro',
-            KeyName=key_name,
-            SecurityGroupIds=[security_group_id],
-            SubnetId=subnet_id,
-            UserData=user_data,
-            IamInstanceProfile={'Name': iam_profile},
-            BlockDeviceMappings=[
-                {
-                    'DeviceName': '/dev/sda1',
-                    'Ebs': {
-                        'VolumeSize': 80,
-                        'VolumeType': 'gp3',
-                        'DeleteOnTermination': True
+        with EVENTS.timed('run', 'instance', name=instance_name) as event:
+            response = EC2_CLIENT.run_instances(
+                **launch_params(
+                    ami_id, key_name, subnet_id, security_group_id,
+                    profile or PERFORMANCE_PROFILES[DEFAULT_PROFILE]['app'], placement_group, iam_profile
+                ),
+                UserData=user_data,
+                TagSpecifications=[
+                    {
+                        'ResourceType': 'instance',
+                        'Tags': run_tags([
+                            {'Key': 'Name', 'Value': instance_name},
+                            {'Key': 'Type', 'Value': 'App-Server'}
+                        ])
                     }
-                }
-            ],
-            Monitoring={'Enabled': True},
-            TagSpecifications=[
-                {
-                    'ResourceType': 'instance',
-                    'Tags': [
-                        {'Key': 'Name', 'Value': instance_name},
-                        {'Key': 'Type', 'Value': 'App-Server'}
-                    ]
-                }
-            ],
-            MinCount=1,
-            MaxCount=1
-        )
-        
-        instance_id = response['Instances'][0]['InstanceId']
-        print(f'- created App server instance: {instance_id}')
-        print('- waiting for instance to be running...')
+                ]
+            )
+            
+            instance_id = response['Instances'][0]['InstanceId']
+            record_resource('instance', instance_id)
+            event['resource_id'] = instance_id
         
-        waiter = EC2_CLIENT.get_waiter('instance_running')
-        waiter.wait(InstanceIds=[instance_id])
+        with EVENTS.timed('wait', 'instance', instance_id, instance_name) as event:
+            waiter = EC2_CLIENT.get_waiter('instance_running')
+            waiter.wait(InstanceIds=[instance_id])
+            event['detail'] = 'running'
         
-        print(f'- App server {instance_name} is now running')
         return instance_id
         
     except Exception as e:
-        print(f'- error creating App server: {e}')
+        EVENTS.error(f'error creating App server {instance_name}', e)
         sys.exit(1)
 
 
-def create_db_server(instance_name: str, subnet_id: str, security_group_id: str, ami_id: str, key_name: str = 'polystudent-keypair', iam_profile: str = 'LabInstanceProfile') -> str:
-    print(f'\n- creating DB server instance: {instance_name}')
-    
+def create_db_server(instance_name: str, subnet_id: str, security_group_id: str, ami_id: str, key_name: str = DEFAULT_KEY_NAME, iam_profile: str = DEFAULT_IAM_PROFILE, profile: dict | None = None, placement_group: str | None = None) -> str:
     try:
         user_data = read_user_data('db-server.tpl')
         
-        response = EC2_CLIENT.run_instances(
-            ImageId=ami_id,
-            InstanceType='t3.micro',
-            KeyName=key_name,
-            SecurityGroupIds=[security_group_id],
-            SubnetId=subnet_id,
-            UserData=user_data,
-            IamInstanceProfile={'Name': iam_profile},
-            BlockDeviceMappings=[
-                {
-                    'DeviceName': '/dev/sda1',
-                    'Ebs': {
-                        'VolumeSize': 30,
-                        'VolumeType': 'gp3',
-                        'DeleteOnTermination': True
+        with EVENTS.timed('run', 'instance', name=instance_name) as event:
+            response = EC2_CLIENT.run_instances(
+                **launch_params(
+                    ami_id, key_name, subnet_id, security_group_id,
+                    profile or PERFORMANCE_PROFILES[DEFAULT_PROFILE]['db'], placement_group, iam_profile
+                ),
+                UserData=user_data,
+                TagSpecifications=[
+                    {
+                        'ResourceType': 'instance',
+                        'Tags': run_tags([
+                            {'Key': 'Name', 'Value': instance_name},
+                            {'Key': 'Type', 'Value': 'DB-Server'}
+                        ])
                     }
-                }
-            ],
-            Monitoring={'Enabled': True},
-            TagSpecifications=[
-                {
-                    'ResourceType': 'instance',
-                    'Tags': [
-                        {'Key': 'Name', 'Value': instance_name},
-                        {'Key': 'Type', 'Value': 'DB-Server'}
-                    ]
-                }
-            ],
-            MinCount=1,
-            MaxCount=1
-        )
-        
-        instance_id = response['Instances'][0]['InstanceId']
-        print(f'- created DB server instance: {instance_id}')
-        print('- waiting for instance to be running...')
+                ]
+            )
+            
+            instance_id = response['Instances'][0]['InstanceId']
+            record_resource('instance', instance_id)
+            event['resource_id'] = instance_id
         
-        waiter = EC2_CLIENT.get_waiter('instance_running')
-        waiter.wait(InstanceIds=[instance_id])
+        with EVENTS.timed('wait', 'instance', instance_id, instance_name) as event:
+            waiter = EC2_CLIENT.get_waiter('instance_running')
+            waiter.wait(InstanceIds=[instance_id])
+            event['detail'] = 'running'
         
-        print(f'- DB server {instance_name} is now running')
         return instance_id
         
     except Exception as e:
-        print(f'- error creating DB server: {e}')
+        EVENTS.error(f'error creating DB server {instance_name}', e)
         sys.exit(1)
 
 
-def create_all_instances(subnets: dict, security_groups: dict, key_name: str, ubuntu_ami: str= 'ami-0ecb62995f68bb549', windows_ami: str= 'ami-0b4bc1e90f30ca1ec') -> dict:
+def create_all_instances(subnets: dict, security_groups: dict, key_name: str, ubuntu_ami: str = DEFAULT_UBUNTU_AMI, windows_ami: str = DEFAULT_WINDOWS_AMI, suffix: str = '', app_profile: str = DEFAULT_PROFILE, db_profile: str = DEFAULT_PROFILE) -> dict:
     
     instances = {}
+    profiles = role_profiles(app_profile, db_profile)
+    # Validated once by main(), not per lab
+    EVENTS.log(f'using performance profiles app={app_profile}, db={db_profile}')
+    placement = {role: placement_groups(role, profile, suffix) for role, profile in profiles.items()}
 
-    print('\n- Creating App Server for AZ1 (polystudent-ec2)...')
+    EVENTS.log(f'creating App Server for AZ1 (polystudent-ec2{suffix})')
     instances['app_az1'] = create_app_server(
-        instance_name='polystudent-ec2',
+        instance_name=f'polystudent-ec2{suffix}',
         subnet_id=subnets['public_az1'],
         security_group_id=security_groups['app'],
         ami_id=ubuntu_ami,
-        key_name=key_name
+        key_name=key_name,
+        profile=profiles['app'],
+        placement_group=placement['app'].get('az1')
     )
     
-    print('\n- [3.1.1] Creating App Server for AZ2...')
+    EVENTS.log(f'[3.1.1] creating App Server for AZ2{suffix}')
     instances['app_az2'] = create_app_server(
-        instance_name='polystudent-app-az2',
+        instance_name=f'polystudent-app-az2{suffix}',
         subnet_id=subnets['public_az2'],
         security_group_id=security_groups['app'],
         ami_id=ubuntu_ami,
-        key_name=key_name
+        key_name=key_name,
+        profile=profiles['app'],
+        placement_group=placement['app'].get('az2')
     )
     
-    print('\n- [3.1.2] Creating DB Server for AZ1...')
+    EVENTS.log(f'[3.1.2] creating DB Server for AZ1{suffix}')
     instances['db_az1'] = create_db_server(
-        instance_name='polystudent-db-az1',
+        instance_name=f'polystudent-db-az1{suffix}',
         subnet_id=subnets['private_az1'],
         security_group_id=security_groups['db'],
         ami_id=windows_ami,
-        key_name=key_name
+        key_name=key_name,
+        profile=profiles['db'],
+        placement_group=placement['db'].get('az1')
     )
     
-    print('\n[3.1.2] Creating DB Server for AZ2...')
+    EVENTS.log(f'[3.1.2] creating DB Server for AZ2{suffix}')
     instances['db_az2'] = create_db_server(
-        instance_name='polystudent-db-az2',
+        instance_name=f'polystudent-db-az2{suffix}',
         subnet_id=subnets['private_az2'],
         security_group_id=security_groups['db'],
         ami_id=windows_ami,
-        key_name=key_name
+        key_name=key_name,
+        profile=profiles['db'],
+        placement_group=placement['db'].get('az2')
     )
     
-
-    print(f"- App AZ2: {instances['app_az2']}")
-    print(f"- DB AZ1: {instances['db_az1']}")
-    print(f"- DB AZ2: {instances['db_az2']}")
-    
+    EVENTS.log(f'all instances running{suffix}: ' + ', '.join(f"{key.replace('_', ' ')} {instance_id}" for key, instance_id in instances.items()))
     return instances
 
 
+"""
+    FLEET
+"""
+def provision_lab(vpc_id: str, igw_id: str, key_name: str, lab_index: int, app_profile: str = DEFAULT_PROFILE, db_profile: str = DEFAULT_PROFILE) -> dict:
+    suffix = f'-lab{lab_index:02d}'
+    EVENTS.log(f'provisioning lab {lab_index} ({suffix[1:]})')
+
+    subnets = create_all_subnets(vpc_id, lab_index=lab_index, suffix=suffix)
+    route_tables = configure_route_tables(vpc_id, igw_id, subnets, suffix)
+    security_groups = create_security_groups(vpc_id, suffix)
+    instances = create_all_instances(subnets, security_groups, key_name, suffix=suffix, app_profile=app_profile, db_profile=db_profile)
+
+    return {
+        'subnets': subnets,
+        'route_tables': route_tables,
+        'security_groups': security_groups,
+        'instances': instances,
+    }
+
+
+def provision_fleet(vpc_id: str, key_name: str, fleet_size: int, max_workers: int, app_profile: str = DEFAULT_PROFILE, db_profile: str = DEFAULT_PROFILE) -> dict:
+    EVENTS.log(f'provisioning {fleet_size} labs with up to {max_workers} in parallel')
+
+    if fleet_size > MAX_FLEET_SIZE:
+        EVENTS.log(f'fleet size {fleet_size} exceeds the {MAX_FLEET_SIZE} CIDR slices available', 'error')
+        sys.exit(1)
+
+    # A VPC can only have one Internet Gateway, so every lab routes through the same one
+    igw_id = create_internet_gateway(vpc_id)
+
+    def run_lab(lab_index: int) -> dict:
+        # Steps exit on failure; turn that into an error for this lab only
+        try:
+            return provision_lab(vpc_id, igw_id, key_name, lab_index, app_profile, db_profile)
+        except SystemExit as e:
+            raise RuntimeError(f'a step exited with status {e.code}') from e
+
+    labs = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lab') as pool:
+        futures = {pool.submit(run_lab, lab_index): lab_index for lab_index in range(fleet_size)}
+        for future in as_completed(futures):
+            lab_index = futures[future]
+            try:
+                labs[lab_index] = future.result()
+                EVENTS.log(f'lab {lab_index} provisioned')
+            except Exception as e:
+                failed.append(lab_index)
+                EVENTS.log(f'lab {lab_index} failed: {e!r}', 'error')
+
+    EVENTS.log(f'fleet provisioned: {len(labs)} succeeded, {len(failed)} failed')
+    EVENTS.log(f'API calls by throttling bucket: {RATE_LIMITER.calls}')
+    EVENTS.log(f'describe cache: {DESCRIBE_CACHE.stats}')
+
+    if failed:
+        sys.exit(1)
+
+    return labs
+
+
+"""
+    PREFLIGHT
+"""
+def preflight_plan(vpc_id: str, app_profile: str = DEFAULT_PROFILE, db_profile: str = DEFAULT_PROFILE) -> dict:
+    region = EC2_CLIENT.meta.region_name
+    profiles = role_profiles(app_profile, db_profile)
+    return {
+        'vpc_id': vpc_id,
+        'key_name': DEFAULT_KEY_NAME,
+        'amis': [DEFAULT_UBUNTU_AMI, DEFAULT_WINDOWS_AMI],
+        'instance_types': sorted({profile['instance_type'] for profile in profiles.values()}),
+        'launches': [(DEFAULT_UBUNTU_AMI, profiles['app']), (DEFAULT_WINDOWS_AMI, profiles['db'])],
+        'placements': sorted({profile['placement'] for profile in profiles.values() if profile['placement']}),
+        'zones': [f'{region}a', f'{region}b'],
+        'iam_profile': DEFAULT_IAM_PROFILE,
+        'cidr': subnet_cidr(0),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Provision the polystudent lab infrastructure')
+    parser.add_argument('--vpc', default=DEFAULT_VPC_ID, help='target VPC ID')
+    parser.add_argument('--fleet', type=int, default=1, help='number of isolated labs to provision')
+    parser.add_argument('--max-workers', type=int, default=4, help='labs provisioned concurrently')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='provision on one asyncio event loop')
+    parser.add_argument('--max-concurrency', type=int, default=64, help='API requests in flight with --async')
+    parser.add_argument('--run-id', default=None, help=f'value of the {RUN_ID_TAG} tag stamped on every resource')
+    parser.add_argument('--manifest', default=None, help='manifest output path (default manifest-<run-id>.json)')
+    parser.add_argument('--profile', choices=PERFORMANCE_PROFILES, default=DEFAULT_PROFILE, help='performance profile for both tiers')
+    parser.add_argument('--app-profile', choices=PERFORMANCE_PROFILES, default=None, help='performance profile of the App tier')
+    parser.add_argument('--db-profile', choices=PERFORMANCE_PROFILES, default=None, help='performance profile of the DB tier')
+    parser.add_argument('--skip-preflight', action='store_true', help='do not DryRun the planned calls first')
+    parser.add_argument('--events-jsonl', default=None, help='append every progress event as JSON lines')
+    parser.add_argument('--log-file', default=None, help='append every progress event to a log file')
+    parser.add_argument('--plan', action='store_true', help='predict duration and critical path without calling AWS')
+    parser.add_argument('--latencies', default=None, help='recorded latencies used by --plan')
+    parser.add_argument('--record-latencies', default=None, help='append every API call duration to this file')
+    return parser.parse_args()
+
+
 def main():
+    global RUN_ID
+    args = parse_args()
+    if args.run_id:
+        RUN_ID = MANIFEST['run_id'] = args.run_id
+    app_profile = args.app_profile or args.profile
+    db_profile = args.db_profile or args.profile
+
+    if args.plan:
+        # Imported here so provisioning runs do not load the planner
+        from planner import build_plan, load_latencies, print_report, simulate
+        concurrency = min(args.fleet, args.max_workers) if args.fleet > 1 else 1
+        plan = build_plan(args.fleet, app_profile=app_profile, db_profile=db_profile, preflight=not args.skip_preflight)
+        result = simulate(plan, load_latencies(args.latencies), concurrency)
+        print_report(result, concurrency)
+        return
+
     print('*'*26 + ' BEGINNING AWS SETUP ' + '*'*26)
     verify_aws_credentials()
     set_clients()
+    if args.record_latencies:
+        from planner import LatencyRecorder
+        LatencyRecorder(args.record_latencies).install(EC2_CLIENT)
     print('*'*26 + '*********************' + '*'*26)
     print('')
     print('*'*26 + ' INFRASTRUCTURE START ' + '*'*26)
     
-    vpc_id = get_vpc('vpc-0bdc139fd9ee529cc')
-    key_name = create_or_get_key_pair('polystudent-keypair')
-    subnets = create_all_subnets(vpc_id)
-    igw_id = create_internet_gateway(vpc_id)
-    configure_route_tables(vpc_id, igw_id, subnets)
-    security_groups = create_security_groups(vpc_id)
-    
-    # Question 3.1
-    create_all_instances(subnets, security_groups, key_name)
+    EVENTS.context['run_id'] = RUN_ID
+    if args.events_jsonl:
+        EVENTS.add_sink(JsonLinesSink(args.events_jsonl))
+    if args.log_file:
+        EVENTS.add_sink(LogFileSink(args.log_file))
+    EVENTS.log(f'run ID: {RUN_ID}')
+    if not args.skip_preflight and not run_preflight(EC2_CLIENT, preflight_plan(args.vpc, app_profile, db_profile)):
+        EVENTS.log('preflight failed, nothing was created', 'error')
+        EVENTS.flush()
+        sys.exit(1)
+
+    vpc_id = get_vpc(args.vpc)
+    MANIFEST['vpc_id'] = vpc_id
+    MANIFEST['region'] = EC2_CLIENT.meta.region_name
+    key_name = create_or_get_key_pair(DEFAULT_KEY_NAME)
+    # One DescribeInstanceTypes for every lab, before anything is created
+    profiles = role_profiles(app_profile, db_profile)
+    validate_profiles(profiles)
+
+    # Written even when a step exits early, so partial runs can be cleaned up by manifest too
+    try:
+        if args.use_async:
+            # Imported here so the synchronous path does not load asyncio (or aiobotocore)
+            import asyncio
+            from async_ec2 import Run, provision_fleet as provision_fleet_async
+            asyncio.run(provision_fleet_async(
+                EC2_CLIENT, Run(RUN_ID, record_resource), vpc_id, key_name, args.fleet, profiles, args.max_concurrency
+            ))
+        elif args.fleet > 1:
+            provision_fleet(vpc_id, key_name, args.fleet, args.max_workers, app_profile, db_profile)
+        else:
+            subnets = create_all_subnets(vpc_id)
+            igw_id = create_internet_gateway(vpc_id)
+            configure_route_tables(vpc_id, igw_id, subnets)
+            security_groups = create_security_groups(vpc_id)
+
+            # Question 3.1
+            create_all_instances(subnets, security_groups, key_name, app_profile=app_profile, db_profile=db_profile)
+    finally:
+        write_manifest(args.manifest or f'manifest-{RUN_ID}.json')
+        EVENTS.flush()
     
     print('*'*26 + '*********************' + '*'*26)
 
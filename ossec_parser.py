@@ -0,0 +1,228 @@
+import argparse
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from typing import BinaryIO, Iterator
+
+ALERT_MARKER = b'** Alert '
+BLOCK_SEPARATOR = b'\n' + ALERT_MARKER
+DEFAULT_STATE_FILE = '.ossec-offset.json'
+STATE_SAVE_EVERY = 10000
+
+HEADER_RE = re.compile(rb'^\*\* Alert (\d+)\.(\d+):\s*(\S*)\s*-\s*(.*?),?\s*$')
+LOCATION_RE = re.compile(rb'^(\d{4} \w{3} \d{2} \d{2}:\d{2}:\d{2}) (?:\((.+?)\) )?(\S+?)->(.*)$')
+RULE_RE = re.compile(rb'^Rule: (\d+) \(level (\d+)\) -> \'(.*)\'$')
+
+FIELD_PREFIXES = {
+    b'Src IP': 'srcip',
+    b'Src Port': 'srcport',
+    b'Dst IP': 'dstip',
+    b'Dst Port': 'dstport',
+    b'User': 'user',
+}
+
+# Parser states, one per expected line kind inside an alert block
+STATE_HEADER, STATE_LOCATION, STATE_RULE, STATE_BODY = range(4)
+
+
+"""
+    Parsing
+"""
+def parse_alert(block: bytes) -> dict | None:
+    """Parse one multi-line alert block into a structured record"""
+    record = {
+        'id': None,
+        'timestamp': None,
+        'groups': [],
+        'date': None,
+        'agent': None,
+        'host': None,
+        'location': None,
+        'rule_id': None,
+        'level': None,
+        'description': None,
+        'log': [],
+    }
+    state = STATE_HEADER
+
+    for line in block.split(b'\n'):
+        if state == STATE_BODY:
+            if not line:
+                continue
+            name, sep, value = line.partition(b': ')
+            field = FIELD_PREFIXES.get(name) if sep else None
+            if field and not record['log']:
+                record[field] = value.decode('utf-8', 'replace')
+            else:
+                record['log'].append(line.decode('utf-8', 'replace'))
+
+        elif state == STATE_HEADER:
+            match = HEADER_RE.match(line)
+            if not match:
+                return None
+            record['timestamp'] = int(match.group(1))
+            record['id'] = f'{match.group(1).decode()}.{match.group(2).decode()}'
+            record['groups'] = [g for g in match.group(4).decode('utf-8', 'replace').split(',') if g]
+            state = STATE_LOCATION
+
+        elif state == STATE_LOCATION:
+            match = LOCATION_RE.match(line)
+            if match:
+                record['date'] = match.group(1).decode()
+                record['agent'] = match.group(2).decode('utf-8', 'replace') if match.group(2) else None
+                record['host'] = match.group(3).decode('utf-8', 'replace')
+                record['location'] = match.group(4).decode('utf-8', 'replace')
+            state = STATE_RULE
+
+        elif state == STATE_RULE:
+            match = RULE_RE.match(line)
+            if match:
+                record['rule_id'] = int(match.group(1))
+                record['level'] = int(match.group(2))
+                record['description'] = match.group(3).decode('utf-8', 'replace')
+            state = STATE_BODY
+
+    return record
+
+
+def iter_blocks(data, start: int = 0, final: bool = False) -> Iterator[tuple[bytes, int]]:
+    """Yield (block, end_offset) for every complete alert block in data from start"""
+    end_of_data = len(data)
+    position = data.find(ALERT_MARKER, start)
+
+    while position != -1:
+        next_position = data.find(BLOCK_SEPARATOR, position + 1)
+        if next_position == -1:
+            # The last block is only complete once OSSEC wrote its trailing blank line
+            if final or data[end_of_data - 2:end_of_data] == b'\n\n':
+                yield data[position:end_of_data], end_of_data
+            return
+
+        yield data[position:next_position], next_position + 1
+        position = next_position + 1
+
+
+"""
+    Offset State
+"""
+def load_state(state_path: str) -> dict:
+    try:
+        with open(state_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'inode': None, 'offset': 0}
+
+
+def save_state(state_path: str, inode: int, offset: int):
+    tmp_path = f'{state_path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'inode': inode, 'offset': offset}, f)
+    os.replace(tmp_path, state_path)
+
+
+def resume_offset(state: dict, stat: os.stat_result) -> int:
+    """Return the saved offset, or 0 when the log was rotated or truncated"""
+    if state.get('inode') != stat.st_ino or state.get('offset', 0) > stat.st_size:
+        return 0
+    return state.get('offset', 0)
+
+
+"""
+    Readers
+"""
+def read_alerts(path: str, state_path: str | None = None) -> Iterator[dict]:
+    """Yield alerts appended to path since the offset saved in state_path"""
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        state = load_state(state_path) if state_path else {}
+        offset = resume_offset(state, stat) if state_path else 0
+
+        if stat.st_size <= offset:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            since_save = 0
+            try:
+                for block, end_offset in iter_blocks(data, offset):
+                    record = parse_alert(block)
+                    offset = end_offset
+                    if record is None:
+                        continue
+                    yield record
+
+                    since_save += 1
+                    if state_path and since_save >= STATE_SAVE_EVERY:
+                        save_state(state_path, stat.st_ino, offset)
+                        since_save = 0
+            finally:
+                if state_path:
+                    save_state(state_path, stat.st_ino, offset)
+
+
+def read_stream(stream: BinaryIO, chunk_size: int = 1 << 20) -> Iterator[dict]:
+    """Yield alerts from a binary stream using large buffered reads"""
+    pending = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+
+        consumed = 0
+        for block, end_offset in iter_blocks(pending):
+            record = parse_alert(block)
+            consumed = end_offset
+            if record is not None:
+                yield record
+        pending = pending[consumed:]
+
+    for block, _ in iter_blocks(pending, final=True):
+        record = parse_alert(block)
+        if record is not None:
+            yield record
+
+
+def tail_alerts(path: str, state_path: str = DEFAULT_STATE_FILE, interval: float = 1.0) -> Iterator[dict]:
+    """Follow path forever, resuming from and updating the saved offset"""
+    while True:
+        found = False
+        try:
+            for record in read_alerts(path, state_path):
+                found = True
+                yield record
+        except FileNotFoundError:
+            pass
+
+        if not found:
+            time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse OSSEC alerts.log into JSON lines')
+    parser.add_argument('path', help='alerts.log path, or - to read stdin')
+    parser.add_argument('--state', default=DEFAULT_STATE_FILE, help='offset state file')
+    parser.add_argument('--no-state', action='store_true', help='read the whole file, ignore saved offset')
+    parser.add_argument('--follow', action='store_true', help='keep tailing the file')
+    args = parser.parse_args()
+
+    if args.path == '-':
+        records = read_stream(sys.stdin.buffer)
+    elif args.follow:
+        records = tail_alerts(args.path, args.state)
+    else:
+        records = read_alerts(args.path, None if args.no_state else args.state)
+
+    out = sys.stdout
+    try:
+        for record in records:
+            out.write(json.dumps(record, separators=(',', ':')))
+            out.write('\n')
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
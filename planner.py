@@ -0,0 +1,353 @@
+import argparse
+import heapq
+import json
+import math
+import statistics
+import threading
+import time
+
+from lab_layout import APP_INGRESS_RULES, DB_INGRESS_RULES, DEFAULT_PROFILE, PERFORMANCE_PROFILES, ROUTE_TABLE_LAYOUT, role_profiles
+from rate_limiter import EC2_BUCKETS, classify
+
+# Typical seconds per operation; waits are the time until the waiter returns
+DEFAULT_LATENCIES = {
+    'DescribeVpcs': 0.15,
+    'ModifyVpcAttribute': 0.2,
+    'DescribeKeyPairs': 0.15,
+    'CreateKeyPair': 0.3,
+    'DescribeInstanceTypes': 0.3,
+    'DescribeImages': 0.3,
+    'DescribeAvailabilityZones': 0.15,
+    'DescribeSubnets': 0.15,
+    'DescribeSecurityGroups': 0.15,
+    'DescribeRouteTables': 0.15,
+    'DescribeInternetGateways': 0.15,
+    'CreatePlacementGroup': 0.3,
+    'CreateSubnet': 0.35,
+    'ModifySubnetAttribute': 0.2,
+    'CreateInternetGateway': 0.3,
+    'AttachInternetGateway': 0.4,
+    'CreateRouteTable': 0.3,
+    'CreateRoute': 0.3,
+    'AssociateRouteTable': 0.3,
+    'CreateSecurityGroup': 0.35,
+    'AuthorizeSecurityGroupIngress': 0.3,
+    'RunInstances': 1.5,
+    'wait:instance_running': 30.0,
+}
+
+WAITER_DELAY = 15
+WAITER_POLL_ACTION = {'wait:instance_running': 'DescribeInstances'}
+
+# preflight.py looks up the launch stand-ins one after the other, then runs every check at once
+PREFLIGHT_STAND_INS = ['DescribeSubnets', 'DescribeSecurityGroups', 'DescribeRouteTables', 'DescribeInternetGateways', 'DescribeKeyPairs']
+PREFLIGHT_CHECKS = [
+    'DescribeVpcs', 'DescribeImages', 'DescribeInstanceTypes', 'DescribeAvailabilityZones',
+    'DryRun:CreateKeyPair', 'DryRun:CreateSubnet', 'DryRun:CreateInternetGateway', 'DryRun:CreateRouteTable',
+    'DryRun:CreateSecurityGroup', 'DryRun:AuthorizeSecurityGroupIngress', 'DryRun:CreateRoute', 'DryRun:AssociateRouteTable',
+    'DryRun:RunInstances', 'DryRun:RunInstances',
+]
+DRY_RUN_LATENCY = 0.2
+
+
+class Operation:
+    __slots__ = ('op_id', 'action', 'label', 'deps')
+
+    def __init__(self, op_id: int, action: str, label: str, deps: list[int]):
+        self.op_id = op_id
+        self.action = action
+        self.label = label
+        self.deps = deps
+
+
+class Plan:
+    """Operation graph of a provisioning run, in the order main.py issues the calls"""
+
+    def __init__(self):
+        self.operations: list[Operation] = []
+
+    def add(self, action: str, label: str, *deps: int | None) -> int:
+        op_id = len(self.operations)
+        self.operations.append(Operation(op_id, action, label, [d for d in deps if d is not None]))
+        return op_id
+
+
+"""
+    Plan construction
+"""
+def add_lab(plan: Plan, vpc: int, key: int, igw: int, profiles: dict, suffix: str = '', serial: bool = True) -> int:
+    """Add one lab (main.py after get_vpc / key pair / profile check / IGW) and return its last operation"""
+    previous = None
+
+    def step(action: str, label: str, *deps: int | None) -> int:
+        nonlocal previous
+        # In serial mode each call also waits for the one before it, as main.py runs them one by one
+        op_id = plan.add(action, f'{label}{suffix}', *deps, previous if serial else None)
+        previous = op_id
+        return op_id
+
+    subnets = {}
+    for key_name in ('public_az1', 'private_az1', 'public_az2', 'private_az2'):
+        subnets[key_name] = step('CreateSubnet', f'subnet {key_name}', vpc)
+        if key_name.startswith('public'):
+            step('ModifySubnetAttribute', f'public IP {key_name}', subnets[key_name])
+
+    for layout in ROUTE_TABLE_LAYOUT.values():
+        route_table = step('CreateRouteTable', layout['name'], vpc)
+        if layout['internet']:
+            step('CreateRoute', f"{layout['name']} default route", route_table, igw)
+        for subnet_key in layout['subnets']:
+            step('AssociateRouteTable', f"{layout['name']} -> {subnet_key}", route_table, subnets[subnet_key])
+
+    app_sg = step('CreateSecurityGroup', 'app sg', vpc)
+    app_rules = [step('AuthorizeSecurityGroupIngress', f"app sg {rule['Description']}", app_sg) for rule in APP_INGRESS_RULES]
+    db_sg = step('CreateSecurityGroup', 'db sg', vpc, app_sg)
+    db_rules = [step('AuthorizeSecurityGroupIngress', f"db sg {rule['Description']}", db_sg) for rule in DB_INGRESS_RULES]
+
+    # main.placement_groups: one group per role, or one per AZ for cluster placement
+    placement = {}
+    for role, profile in profiles.items():
+        groups = {'cluster': ('az1', 'az2'), 'spread': ('',)}.get(profile['placement'], ())
+        placement[role] = [step('CreatePlacementGroup', f"{role} {profile['placement']} group {az}".rstrip()) for az in groups]
+
+    for name, subnet_key, sg, rules in (
+        ('app az1', 'public_az1', app_sg, app_rules),
+        ('app az2', 'public_az2', app_sg, app_rules),
+        ('db az1', 'private_az1', db_sg, db_rules),
+        ('db az2', 'private_az2', db_sg, db_rules),
+    ):
+        run = step('RunInstances', f'run {name}', subnets[subnet_key], sg, key, *rules, *placement[name.split()[0]])
+        step('wait:instance_running', f'wait {name}', run)
+
+    return previous
+
+
+def build_plan(fleet: int = 1, serial: bool = True, app_profile: str = DEFAULT_PROFILE, db_profile: str = DEFAULT_PROFILE,
+               preflight: bool = True) -> Plan:
+    """Operation graph of main.main(), or of provision_fleet() when fleet > 1"""
+    plan = Plan()
+    checks = plan.add('preflight', 'preflight checks') if preflight else None
+    vpc = plan.add('DescribeVpcs', 'get vpc', checks)
+    dns_hostnames = plan.add('ModifyVpcAttribute', 'vpc dns hostnames', vpc)
+    dns_support = plan.add('ModifyVpcAttribute', 'vpc dns support', dns_hostnames)
+    check_key = plan.add('DescribeKeyPairs', 'check key pair', dns_support)
+    key = plan.add('CreateKeyPair', 'create key pair', check_key)
+    # validate_profiles runs once before any lab; nothing depends on its result but the launches
+    profiles_checked = plan.add('DescribeInstanceTypes', 'validate profiles', key if serial else checks)
+
+    igw = plan.add('CreateInternetGateway', 'create igw', profiles_checked if serial else vpc)
+    attach = plan.add('AttachInternetGateway', 'attach igw', igw)
+
+    profiles = role_profiles(app_profile, db_profile)
+    if fleet == 1:
+        add_lab(plan, vpc, profiles_checked, attach, profiles, serial=serial)
+    else:
+        for lab_index in range(fleet):
+            add_lab(plan, vpc, profiles_checked, attach, profiles, f'-lab{lab_index:02d}', serial)
+
+    return plan
+
+
+"""
+    Latency model
+"""
+def load_latencies(path: str | None) -> dict:
+    """Default latencies, overridden by the median of each operation recorded in a JSON lines file"""
+    latencies = dict(DEFAULT_LATENCIES)
+    if not path:
+        return latencies
+
+    samples = {}
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            samples.setdefault(record['operation'], []).append(record['duration'])
+
+    for operation, durations in samples.items():
+        latencies[operation] = statistics.median(durations)
+    return latencies
+
+
+class LatencyRecorder:
+    """Append the duration of every API call and waiter made through a client to a JSON lines file
+
+    Operations are recorded under the names the plan uses: DryRun calls as DryRun:<operation>,
+    waiters as wait:<waiter name>.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def record(self, operation: str, duration: float):
+        line = json.dumps({'operation': operation, 'duration': round(duration, 4)})
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+
+    def _before(self, params, context, **kwargs):
+        context['latency_start'] = time.monotonic()
+        context['latency_dry_run'] = bool(params.get('DryRun'))
+
+    def _after(self, model, context, **kwargs):
+        start = context.get('latency_start')
+        # Describe cache hits still fire after-call but never reached EC2
+        if start is None or 'cached_response' in context:
+            return
+        self.record(f'DryRun:{model.name}' if context.get('latency_dry_run') else model.name, time.monotonic() - start)
+
+    def _timed_waiter(self, get_waiter):
+        def timed_get_waiter(waiter_name: str):
+            waiter = get_waiter(waiter_name)
+            wait = waiter.wait
+
+            def timed_wait(**kwargs):
+                start = time.monotonic()
+                wait(**kwargs)
+                self.record(f'wait:{waiter_name}', time.monotonic() - start)
+
+            waiter.wait = timed_wait
+            return waiter
+        return timed_get_waiter
+
+    def install(self, client):
+        # Registered on the first per-call event so the DryRun flag is seen before anything answers the call
+        client.meta.events.register('provide-client-params.ec2', self._before, unique_id=f'latency-before-{id(self)}')
+        client.meta.events.register('after-call.ec2', self._after, unique_id=f'latency-after-{id(self)}')
+        # Waiters poll through the client but have no events of their own
+        client.get_waiter = self._timed_waiter(client.get_waiter)
+        return client
+
+
+"""
+    Simulation
+"""
+def operation_latency(action: str, latencies: dict) -> float:
+    if action == 'preflight':
+        return (sum(operation_latency(call, latencies) for call in PREFLIGHT_STAND_INS)
+                + max(operation_latency(call, latencies) for call in PREFLIGHT_CHECKS))
+    if action.startswith('DryRun:'):
+        return latencies.get(action, DRY_RUN_LATENCY)
+    return latencies.get(action, 0.3)
+
+
+def api_calls(action: str, latency: float) -> list[str]:
+    if action == 'preflight':
+        return [call.removeprefix('DryRun:') for call in PREFLIGHT_STAND_INS + PREFLIGHT_CHECKS]
+    if action in WAITER_POLL_ACTION:
+        # boto3 waiters poll once immediately, then every WAITER_DELAY seconds
+        return [WAITER_POLL_ACTION[action]] * (1 + math.ceil(latency / WAITER_DELAY))
+    return [action]
+
+
+def simulate(plan: Plan, latencies: dict, concurrency: int, headroom: float = 0.8) -> dict:
+    """Discrete-event simulation of the plan with a fixed number of workers and EC2 token buckets"""
+    operations = plan.operations
+    remaining_deps = [len(op.deps) for op in operations]
+    dependents = [[] for _ in operations]
+    for op in operations:
+        for dep in op.deps:
+            dependents[dep].append(op.op_id)
+
+    buckets = {
+        name: {'capacity': capacity * headroom, 'rate': rate * headroom, 'tokens': capacity * headroom, 'updated': 0.0}
+        for name, (capacity, rate) in EC2_BUCKETS.items()
+    }
+    call_counts = {name: 0 for name in EC2_BUCKETS}
+
+    start = [0.0] * len(operations)
+    finish = [0.0] * len(operations)
+    ready_at = [0.0] * len(operations)
+    cause = [None] * len(operations)
+
+    # Ready operations are picked in plan order, like the scripts issue them
+    ready = [op.op_id for op in operations if not op.deps]
+    heapq.heapify(ready)
+    running = []
+    free_workers = concurrency
+    last_freed_by = None
+    now = 0.0
+
+    while ready or running:
+        while ready and free_workers:
+            op_id = heapq.heappop(ready)
+            op = operations[op_id]
+            latency = operation_latency(op.action, latencies)
+
+            begin = max(now, ready_at[op_id])
+            if begin > ready_at[op_id] and last_freed_by is not None:
+                cause[op_id] = last_freed_by
+            for action in api_calls(op.action, latency):
+                # The scripts always pass IDs or filters, so describes count as filtered calls
+                name = classify(action, {'Filters': True})
+                bucket = buckets[name]
+                call_counts[name] += 1
+
+                # Tokens may go negative: that debt is the wait until the bucket refills
+                bucket['tokens'] = min(bucket['capacity'], bucket['tokens'] + (begin - bucket['updated']) * bucket['rate']) - 1
+                bucket['updated'] = begin
+                if bucket['tokens'] < 0 and not op.action.startswith('wait:'):
+                    begin -= bucket['tokens'] / bucket['rate']
+
+            start[op_id] = begin
+            finish[op_id] = begin + latency
+            heapq.heappush(running, (finish[op_id], op_id))
+            free_workers -= 1
+
+        now, op_id = heapq.heappop(running)
+        free_workers += 1
+        last_freed_by = op_id
+        for dependent in dependents[op_id]:
+            remaining_deps[dependent] -= 1
+            if finish[op_id] >= ready_at[dependent]:
+                ready_at[dependent] = finish[op_id]
+                cause[dependent] = op_id
+            if remaining_deps[dependent] == 0:
+                heapq.heappush(ready, dependent)
+
+    last = max(range(len(operations)), key=lambda i: finish[i])
+    path = []
+    op_id = last
+    while op_id is not None:
+        path.append(op_id)
+        op_id = cause[op_id]
+
+    return {
+        'total': finish[last],
+        'critical_path': [(operations[i], start[i], finish[i]) for i in reversed(path)],
+        'calls': call_counts,
+        'operations': len(operations),
+    }
+
+
+def print_report(result: dict, concurrency: int):
+    print(f"- {result['operations']} operation(s) at concurrency {concurrency}")
+    print(f"- predicted total: {result['total']:.1f}s")
+    print('- critical path:')
+    for op, start, finish in result['critical_path']:
+        print(f'  - {start:>7.1f}s  {finish - start:>6.1f}s  {op.action:<32} {op.label}')
+    print('- expected API calls by throttling bucket:')
+    for bucket, count in result['calls'].items():
+        print(f'  - {bucket:<26} {count}')
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Predict provisioning time and critical path without calling AWS')
+    parser.add_argument('--fleet', type=int, default=1, help='number of labs, as in main.py --fleet')
+    parser.add_argument('--concurrency', type=int, default=1, help='operations in flight at once (1 = main.py today)')
+    parser.add_argument('--dag', action='store_true', help='only keep real data dependencies, not program order')
+    parser.add_argument('--latencies', default=None, help='JSON lines of recorded {"operation", "duration"}')
+    parser.add_argument('--app-profile', choices=PERFORMANCE_PROFILES, default=DEFAULT_PROFILE)
+    parser.add_argument('--db-profile', choices=PERFORMANCE_PROFILES, default=DEFAULT_PROFILE)
+    parser.add_argument('--skip-preflight', action='store_true', help='as in main.py --skip-preflight')
+    args = parser.parse_args(args)
+
+    plan = build_plan(args.fleet, not args.dag, args.app_profile, args.db_profile, not args.skip_preflight)
+    result = simulate(plan, load_latencies(args.latencies), args.concurrency)
+    print_report(result, args.concurrency)
+
+
+if __name__ == '__main__':
+    main()
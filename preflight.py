@@ -0,0 +1,222 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from events import EVENTS
+from lab_layout import APP_INGRESS_RULES, launch_params
+
+
+def classify_error(error: Exception) -> tuple[bool, str]:
+    """Turn a DryRun response into (ok, reason); DryRunOperation means the real call would be allowed"""
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code', type(error).__name__)
+    if code == 'DryRunOperation':
+        return True, 'allowed'
+    if code in ('UnauthorizedOperation', 'AccessDenied', 'AccessDeniedException'):
+        return False, f'missing permission ({code})'
+    return False, f'{code}: {error}'
+
+
+def dry_run(call, **kwargs) -> tuple[bool, str]:
+    try:
+        call(DryRun=True, **kwargs)
+        return True, 'allowed'
+    except Exception as e:
+        return classify_error(e)
+
+
+def dry_run_on_stand_in(call, **kwargs) -> tuple[bool | None, str]:
+    """DryRun against an existing resource of the VPC in place of one main.py creates
+
+    Only a permission error is conclusive; anything else says more about the stand-in than the call.
+    """
+    missing = [key for key, value in kwargs.items() if value is None]
+    if missing:
+        return None, f"not verified: no existing {', '.join(missing)} in the VPC to check against"
+    ok, reason = dry_run(call, **kwargs)
+    if ok or reason.startswith('missing permission'):
+        return ok, reason
+    return None, f'not verified: {reason}'
+
+
+def dry_run_key_pair(ec2, key_name: str) -> tuple[bool, str]:
+    ok, reason = dry_run(ec2.create_key_pair, KeyName=key_name)
+    if not ok and reason.startswith('InvalidKeyPair.Duplicate'):
+        # main.py reuses an existing key pair, so this is not a failure
+        return True, 'already exists'
+    return ok, reason
+
+
+"""
+    Batched validations, one describe each
+"""
+def check_images(ec2, ami_ids: list[str]) -> tuple[bool, str]:
+    try:
+        response = ec2.describe_images(Filters=[{'Name': 'image-id', 'Values': ami_ids}])
+    except Exception as e:
+        return classify_error(e)
+    found = {image['ImageId']: image.get('State') for image in response['Images']}
+    problems = [f'{ami} not found' for ami in ami_ids if ami not in found]
+    problems += [f'{ami} is {state}' for ami, state in found.items() if state != 'available']
+    return (False, ', '.join(problems)) if problems else (True, f'{len(found)} AMI(s) available')
+
+
+def check_instance_types(ec2, instance_types: list[str]) -> tuple[bool, str]:
+    try:
+        response = ec2.describe_instance_types(Filters=[{'Name': 'instance-type', 'Values': instance_types}])
+    except Exception as e:
+        return classify_error(e)
+    found = {item['InstanceType'] for item in response['InstanceTypes']}
+    missing = [t for t in instance_types if t not in found]
+    return (False, f"not offered: {', '.join(missing)}") if missing else (True, f'{len(found)} type(s) offered')
+
+
+def check_zones(ec2, zones: list[str]) -> tuple[bool, str]:
+    try:
+        response = ec2.describe_availability_zones(Filters=[{'Name': 'zone-name', 'Values': zones}])
+    except Exception as e:
+        return classify_error(e)
+    available = {zone['ZoneName'] for zone in response['AvailabilityZones'] if zone['State'] == 'available'}
+    missing = [z for z in zones if z not in available]
+    return (False, f"unavailable: {', '.join(missing)}") if missing else (True, f'{len(zones)} zone(s) available')
+
+
+def check_instance_profile(iam, profile_name: str) -> tuple[bool | None, str]:
+    """None when the profile cannot be looked up: the RunInstances DryRun already covers passing it"""
+    try:
+        iam.get_instance_profile(InstanceProfileName=profile_name)
+        return True, 'exists'
+    except Exception as e:
+        code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+        if code == 'NoSuchEntity':
+            return False, f'instance profile {profile_name} does not exist'
+        return None, f'not verified: {classify_error(e)[1]}'
+
+
+def find_stand_ins(ec2, vpc_id: str, key_name: str) -> dict:
+    """Existing subnet, default security group, main route table, internet gateway and key pair of the VPC
+
+    main.py creates its own before using them; the DryRuns of the calls that need one use these instead.
+    """
+    stand_ins = {'subnet': None, 'security_group': None, 'route_table': None, 'internet_gateway': None, 'key_name': None}
+    vpc_filter = {'Name': 'vpc-id', 'Values': [vpc_id]}
+    try:
+        subnets = ec2.describe_subnets(Filters=[vpc_filter])['Subnets']
+        groups = ec2.describe_security_groups(Filters=[vpc_filter, {'Name': 'group-name', 'Values': ['default']}])['SecurityGroups']
+        route_tables = ec2.describe_route_tables(Filters=[vpc_filter, {'Name': 'association.main', 'Values': ['true']}])['RouteTables']
+        gateways = ec2.describe_internet_gateways(Filters=[{'Name': 'attachment.vpc-id', 'Values': [vpc_id]}])['InternetGateways']
+        key_pairs = ec2.describe_key_pairs(Filters=[{'Name': 'key-name', 'Values': [key_name]}])['KeyPairs']
+    except Exception:
+        return stand_ins
+    stand_ins['subnet'] = subnets[0]['SubnetId'] if subnets else None
+    stand_ins['security_group'] = groups[0]['GroupId'] if groups else None
+    stand_ins['route_table'] = route_tables[0]['RouteTableId'] if route_tables else None
+    stand_ins['internet_gateway'] = gateways[0]['InternetGatewayId'] if gateways else None
+    stand_ins['key_name'] = key_name if key_pairs else None
+    return stand_ins
+
+
+def dry_run_launch(ec2, ami_id: str, profile: dict, stand_ins: dict, iam_profile: str) -> tuple[bool, str]:
+    """RunInstances with the arguments main.py uses; a parameter without a stand-in is left out"""
+    launch = {
+        'SubnetId': stand_ins['subnet'],
+        # Without a subnet, security groups of a non-default VPC cannot be named either
+        'SecurityGroupIds': stand_ins['security_group'] if stand_ins['subnet'] else None,
+        'KeyName': stand_ins['key_name'],
+    }
+    params = launch_params(ami_id, launch['KeyName'], launch['SubnetId'], launch['SecurityGroupIds'], profile, iam_profile=iam_profile)
+    # Placement groups do not exist yet; CreatePlacementGroup is checked on its own
+    params.pop('Placement', None)
+    missing = [key for key, value in launch.items() if value is None]
+    for key in missing:
+        params.pop(key)
+    ok, reason = dry_run(ec2.run_instances, **params)
+    return ok, f"{reason} (without {', '.join(missing)})" if missing and ok else reason
+
+
+def check_vpc(ec2, vpc_id: str) -> tuple[bool, str]:
+    try:
+        response = ec2.describe_vpcs(Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}])
+    except Exception as e:
+        return classify_error(e)
+    return (True, response['Vpcs'][0]['CidrBlock']) if response['Vpcs'] else (False, f'{vpc_id} not found')
+
+
+"""
+    Preflight
+"""
+def build_checks(ec2, iam, plan: dict) -> dict:
+    """Every planned mutating call as a DryRun, plus one batched describe per input to validate"""
+    vpc_id = plan['vpc_id']
+    stand_ins = find_stand_ins(ec2, vpc_id, plan['key_name'])
+    rule = APP_INGRESS_RULES[0]
+    checks = {
+        'vpc exists': lambda: check_vpc(ec2, vpc_id),
+        'AMIs': lambda: check_images(ec2, plan['amis']),
+        'instance types': lambda: check_instance_types(ec2, plan['instance_types']),
+        'availability zones': lambda: check_zones(ec2, plan['zones']),
+        'instance profile': lambda: check_instance_profile(iam, plan['iam_profile']),
+        'CreateKeyPair': lambda: dry_run_key_pair(ec2, plan['key_name']),
+        'CreateSubnet': lambda: dry_run(ec2.create_subnet, VpcId=vpc_id, CidrBlock=plan['cidr'], AvailabilityZone=plan['zones'][0]),
+        'CreateInternetGateway': lambda: dry_run(ec2.create_internet_gateway),
+        'CreateRouteTable': lambda: dry_run(ec2.create_route_table, VpcId=vpc_id),
+        'CreateSecurityGroup': lambda: dry_run(
+            ec2.create_security_group, GroupName='polystudentlab-preflight', Description='preflight', VpcId=vpc_id
+        ),
+        # The calls that modify what main.py creates run against the VPC's default group and main route table
+        'AuthorizeSecurityGroupIngress': lambda: dry_run_on_stand_in(
+            ec2.authorize_security_group_ingress, GroupId=stand_ins['security_group'],
+            IpPermissions=[{
+                'IpProtocol': rule['IpProtocol'], 'FromPort': rule['FromPort'], 'ToPort': rule['ToPort'],
+                'IpRanges': [{'CidrIp': rule['CidrIp'], 'Description': rule['Description']}]
+            }]
+        ),
+        'CreateRoute': lambda: dry_run_on_stand_in(
+            ec2.create_route, RouteTableId=stand_ins['route_table'],
+            DestinationCidrBlock='0.0.0.0/0', GatewayId=stand_ins['internet_gateway']
+        ),
+        'AssociateRouteTable': lambda: dry_run_on_stand_in(
+            ec2.associate_route_table, RouteTableId=stand_ins['route_table'], SubnetId=stand_ins['subnet']
+        ),
+    }
+
+    for strategy in plan['placements']:
+        checks[f'CreatePlacementGroup {strategy}'] = lambda strategy=strategy: dry_run(
+            ec2.create_placement_group, GroupName='polystudentlab-preflight', Strategy=strategy
+        )
+
+    # RunInstances is checked once per role with the arguments main.py launches it with,
+    # including the instance profile so PassRole is covered
+    for ami_id, profile in plan['launches']:
+        checks[f"RunInstances {profile['instance_type']} {ami_id}"] = lambda ami_id=ami_id, profile=profile: dry_run_launch(
+            ec2, ami_id, profile, stand_ins, plan['iam_profile']
+        )
+    return checks
+
+
+def run_preflight(ec2, plan: dict, iam=None, max_workers: int = 16) -> bool:
+    """Run every check at once and report; returns False if any would make the deployment fail"""
+    EVENTS.log('running preflight checks')
+    iam = iam or boto3.client(
+        'iam',
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        aws_session_token=os.getenv('AWS_SESSION_TOKEN')
+    )
+
+    start = time.time()
+    checks = build_checks(ec2, iam, plan)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='preflight') as pool:
+        futures = {name: pool.submit(check) for name, check in checks.items()}
+        results = {name: future.result() for name, future in futures.items()}
+
+    failed = 0
+    for name, (ok, reason) in results.items():
+        # ok is None for checks that could not be run and do not block the deployment
+        EVENTS.emit('check', 'preflight', name=name, outcome='ok' if ok else 'warning' if ok is None else 'error', detail=reason)
+        failed += ok is False
+
+    EVENTS.log(f'preflight finished in {time.time() - start:.1f}s: {len(results) - failed} passed, {failed} failed')
+    EVENTS.flush()
+    return failed == 0
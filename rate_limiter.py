@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+
+# EC2 API throttling buckets: (bucket capacity, refill rate per second)
+# https://docs.aws.amazon.com/ec2/latest/devguide/ec2-api-throttling.html
+EC2_BUCKETS = {
+    'non_mutating': (100, 20),
+    'unfiltered_non_mutating': (50, 5),
+    'mutating': (200, 5),
+    'resource_intensive': (50, 5),
+}
+
+RESOURCE_INTENSIVE_ACTIONS = {
+    'RunInstances',
+    'StartInstances',
+    'StopInstances',
+    'TerminateInstances',
+    'AttachVolume',
+    'CreateVolume',
+    'DeleteVolume',
+    'DetachVolume',
+}
+
+NON_MUTATING_PREFIXES = ('Describe', 'Get', 'List', 'Search')
+
+FILTER_PARAMS = ('Filters', 'MaxResults', 'NextToken')
+
+
+def classify(operation_name: str, params: dict | None = None) -> str:
+    """Return the EC2 throttling bucket an API action draws from"""
+    if operation_name in RESOURCE_INTENSIVE_ACTIONS:
+        return 'resource_intensive'
+
+    if operation_name.startswith(NON_MUTATING_PREFIXES):
+        params = params or {}
+        filtered = any(params.get(name) for name in FILTER_PARAMS) or any(
+            key.endswith('Ids') or key.endswith('Names') for key, value in params.items() if value
+        )
+        return 'non_mutating' if filtered else 'unfiltered_non_mutating'
+
+    return 'mutating'
+
+
+class TokenBucket:
+    """Thread-safe token bucket that blocks callers until a token is available"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+
+                wait = (tokens - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class EC2RateLimiter:
+    """One token bucket per EC2 throttling category, shared by every client it is installed on"""
+
+    def __init__(self, buckets: dict = EC2_BUCKETS, headroom: float = 0.8):
+        # Stay under the account limits so other tools in the account are not starved
+        self.buckets = {
+            name: TokenBucket(capacity * headroom, rate * headroom)
+            for name, (capacity, rate) in buckets.items()
+        }
+        self.calls = {name: 0 for name in buckets}
+        self.lock = threading.Lock()
+
+    def acquire(self, operation_name: str, params: dict | None = None):
+        bucket = classify(operation_name, params)
+        self.buckets[bucket].acquire()
+        with self.lock:
+            self.calls[bucket] += 1
+
+    def _before_call(self, params, model, context=None, **kwargs):
+        # Describes answered by describe_cache.DescribeCache never reach EC2
+        if context and 'cached_response' in context:
+            return
+        self.acquire(model.name, params)
+
+    def install(self, client):
+        """Throttle every API call made through a boto3 EC2 client, waiters included"""
+        client.meta.events.register(
+            'provide-client-params.ec2',
+            self._before_call,
+            unique_id=f'ec2-rate-limiter-{id(self)}'
+        )
+        return client
+
+
+class AsyncTokenBucket:
+    """Token bucket for a single event loop; waiting callers sleep instead of blocking a thread"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self, tokens: float = 1):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return
+
+            await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class AsyncEC2RateLimiter:
+    """EC2RateLimiter counterpart for asyncio callers, awaited before each call"""
+
+    def __init__(self, buckets: dict = EC2_BUCKETS, headroom: float = 0.8):
+        self.buckets = {
+            name: AsyncTokenBucket(capacity * headroom, rate * headroom)
+            for name, (capacity, rate) in buckets.items()
+        }
+        self.calls = {name: 0 for name in buckets}
+
+    async def acquire(self, operation_name: str, params: dict | None = None):
+        bucket = classify(operation_name, params)
+        await self.buckets[bucket].acquire()
+        self.calls[bucket] += 1
@@ -0,0 +1,546 @@
+import argparse
+import ipaddress
+import sys
+import time
+
+import inventory as inv
+
+PORTS = 65536
+ALL_PORTS = (1 << PORTS) - 1
+EPHEMERAL_PORTS = ((1 << (PORTS - 1024)) - 1) << 1024
+PROTOCOLS = ('tcp', 'udp')
+PROTOCOL_NAMES = {'tcp': ('tcp',), '6': ('tcp',), 'udp': ('udp',), '17': ('udp',), '-1': PROTOCOLS}
+NO_PORTS = {'tcp': 0, 'udp': 0}
+
+INTERNET = 'internet'
+PRIVATE_NETWORKS = tuple(ipaddress.ip_network(n) for n in ('10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16'))
+
+
+"""
+    Port sets: one int per protocol, bit N set when port N is allowed
+"""
+def port_bits(from_port: int, to_port: int) -> int:
+    if from_port is None or from_port < 0:
+        return ALL_PORTS
+    return ((1 << (to_port - from_port + 1)) - 1) << from_port
+
+
+def rule_ports(protocol: str, from_port: int, to_port: int) -> dict:
+    ports = dict(NO_PORTS)
+    for name in PROTOCOL_NAMES.get(str(protocol), ()):
+        ports[name] = port_bits(from_port, to_port)
+    return ports
+
+
+def merge(a: dict, b: dict) -> dict:
+    return {p: a[p] | b[p] for p in PROTOCOLS}
+
+
+def intersect(a: dict, b: dict) -> dict:
+    return {p: a[p] & b[p] for p in PROTOCOLS}
+
+
+def is_empty(ports: dict) -> bool:
+    return not any(ports.values())
+
+
+def port_ranges(bits: int) -> list[tuple[int, int]]:
+    ranges = []
+    while bits:
+        low = (bits & -bits).bit_length() - 1
+        shifted = bits >> low
+        length = (shifted ^ (shifted + 1)).bit_length() - 1
+        ranges.append((low, low + length - 1))
+        bits &= ~(((1 << length) - 1) << low)
+    return ranges
+
+
+def format_ports(ports: dict) -> str:
+    parts = []
+    for protocol in PROTOCOLS:
+        for low, high in port_ranges(ports[protocol]):
+            parts.append(f'{protocol}/{low}' if low == high else f'{protocol}/{low}-{high}')
+    return ', '.join(parts) or 'none'
+
+
+"""
+    Peer matching. A peer is either INTERNET (any public address) or an IP network inside the VPC.
+"""
+def parse_network(source: str):
+    try:
+        return ipaddress.ip_network(source, strict=False)
+    except ValueError:
+        return None
+
+
+def cidr_matches(network, peer) -> bool | None:
+    """True if the CIDR covers the whole peer, False if none of it, None if it splits the peer"""
+    if network is None:
+        return False
+    if peer == INTERNET:
+        if any(network.version == private.version and network.subnet_of(private) for private in PRIVATE_NETWORKS):
+            return False
+        # Only a /0 covers every public address; anything narrower covers some of them
+        return True if network.prefixlen == 0 else None
+    if network.version != peer.version:
+        return False
+    if peer.subnet_of(network):
+        return True
+    if network.subnet_of(peer):
+        return None
+    return False
+
+
+class CompiledGroup:
+    """Security group rules split into group-reference and CIDR rules with precomputed port sets"""
+
+    __slots__ = ('by_group', 'by_cidr', 'open_to_all')
+
+    def __init__(self, rules: list[dict]):
+        self.by_group: dict[str, dict] = {}
+        by_cidr: dict[str, dict] = {}
+        for rule in rules:
+            ports = rule_ports(rule['protocol'], rule['from'], rule['to'])
+            target = self.by_group if rule['source'].startswith('sg-') else by_cidr
+            target[rule['source']] = merge(target.get(rule['source'], NO_PORTS), ports)
+        self.by_cidr = [(parse_network(cidr), ports) for cidr, ports in by_cidr.items()]
+        self.open_to_all = any(
+            network is not None and network.prefixlen == 0 and all(ports[p] == ALL_PORTS for p in PROTOCOLS)
+            for network, ports in self.by_cidr
+        )
+
+    def allowed(self, peer, peer_groups: frozenset) -> tuple[dict, bool]:
+        """Ports allowed for a peer, and whether a CIDR rule only covers part of the peer"""
+        ports = dict(NO_PORTS)
+        partial = False
+        for group_id in peer_groups:
+            if group_id in self.by_group:
+                ports = merge(ports, self.by_group[group_id])
+        for network, rule in self.by_cidr:
+            match = cidr_matches(network, peer)
+            # Some internet address is allowed when a rule names any public CIDR
+            if match or (match is None and peer == INTERNET):
+                ports = merge(ports, rule)
+            if match is None:
+                partial = True
+        return ports, partial
+
+
+class CompiledAcl:
+    """Network ACL entries evaluated in rule-number order into allowed port sets per peer"""
+
+    __slots__ = ('entries', 'cache')
+
+    def __init__(self, entries: list[dict]):
+        self.entries = [
+            (entry['egress'], entry['action'] == 'allow', parse_network(entry['cidr']),
+             rule_ports(entry['protocol'], entry['from'], entry['to']))
+            for entry in entries
+        ]
+        self.cache = {}
+
+    def allowed(self, egress: bool, peer) -> tuple[dict, bool]:
+        key = (egress, peer)
+        if key in self.cache:
+            return self.cache[key]
+
+        allowed = dict(NO_PORTS)
+        decided = dict(NO_PORTS)
+        partial = False
+        for entry_egress, allow, network, ports in self.entries:
+            if entry_egress != egress:
+                continue
+            match = cidr_matches(network, peer)
+            if match is None:
+                partial = True
+                # A narrower public CIDR decides nothing for the internet as a whole: its deny leaves
+                # other addresses open, its allow opens the ports to some address
+                if peer == INTERNET and allow:
+                    for protocol in PROTOCOLS:
+                        allowed[protocol] |= ports[protocol] & ~decided[protocol]
+            if not match:
+                continue
+            for protocol in PROTOCOLS:
+                fresh = ports[protocol] & ~decided[protocol]
+                if allow:
+                    allowed[protocol] |= fresh
+                decided[protocol] |= fresh
+
+        self.cache[key] = (allowed, partial)
+        return allowed, partial
+
+
+ALLOW_ALL_ACL = CompiledAcl([
+    {'egress': False, 'action': 'allow', 'cidr': '0.0.0.0/0', 'protocol': '-1', 'from': -1, 'to': -1},
+    {'egress': True, 'action': 'allow', 'cidr': '0.0.0.0/0', 'protocol': '-1', 'from': -1, 'to': -1},
+])
+
+
+"""
+    Graph
+"""
+class Endpoint:
+    __slots__ = ('instance_id', 'name', 'subnet_id', 'network', 'ip', 'public', 'groups', 'key')
+
+    def __init__(self, instance_id, name, subnet_id, network, ip, public, groups):
+        self.instance_id = instance_id
+        self.name = name
+        self.subnet_id = subnet_id
+        self.network = network
+        self.ip = ip
+        self.public = public
+        self.groups = groups
+        # Instances sharing a subnet, security groups and public exposure behave identically
+        self.key = (subnet_id, groups, public)
+
+
+class ReachabilityGraph:
+    """Offline model of which instances can reach which, on which ports, built from an inventory"""
+
+    def __init__(self, inventory: inv.Inventory):
+        self.inventory = inventory
+        self.groups_in = {sg.resource_id: CompiledGroup(sg.data['ingress']) for sg in inventory.by_type('security-group')}
+        self.groups_out = {sg.resource_id: CompiledGroup(sg.data['egress']) for sg in inventory.by_type('security-group')}
+
+        subnets = {s.resource_id: s for s in inventory.by_type('subnet')}
+        attached_igws = {igw.resource_id for igw in inventory.by_type('internet-gateway') if igw.data['vpcs']}
+
+        route_tables = {}
+        main_tables = {}
+        for rt in inventory.by_type('route-table'):
+            internet = any(
+                route['target'] in attached_igws and route['state'] == 'active'
+                and getattr(parse_network(route['destination'] or ''), 'prefixlen', None) == 0
+                for route in rt.data['routes']
+            )
+            if rt.data['main']:
+                main_tables[rt.vpc_id] = internet
+            for subnet_id in rt.data['subnets']:
+                route_tables[subnet_id] = internet
+        self.internet_subnets = {
+            subnet_id for subnet_id, subnet in subnets.items()
+            if route_tables.get(subnet_id, main_tables.get(subnet.vpc_id, False))
+        }
+
+        self.acls = {}
+        for acl in inventory.by_type('network-acl'):
+            compiled = CompiledAcl(acl.data['entries'])
+            for subnet_id in acl.data['subnets']:
+                self.acls[subnet_id] = compiled
+
+        self.endpoints: dict[str, Endpoint] = {}
+        for instance in inventory.by_type('instance'):
+            data = instance.data
+            subnet = subnets.get(data['subnet_id'])
+            if subnet is None or data['state'] != 'running' or not data['private_ip']:
+                continue
+            self.endpoints[instance.resource_id] = Endpoint(
+                instance.resource_id,
+                instance.name,
+                data['subnet_id'],
+                ipaddress.ip_network(subnet.data['cidr']),
+                ipaddress.ip_network(data['private_ip']),
+                bool(data['public_ip']),
+                frozenset(data['security_groups']),
+            )
+
+        # Instance bitsets: bit N stands for self.order[N]
+        self.order = list(self.endpoints.values())
+        self.group_members: dict[str, int] = {}
+        self.subnet_members: dict[str, int] = {}
+        self.subnet_networks = {subnet_id: ipaddress.ip_network(s.data['cidr']) for subnet_id, s in subnets.items()}
+        self.restricted_egress = 0
+        for index, endpoint in enumerate(self.order):
+            bit = 1 << index
+            for group_id in endpoint.groups:
+                self.group_members[group_id] = self.group_members.get(group_id, 0) | bit
+            self.subnet_members[endpoint.subnet_id] = self.subnet_members.get(endpoint.subnet_id, 0) | bit
+            if not any(self.groups_out[g].open_to_all for g in endpoint.groups if g in self.groups_out):
+                self.restricted_egress |= bit
+
+        # Subnets that a NACL entry or egress rule only partly covers: their instances are not interchangeable destinations
+        destination_cidrs = {network for acl in self.acls.values() for _, _, network, _ in acl.entries}
+        destination_cidrs |= {network for group in self.groups_out.values() for network, _ in group.by_cidr}
+        self.split_subnets = {
+            subnet_id for subnet_id, network in self.subnet_networks.items()
+            if any(cidr_matches(cidr, network) is None for cidr in destination_cidrs)
+        }
+
+        self.nacl_cache = {}
+        self.cidr_cache = {}
+
+    def group_allowed(self, compiled: dict, group_ids, peer, peer_groups) -> tuple[dict, bool]:
+        ports = dict(NO_PORTS)
+        partial = False
+        for group_id in group_ids:
+            group = compiled.get(group_id)
+            if group is None:
+                continue
+            allowed, split = group.allowed(peer, peer_groups)
+            ports = merge(ports, allowed)
+            partial = partial or split
+        return ports, partial
+
+    def acl_allowed(self, subnet_id: str, egress: bool, peer) -> tuple[dict, bool]:
+        return self.acls.get(subnet_id, ALLOW_ALL_ACL).allowed(egress, peer)
+
+    def return_allowed(self, subnet_id: str, egress: bool, peer) -> dict:
+        # NACLs are stateless; the reply needs some ephemeral port open on the way back
+        allowed, _ = self.acl_allowed(subnet_id, egress, peer)
+        return {p: ALL_PORTS if allowed[p] & EPHEMERAL_PORTS else 0 for p in PROTOCOLS}
+
+    def nacl_mask(self, src_peer, src_subnet: str | None, dst_subnet: str, dst_peer) -> tuple[dict, bool]:
+        """Ports the NACLs on both subnets let through between a source and a destination peer"""
+        ports = {p: ALL_PORTS for p in PROTOCOLS}
+        if src_subnet == dst_subnet:
+            return ports, False
+
+        allowed, partial = self.acl_allowed(dst_subnet, False, src_peer)
+        ports = intersect(intersect(ports, allowed), self.return_allowed(dst_subnet, True, src_peer))
+        if src_subnet is not None:
+            allowed, split = self.acl_allowed(src_subnet, True, dst_peer)
+            ports = intersect(intersect(ports, allowed), self.return_allowed(src_subnet, False, dst_peer))
+            partial = partial or split
+        return ports, partial
+
+    def evaluate(self, src_peer, src_groups, src_subnet, dst: Endpoint) -> dict:
+        """Ports open from a source (peer address, groups, subnet) to a destination instance"""
+        ports, _ = self.group_allowed(self.groups_in, dst.groups, src_peer, src_groups)
+        if is_empty(ports):
+            return ports
+
+        # Checked against the destination's own address: a rule naming part of its subnet still decides it
+        if src_subnet is not None:
+            egress, _ = self.group_allowed(self.groups_out, src_groups, dst.ip, dst.groups)
+            ports = intersect(ports, egress)
+
+        mask, _ = self.nacl_mask(src_peer, src_subnet, dst.subnet_id, dst.ip)
+        return intersect(ports, mask)
+
+    def from_internet(self, dst: Endpoint) -> dict:
+        if not dst.public or dst.subnet_id not in self.internet_subnets:
+            return dict(NO_PORTS)
+        return self.evaluate(INTERNET, frozenset(), None, dst)
+
+    def between(self, src: Endpoint, dst: Endpoint) -> dict:
+        if src.ip.version != dst.ip.version:
+            return dict(NO_PORTS)
+        return self.evaluate(src.ip, src.groups, src.subnet_id, dst)
+
+    def resolve(self, identifier: str) -> Endpoint | None:
+        if identifier in self.endpoints:
+            return self.endpoints[identifier]
+        for endpoint in self.endpoints.values():
+            if endpoint.name == identifier:
+                return endpoint
+        return None
+
+    def query(self, source: str, destination: str) -> dict:
+        dst = self.resolve(destination)
+        if dst is None:
+            raise KeyError(destination)
+        if source == INTERNET:
+            return self.from_internet(dst)
+        src = self.resolve(source)
+        if src is None:
+            raise KeyError(source)
+        return self.between(src, dst)
+
+    """
+        All pairs, computed once per destination class over instance bitsets
+    """
+    def members_in(self, network, bits: int) -> int:
+        matched = 0
+        for index in iter_bits(bits):
+            if self.order[index].ip.subnet_of(network):
+                matched |= 1 << index
+        return matched
+
+    def cidr_members(self, network) -> int:
+        """Bitset of instances whose address falls inside a CIDR"""
+        if network in self.cidr_cache:
+            return self.cidr_cache[network]
+        bits = 0
+        for subnet_id, subnet_bits in self.subnet_members.items():
+            match = cidr_matches(network, self.subnet_networks[subnet_id])
+            if match:
+                bits |= subnet_bits
+            elif match is None:
+                bits |= self.members_in(network, subnet_bits)
+        self.cidr_cache[network] = bits
+        return bits
+
+    def subnet_masks(self, dst: Endpoint) -> dict:
+        """Group source instances by the NACL port mask towards the destination subnet
+
+        Keys are (tcp, udp) masks, or None for subnets a NACL entry splits, which need exact evaluation.
+        """
+        if dst.subnet_id in self.nacl_cache:
+            return self.nacl_cache[dst.subnet_id]
+        masks = {}
+        for subnet_id, subnet_bits in self.subnet_members.items():
+            mask, partial = self.nacl_mask(self.subnet_networks[subnet_id], subnet_id, dst.subnet_id, dst.network)
+            key = None if partial else (mask['tcp'], mask['udp'])
+            masks[key] = masks.get(key, 0) | subnet_bits
+        self.nacl_cache[dst.subnet_id] = masks
+        return masks
+
+    def sources_for(self, dst: Endpoint) -> dict[tuple, int]:
+        """Map each distinct open port set to the bitset of source instances that get it"""
+        rules = []
+        for group_id in dst.groups:
+            group = self.groups_in.get(group_id)
+            if group is None:
+                continue
+            for source_group, ports in group.by_group.items():
+                rules.append((ports, self.group_members.get(source_group, 0)))
+            for network, ports in group.by_cidr:
+                rules.append((ports, self.cidr_members(network)))
+
+        masks = self.subnet_masks(dst)
+        split_subnets = masks.get(None, 0)
+        result: dict[tuple, int] = {}
+        exact = 0
+        for (tcp, udp), bits in refine(rules).items():
+            exact |= bits & (self.restricted_egress | split_subnets)
+            bits &= ~(self.restricted_egress | split_subnets)
+            for mask, subnet_bits in masks.items():
+                sources = bits & subnet_bits
+                if mask is None or not sources:
+                    continue
+                effective = (tcp & mask[0], udp & mask[1])
+                if effective[0] or effective[1]:
+                    result[effective] = result.get(effective, 0) | sources
+
+        # Restricted egress or a NACL splitting a subnet: fall back to exact per-instance evaluation
+        for index in iter_bits(exact):
+            ports = self.between(self.order[index], dst)
+            if not is_empty(ports):
+                effective = (ports['tcp'], ports['udp'])
+                result[effective] = result.get(effective, 0) | 1 << index
+
+        return result
+
+    def all_pairs(self) -> 'ReachabilityMatrix':
+        members: dict[tuple, int] = {}
+        representatives: dict[tuple, Endpoint] = {}
+        for index, dst in enumerate(self.order):
+            key = dst.key + (dst.ip,) if dst.subnet_id in self.split_subnets else dst.key
+            members[key] = members.get(key, 0) | 1 << index
+            representatives.setdefault(key, dst)
+
+        rows = {key: self.sources_for(dst) for key, dst in representatives.items()}
+        internet = {key: self.from_internet(dst) for key, dst in representatives.items()}
+        return ReachabilityMatrix(self.order, members, rows, internet)
+
+
+class ReachabilityMatrix:
+    """All-pairs result kept per destination class as (port set, source bitset) rows"""
+
+    def __init__(self, order: list[Endpoint], members: dict, rows: dict, internet: dict):
+        self.order = order
+        self.members = members
+        self.rows = rows
+        self.internet = internet
+
+    def count(self) -> int:
+        total = 0
+        for key, dst_bits in self.members.items():
+            if not is_empty(self.internet[key]):
+                total += dst_bits.bit_count()
+            for sources in self.rows[key].values():
+                # Drop the instance-to-itself pairs
+                total += sources.bit_count() * dst_bits.bit_count() - (sources & dst_bits).bit_count()
+        return total
+
+    def pairs(self):
+        """Yield (source ID or INTERNET, destination ID, ports) for every open pair"""
+        for key, dst_bits in self.members.items():
+            for dst_index in iter_bits(dst_bits):
+                dst = self.order[dst_index]
+                if not is_empty(self.internet[key]):
+                    yield INTERNET, dst.instance_id, self.internet[key]
+                for ports, sources in self.rows[key].items():
+                    for src_index in iter_bits(sources & ~(1 << dst_index)):
+                        yield self.order[src_index].instance_id, dst.instance_id, dict(zip(PROTOCOLS, ports))
+
+
+def iter_bits(bits: int):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def refine(rules: list[tuple[dict, int]]) -> dict[tuple, int]:
+    """Split sources into disjoint bitsets, each with the union of ports from every rule covering it"""
+    parts: dict[tuple, int] = {}
+    for ports, bits in rules:
+        if not bits or is_empty(ports):
+            continue
+        key = (ports['tcp'], ports['udp'])
+        refined = {}
+        remaining = bits
+        for part_ports, part_bits in parts.items():
+            inside = part_bits & bits
+            outside = part_bits & ~bits
+            if outside:
+                refined[part_ports] = refined.get(part_ports, 0) | outside
+            if inside:
+                merged = (part_ports[0] | key[0], part_ports[1] | key[1])
+                refined[merged] = refined.get(merged, 0) | inside
+            remaining &= ~part_bits
+        if remaining:
+            refined[key] = refined.get(key, 0) | remaining
+        parts = refined
+    return parts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Answer reachability questions from an inventory snapshot')
+    parser.add_argument('snapshot', help='inventory snapshot (see inventory.py snapshot)')
+    parser.add_argument('--from', dest='source', default=None, help=f'instance ID, Name tag or "{INTERNET}"')
+    parser.add_argument('--to', dest='destination', default=None, help='instance ID or Name tag')
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--protocol', default='tcp', choices=PROTOCOLS)
+    parser.add_argument('--list', action='store_true', help='list every open pair, not just the totals')
+    args = parser.parse_args()
+
+    try:
+        snapshot = inv.load(args.snapshot)
+    except FileNotFoundError:
+        print(f'- snapshot {args.snapshot} not found')
+        sys.exit(1)
+
+    start = time.time()
+    graph = ReachabilityGraph(snapshot)
+
+    if args.source and args.destination:
+        try:
+            ports = graph.query(args.source, args.destination)
+        except KeyError as e:
+            print(f'- instance {e} not found in snapshot')
+            sys.exit(1)
+        if args.port is not None:
+            open_port = bool(ports[args.protocol] >> args.port & 1)
+            print(f"- {args.source} -> {args.destination} {args.protocol}/{args.port}: {'REACHABLE' if open_port else 'blocked'}")
+        else:
+            print(f'- {args.source} -> {args.destination}: {format_ports(ports)}')
+        return
+
+    matrix = graph.all_pairs()
+    print(f'- {len(graph.order)} instance(s), {matrix.count()} open pair(s), computed in {time.time() - start:.2f}s')
+
+    exposed = [graph.order[i].name for key, bits in matrix.members.items() if not is_empty(matrix.internet[key]) for i in iter_bits(bits)]
+    print(f'- {len(exposed)} instance(s) reachable from the internet')
+
+    if args.list or args.port is not None:
+        for source, destination, ports in matrix.pairs():
+            if args.port is not None and not ports[args.protocol] >> args.port & 1:
+                continue
+            source_name = INTERNET if source == INTERNET else graph.endpoints[source].name
+            print(f'  - {source_name} -> {graph.endpoints[destination].name}: {format_ports(ports)}')
+
+
+if __name__ == '__main__':
+    main()
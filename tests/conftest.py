@@ -0,0 +1,92 @@
+import gzip
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The tools are top-level scripts, imported by module name like they import each other
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from events import EVENTS  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def flush_events():
+    # Events are written from a background thread; flush so they land in the test's captured output
+    yield
+    EVENTS.flush()
+
+
+def bulk_items(body: str) -> list[tuple[dict, dict | None]]:
+    """Split an NDJSON _bulk body into (action, source) pairs; delete actions have no source"""
+    lines = [json.loads(line) for line in body.splitlines() if line.strip()]
+    items = []
+    while lines:
+        action = lines.pop(0)
+        source = None if 'delete' in action else lines.pop(0)
+        items.append((action, source))
+    return items
+
+
+def bulk_ok(body: str) -> dict:
+    return {'errors': False, 'items': [{next(iter(action)): {'status': 201}} for action, _ in bulk_items(body)]}
+
+
+class ElasticsearchStandIn:
+    """Local HTTP server answering like Elasticsearch from scripted responses
+
+    Each queued response is a function (method, path, body) -> (status, payload), where payload is a
+    JSON-serializable object or raw bytes; (status, payload, content_length) announces a different
+    Content-Length to send a truncated body. With the queue empty, _bulk requests all succeed.
+    """
+
+    def __init__(self):
+        self.requests: list[tuple[str, str, str]] = []
+        self.responses = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def handle_request(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                stand_in.requests.append((self.command, self.path, body.decode('utf-8')))
+                respond = stand_in.responses.pop(0) if stand_in.responses else stand_in.default
+                status, payload, *length = respond(self.command, self.path, body.decode('utf-8'))
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(length[0] if length else len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                if length:
+                    self.close_connection = True
+
+            do_GET = do_POST = do_PUT = do_DELETE = handle_request
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+
+    def default(self, method: str, path: str, body: str):
+        if path.startswith('/_bulk'):
+            return 200, bulk_ok(body)
+        return 200, {'acknowledged': True}
+
+    def bulk_requests(self) -> list[list[tuple[dict, dict | None]]]:
+        return [bulk_items(body) for _, path, body in self.requests if path.startswith('/_bulk')]
+
+
+@pytest.fixture
+def es_server():
+    stand_in = ElasticsearchStandIn()
+    stand_in.thread.start()
+    yield stand_in
+    stand_in.server.shutdown()
+    stand_in.server.server_close()
@@ -0,0 +1,97 @@
+from botocore.exceptions import ClientError
+
+import cleanup
+
+
+class FakeClient:
+    """Answers describe_network_interfaces from a fixed set of available interfaces, one per subnet"""
+
+    def __init__(self, subnet_ids: list[str]):
+        self.interfaces = {f'eni-{subnet_id}': subnet_id for subnet_id in subnet_ids}
+        self.filters = []
+        self.deleted = []
+
+    def get_paginator(self, operation: str):
+        return self
+
+    def paginate(self, Filters: list):
+        self.filters.append(Filters)
+        subnets = set(Filters[0]['Values'])
+        yield {'NetworkInterfaces': [
+            {'NetworkInterfaceId': ni_id, 'SubnetId': subnet_id, 'Status': 'available'}
+            for ni_id, subnet_id in self.interfaces.items() if subnet_id in subnets
+        ]}
+
+    def delete_network_interface(self, NetworkInterfaceId: str):
+        self.deleted.append(NetworkInterfaceId)
+
+
+def test_manifest_interfaces_are_listed_for_every_subnet():
+    subnet_ids = [f'subnet-{i:03d}' for i in range(cleanup.FILTER_VALUES_LIMIT * 2 + 1)]
+    client = FakeClient(subnet_ids)
+
+    assert cleanup.delete_network_interfaces('vpc-1', client, subnet_ids) == len(subnet_ids)
+    assert len(client.filters) == 3
+    assert all(len(filters[0]['Values']) <= cleanup.FILTER_VALUES_LIMIT for filters in client.filters)
+    assert sorted(client.deleted) == sorted(client.interfaces)
+
+
+class DeniedPlacementGroups:
+    def get_paginator(self, operation: str):
+        return self
+
+    def paginate(self, Filters: list):
+        yield {'Subnets': [{'SubnetId': 'subnet-1', 'Tags': [{'Key': cleanup.RUN_ID_TAG, 'Value': 'run-1'}]}]}
+
+    def describe_placement_groups(self, Filters: list):
+        raise ClientError({'Error': {'Code': 'UnauthorizedOperation', 'Message': 'denied'}}, 'DescribePlacementGroups')
+
+
+def test_placement_group_errors_do_not_stop_teardown():
+    assert cleanup.delete_placement_groups('vpc-1', DeniedPlacementGroups()) == 0
+
+
+class InUseInterfaces:
+    """In-use interfaces whose status turns available once their instance is terminated"""
+
+    def __init__(self, terminated: set[str]):
+        self.terminated = terminated
+        self.interfaces = {
+            'eni-lambda': {'Status': 'in-use', 'RequesterManaged': True, 'RequesterId': 'AWSLambda',
+                           'Attachment': {'AttachmentId': 'attach-1', 'DeviceIndex': 1}},
+            'eni-kept': {'Status': 'in-use', 'Attachment': {'AttachmentId': 'attach-2', 'DeviceIndex': 0, 'InstanceId': 'i-kept'}},
+            'eni-ended': {'Status': 'in-use', 'Attachment': {'AttachmentId': 'attach-3', 'DeviceIndex': 0, 'InstanceId': 'i-ended'}},
+        }
+        self.described = 0
+        self.detached = []
+        self.deleted = []
+
+    def get_paginator(self, operation: str):
+        return self
+
+    def paginate(self, Filters: list):
+        self.described += 1
+        if self.described > 1:
+            for ni in self.interfaces.values():
+                if ni['Attachment'].get('InstanceId') in self.terminated:
+                    ni['Status'] = 'available'
+        ids = Filters[0]['Values'] if Filters[0]['Name'] == 'network-interface-id' else self.interfaces
+        yield {'NetworkInterfaces': [{'NetworkInterfaceId': ni_id, **self.interfaces[ni_id]} for ni_id in ids]}
+
+    def detach_network_interface(self, AttachmentId: str, Force: bool):
+        self.detached.append(AttachmentId)
+
+    def delete_network_interface(self, NetworkInterfaceId: str):
+        self.deleted.append(NetworkInterfaceId)
+
+
+def test_interfaces_this_teardown_cannot_release_are_skipped():
+    client = InUseInterfaces({'i-ended'})
+
+    deleted = cleanup.delete_network_interfaces('vpc-1', client, terminated=['i-ended'], poll_interval=0, timeout=5)
+
+    assert deleted == 1
+    assert client.deleted == ['eni-ended']
+    assert client.detached == []
+    # Listing, then a single tick for the primary interface of the terminated instance
+    assert client.described == 2
@@ -0,0 +1,35 @@
+import gzip
+import json
+
+import cloudtrail_analyzer as ct
+
+
+def record(event_name: str, group_id: str) -> dict:
+    return {
+        'eventName': event_name, 'eventTime': '2024-05-01T10:00:00Z', 'awsRegion': 'us-east-1',
+        'userIdentity': {'arn': 'arn:aws:iam::123456789012:user/lab'},
+        'requestParameters': {'groupId': group_id},
+    }
+
+
+def write_archive(path, payload: bytes):
+    path.write_bytes(gzip.compress(payload))
+
+
+def test_unreadable_archives_are_skipped_without_losing_the_others(tmp_path):
+    good = json.dumps({'Records': [record('AuthorizeSecurityGroupIngress', 'sg-0123456789abcdef0')]}).encode()
+    write_archive(tmp_path / 'a-good.json.gz', good)
+    # Truncated in the middle of the deflate stream
+    (tmp_path / 'b-truncated.json.gz').write_bytes(gzip.compress(good * 50)[:60])
+    # Valid gzip around a body that is not JSON
+    write_archive(tmp_path / 'c-garbled.json.gz', b'{"Records": [{"eventName": "RunInstances", ')
+    # Corrupt deflate data behind a valid gzip header
+    corrupt = bytearray(gzip.compress(good))
+    corrupt[12:20] = b'\xff' * 8
+    (tmp_path / 'd-corrupt.json.gz').write_bytes(bytes(corrupt))
+
+    columns, skipped = ct.analyze(str(tmp_path), workers=2)
+
+    assert columns['event_name'] == ['AuthorizeSecurityGroupIngress']
+    assert columns['resources'] == ['sg-0123456789abcdef0']
+    assert sorted(path.rsplit('/', 1)[1] for path in skipped) == ['b-truncated.json.gz', 'c-garbled.json.gz', 'd-corrupt.json.gz']
@@ -0,0 +1,51 @@
+import compliance
+import inventory as inv
+
+
+def security_group(*permissions: dict) -> inv.Resource:
+    return inv.from_security_group({
+        'GroupId': 'sg-1', 'GroupName': 'app', 'VpcId': 'vpc-1', 'IpPermissions': list(permissions), 'IpPermissionsEgress': [],
+    })
+
+
+def world(protocol: str, from_port: int | None = None, to_port: int | None = None) -> dict:
+    permission = {'IpProtocol': protocol, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}
+    if from_port is not None:
+        permission.update(FromPort=from_port, ToPort=to_port)
+    return permission
+
+
+def test_covers_port_only_matches_tcp_rules():
+    control = next(control for control in compliance.CONTROLS if control['id'] == 'IVS-03.1')
+    passes = compliance.compile_condition(control['check'])
+    assert not passes(security_group(world('tcp', 22, 22)))
+    assert not passes(security_group(world('-1')))
+    assert passes(security_group(world('udp', 22, 22)))
+    # ICMP type and code ranges are not ports
+    assert passes(security_group(world('icmp', -1, -1)))
+
+
+def test_network_acl_protocols_are_numbers():
+    nacl_open = compliance.compile_condition({'covers_port': 22})
+    assert nacl_open({'protocol': '6', 'from': 22, 'to': 22})
+    assert not nacl_open({'protocol': '17', 'from': 22, 'to': 22})
+
+
+def network_acl(*entries: tuple) -> inv.Resource:
+    return inv.from_network_acl({'NetworkAclId': 'acl-1', 'VpcId': 'vpc-1', 'Entries': [
+        {'RuleNumber': number, 'Egress': False, 'Protocol': '6', 'RuleAction': action, 'CidrBlock': cidr,
+         'PortRange': {'From': from_port, 'To': to_port}}
+        for number, action, cidr, from_port, to_port in entries
+    ]})
+
+
+def test_network_acl_entries_are_evaluated_in_rule_order():
+    control = next(control for control in compliance.CONTROLS if control['id'] == 'IVS-09.1')
+    passes = compliance.compile_condition(control['check'])
+    assert not passes(network_acl((100, 'allow', '0.0.0.0/0', 22, 22)))
+    # A lower-numbered deny shadows the allow, whichever order the entries were described in
+    assert passes(network_acl((100, 'allow', '0.0.0.0/0', 0, 65535), (90, 'deny', '0.0.0.0/0', 22, 22),
+                              (80, 'deny', '0.0.0.0/0', 3389, 3389)))
+    # Denying SSH leaves RDP open, and a deny on a single address shadows nothing for the internet
+    assert not passes(network_acl((90, 'deny', '0.0.0.0/0', 22, 22), (100, 'allow', '0.0.0.0/0', 0, 65535)))
+    assert not passes(network_acl((90, 'deny', '198.51.100.7/32', 0, 65535), (100, 'allow', '0.0.0.0/0', 22, 22)))
@@ -0,0 +1,87 @@
+import boto3
+from botocore.awsrequest import AWSResponse
+
+from describe_cache import DescribeCache
+
+NAMESPACE = 'xmlns="http://ec2.amazonaws.com/doc/2016-11-15/"'
+RESPONSES = {
+    'DescribeSecurityGroups': f'<DescribeSecurityGroupsResponse {NAMESPACE}><securityGroupInfo><item>'
+                              '<groupId>sg-1</groupId><groupName>app</groupName><vpcId>vpc-1</vpcId>'
+                              '</item></securityGroupInfo></DescribeSecurityGroupsResponse>',
+    'DescribeSubnets': f'<DescribeSubnetsResponse {NAMESPACE}><subnetSet><item>'
+                       '<subnetId>subnet-1</subnetId><vpcId>vpc-1</vpcId></item></subnetSet></DescribeSubnetsResponse>',
+    'AuthorizeSecurityGroupIngress': f'<AuthorizeSecurityGroupIngressResponse {NAMESPACE}>'
+                                     '<return>true</return></AuthorizeSecurityGroupIngressResponse>',
+}
+DENIED = ('<Response><Errors><Error><Code>UnauthorizedOperation</Code><Message>denied</Message></Error></Errors>'
+          '<RequestID>1</RequestID></Response>')
+
+
+class RawBody:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+class FakeEndpoint:
+    """Answers on the wire, below the cache's before-call hook, and records the operations sent"""
+
+    def __init__(self, denied: set[str] = frozenset()):
+        self.denied = denied
+        self.sent = []
+
+    def __call__(self, request, event_name: str, **kwargs):
+        operation = event_name.rsplit('.', 1)[1]
+        self.sent.append(operation)
+        if operation in self.denied:
+            return AWSResponse(request.url, 403, {}, RawBody(DENIED.encode()))
+        return AWSResponse(request.url, 200, {}, RawBody(RESPONSES[operation].encode()))
+
+
+def cached_client(endpoint: FakeEndpoint) -> tuple:
+    client = boto3.client('ec2', region_name='us-east-1', aws_access_key_id='test', aws_secret_access_key='test')
+    cache = DescribeCache(settle_time=0)
+    cache.install(client)
+    client.meta.events.register('before-send.ec2', endpoint)
+    return client, cache
+
+
+def describe_groups(client) -> list[str]:
+    response = client.describe_security_groups(Filters=[{'Name': 'vpc-id', 'Values': ['vpc-1']}])
+    return [group['GroupId'] for group in response['SecurityGroups']]
+
+
+def test_mutating_call_invalidates_only_the_types_it_changes():
+    endpoint = FakeEndpoint()
+    client, cache = cached_client(endpoint)
+
+    assert describe_groups(client) == describe_groups(client) == ['sg-1']
+    client.describe_subnets(Filters=[{'Name': 'vpc-id', 'Values': ['vpc-1']}])
+    assert endpoint.sent == ['DescribeSecurityGroups', 'DescribeSubnets']
+
+    client.authorize_security_group_ingress(GroupId='sg-1', IpPermissions=[
+        {'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'IpRanges': [{'CidrIp': '10.0.0.0/16'}]}])
+    describe_groups(client)
+    describe_groups(client)
+    client.describe_subnets(Filters=[{'Name': 'vpc-id', 'Values': ['vpc-1']}])
+
+    # The security groups are described again once, the subnets are still cached
+    assert endpoint.sent[2:] == ['AuthorizeSecurityGroupIngress', 'DescribeSecurityGroups']
+    assert cache.stats['invalidated'] == 1
+
+
+def test_failed_mutation_keeps_the_cache():
+    endpoint = FakeEndpoint(denied={'AuthorizeSecurityGroupIngress'})
+    client, cache = cached_client(endpoint)
+    describe_groups(client)
+
+    try:
+        client.authorize_security_group_ingress(GroupId='sg-1', IpPermissions=[])
+    except client.exceptions.ClientError:
+        pass
+    describe_groups(client)
+
+    assert endpoint.sent == ['DescribeSecurityGroups', 'AuthorizeSecurityGroupIngress']
+    assert cache.stats['invalidated'] == 0
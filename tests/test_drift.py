@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import drift
+from lab_layout import APP_INGRESS_RULES, DB_INGRESS_RULES, ROUTE_TABLE_LAYOUT
+
+
+def tagged(name: str) -> list[dict]:
+    return [{'Key': 'Name', 'Value': name}]
+
+
+class FakeLab:
+    """Describes one lab built exactly as main.py lays it out"""
+
+    def __init__(self):
+        self.subnets = [
+            {'SubnetId': f'subnet-{key}', 'Tags': tagged(f"polystudentlab-{key.replace('_', '-')}")}
+            for layout in ROUTE_TABLE_LAYOUT.values() for key in layout['subnets']
+        ]
+        self.security_groups = {
+            'sg-app': {'GroupId': 'sg-app', 'GroupName': 'app', 'VpcId': 'vpc-1', 'Tags': tagged('polystudentlab-app-sg'),
+                       'IpPermissions': [{'IpProtocol': 'tcp', 'FromPort': r['FromPort'], 'ToPort': r['ToPort'],
+                                          'IpRanges': [{'CidrIp': r['CidrIp']}]} for r in APP_INGRESS_RULES]},
+            'sg-db': {'GroupId': 'sg-db', 'GroupName': 'db', 'VpcId': 'vpc-1', 'Tags': tagged('polystudentlab-db-sg'),
+                      'IpPermissions': [{'IpProtocol': 'tcp', 'FromPort': r['FromPort'], 'ToPort': r['ToPort'],
+                                         'UserIdGroupPairs': [{'GroupId': 'sg-app'}]} for r in DB_INGRESS_RULES]},
+        }
+        self.route_tables = {
+            f'rtb-{key}': {
+                'RouteTableId': f'rtb-{key}', 'VpcId': 'vpc-1', 'Tags': tagged(layout['name']),
+                'Routes': [{'DestinationCidrBlock': '10.0.0.0/16', 'GatewayId': 'local'}]
+                + ([{'DestinationCidrBlock': '0.0.0.0/0', 'GatewayId': 'igw-1'}] if layout['internet'] else []),
+                'Associations': [{'SubnetId': f'subnet-{subnet}'} for subnet in layout['subnets']],
+            }
+            for key, layout in ROUTE_TABLE_LAYOUT.items()
+        }
+
+    def get_paginator(self, operation: str):
+        pages = {
+            'describe_security_groups': lambda: {'SecurityGroups': list(self.security_groups.values())},
+            'describe_route_tables': lambda: {'RouteTables': list(self.route_tables.values())},
+        }
+        return SimpleNamespace(paginate=lambda Filters: [pages[operation]()])
+
+    def describe_subnets(self, Filters: list):
+        return {'Subnets': self.subnets}
+
+    def describe_internet_gateways(self, Filters: list):
+        return {'InternetGateways': [{'InternetGatewayId': 'igw-1'}]}
+
+
+def monitor(lab: FakeLab) -> drift.DriftMonitor:
+    return drift.DriftMonitor('vpc-1', lab, on_event=lambda event: None)
+
+
+def test_lab_matching_the_layout_has_no_drift():
+    lab = FakeLab()
+    drift_monitor = monitor(lab)
+
+    assert drift_monitor.check() == []
+    assert drift_monitor.check() == []
+    # One describe per resource type and cycle
+    assert drift_monitor.api_calls == 8
+
+
+def test_changes_are_reported_once_then_resolved():
+    lab = FakeLab()
+    drift_monitor = monitor(lab)
+    drift_monitor.check()
+
+    lab.security_groups['sg-app']['IpPermissions'].append(
+        {'IpProtocol': 'tcp', 'FromPort': 3389, 'ToPort': 3389, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]})
+    lab.route_tables['rtb-private']['Associations'].pop()
+    events = drift_monitor.check()
+    assert {(event['event'], event['resource_id']) for event in events} == {('drift', 'sg-app'), ('drift', 'rtb-private')}
+    details = {event['resource_id']: event['details'] for event in events}
+    assert details['sg-app'] == {'extra_ingress': [('tcp', 3389, 3389, '0.0.0.0/0')]}
+    assert details['rtb-private']['subnets']['actual'] == ['subnet-private_az1']
+
+    # Unchanged digests are not compared again
+    assert drift_monitor.check() == []
+
+    lab.security_groups['sg-app']['IpPermissions'].pop()
+    assert [(event['event'], event['resource_id']) for event in drift_monitor.check()] == [('resolved', 'sg-app')]
+
+
+def test_deleted_resources_are_reported_missing_once():
+    lab = FakeLab()
+    drift_monitor = monitor(lab)
+    drift_monitor.check()
+
+    del lab.route_tables['rtb-public']
+    events = drift_monitor.check()
+    assert [(event['event'], event['name']) for event in events] == [('missing', 'polystudentlab-public-rt')]
+    assert drift_monitor.check() == []
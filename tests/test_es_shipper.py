@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from conftest import bulk_items, bulk_ok
+from es_shipper import BulkShipper
+
+
+def shipper(url: str, **kwargs) -> BulkShipper:
+    return BulkShipper(url, max_in_flight=1, backoff=0, timeout=5, **kwargs)
+
+
+def documents(count: int) -> list[dict]:
+    return [{'id': f'doc-{i}', 'value': i} for i in range(count)]
+
+
+def test_429_items_are_retried_alone(es_server):
+    def partial(method, path, body):
+        statuses = [429 if i % 3 == 0 else 201 for i in range(len(bulk_items(body)))]
+        return 200, {'errors': True, 'items': [{'index': {'status': status}} for status in statuses]}
+    es_server.responses.append(partial)
+
+    with shipper(es_server.url) as bulk:
+        stats = bulk.ship('alerts', documents(9), 'id')
+
+    assert stats['sent'] == 9
+    assert stats['failed'] == 0
+    assert stats['retried'] == 3
+    first, retry = es_server.bulk_requests()
+    assert len(first) == 9
+    assert [action['index']['_id'] for action, _ in retry] == ['doc-0', 'doc-3', 'doc-6']
+
+
+def test_non_json_response_is_retried(es_server):
+    es_server.responses.append(lambda method, path, body: (200, b'<html>gateway</html>'))
+
+    with shipper(es_server.url) as bulk:
+        stats = bulk.ship('alerts', documents(5), 'id')
+
+    assert stats['sent'] == 5
+    assert stats['retried'] == 5
+    assert len(es_server.bulk_requests()) == 2
+
+
+def test_truncated_response_is_retried(es_server):
+    def truncated(method, path, body):
+        data = json.dumps(bulk_ok(body)).encode()
+        return 200, data[:20], len(data)
+    es_server.responses.append(truncated)
+
+    with shipper(es_server.url) as bulk:
+        stats = bulk.ship('alerts', documents(5), 'id')
+
+    assert stats['sent'] == 5
+    assert len(es_server.bulk_requests()) == 2
+
+
+def test_items_missing_from_response_count_as_failed(es_server):
+    es_server.responses.append(lambda method, path, body: (200, {'errors': False, 'items': bulk_ok(body)['items'][:3]}))
+
+    with shipper(es_server.url) as bulk:
+        stats = bulk.ship('alerts', documents(5), 'id')
+
+    assert stats['sent'] == 3
+    assert stats['failed'] == 2
+
+
+def test_unreadable_responses_give_up_after_retries(es_server):
+    es_server.responses.extend([lambda method, path, body: (200, b'not json')] * 3)
+
+    with shipper(es_server.url, max_retries=2) as bulk:
+        stats = bulk.ship('alerts', documents(4), 'id')
+
+    assert stats['sent'] == 0
+    assert stats['failed'] == 4
+
+
+def test_sender_errors_are_raised_by_wait(es_server):
+    bulk = shipper(es_server.url, max_docs=2)
+
+    def broken(payload):
+        raise RuntimeError('sender crashed')
+    bulk._post = broken
+
+    for document in documents(6):
+        bulk.index('alerts', document)
+    with pytest.raises(RuntimeError, match='sender crashed'):
+        bulk.close()
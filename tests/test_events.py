@@ -0,0 +1,71 @@
+import io
+import sys
+
+import pytest
+
+from events import EventBus, JsonLinesSink, TTYSink
+
+
+class ListSink:
+    def __init__(self):
+        self.events = []
+        self.flushes = 0
+
+    def write(self, event: dict):
+        self.events.append(event)
+
+    def flush(self):
+        self.flushes += 1
+
+    def close(self):
+        pass
+
+
+def test_flush_waits_for_every_queued_event():
+    sink = ListSink()
+    bus = EventBus([sink], {'run_id': 'run-1'})
+    for index in range(100):
+        bus.log(f'message {index}')
+    bus.flush()
+
+    assert [event['detail'] for event in sink.events] == [f'message {index}' for index in range(100)]
+    assert all(event['run_id'] == 'run-1' for event in sink.events)
+    assert sink.flushes == 1
+
+
+def test_timed_step_error_is_reported_once():
+    sink = ListSink()
+    bus = EventBus([sink])
+    with pytest.raises(RuntimeError) as raised:
+        with bus.timed('create', 'subnet', name='public'):
+            raise RuntimeError('quota exceeded')
+    bus.error('error creating subnet', raised.value)
+    bus.error('error creating route table', RuntimeError('not found'))
+    bus.flush()
+
+    assert [(event['action'], event['outcome']) for event in sink.events] == [('create', 'error'), ('log', 'error')]
+    assert sink.events[1]['detail'] == 'error creating route table: not found'
+
+
+def test_tty_sink_writes_to_the_current_stdout(monkeypatch):
+    sink = TTYSink(live=False)
+    captured = io.StringIO()
+    monkeypatch.setattr(sys, 'stdout', captured)
+    bus = EventBus([sink])
+    bus.log('after the swap')
+    bus.flush()
+
+    assert captured.getvalue() == '- after the swap\n'
+
+
+def test_close_survives_closed_streams(monkeypatch, tmp_path):
+    stream = io.StringIO()
+    monkeypatch.setattr(sys, 'stdout', stream)
+    jsonl = JsonLinesSink(str(tmp_path / 'events.jsonl'))
+    bus = EventBus([TTYSink(live=True), jsonl])
+    bus.emit('create', 'subnet', 'subnet-1')
+    bus.flush()
+    stream.close()
+    jsonl.file.close()
+
+    bus.close()
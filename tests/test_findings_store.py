@@ -0,0 +1,106 @@
+import json
+
+import findings_store as fs
+from es_shipper import BulkShipper
+
+HOUR = 1700000000 - 1700000000 % 3600
+
+
+def store(url: str) -> fs.FindingsStore:
+    return fs.FindingsStore(url, BulkShipper(url, max_in_flight=1, backoff=0, timeout=5))
+
+
+def alert(alert_id: str | None, offset: int = 0, host: str = 'web-1', rule_id: str = '5710', level: int = 10) -> dict:
+    return {'id': alert_id, 'timestamp': HOUR + offset, 'host': host, 'rule_id': rule_id, 'level': level, 'description': 'sshd: bad user'}
+
+
+def updates(es_server, index: str) -> dict:
+    return {
+        action['update']['_id']: body
+        for batch in es_server.bulk_requests() for action, body in batch
+        if 'update' in action and action['update']['_index'] == index
+    }
+
+
+def test_alert_rollup_upsert_counts_each_alert_once(es_server):
+    with store(es_server.url) as findings:
+        findings.add_alert(alert('1700000000.100', 10))
+        findings.add_alert(alert('1700000000.200', 20))
+        findings.add_alert(alert('1700000000.100', 10))
+        findings.add_alert(alert(None, 30))
+
+    raw = [action['index'] for batch in es_server.bulk_requests() for action, _ in batch if 'index' in action]
+    assert [action['_index'] for action in raw] == ['ossec-alerts-2023.11.14'] * 4
+    assert [action.get('_id') for action in raw] == ['1700000000.100', '1700000000.200', '1700000000.100', None]
+
+    rollups = updates(es_server, fs.ALERTS_ROLLUP_INDEX)
+    body = rollups[f'{HOUR}|web-1|5710|high']
+    assert body['script']['source'] == fs.ALERT_ROLLUP_SCRIPT
+    assert body['script']['params'] == {'alert_ids': ['1700000000.100', '1700000000.200'], 'unnamed': 1, 'last_seen': HOUR + 30}
+    assert body['upsert'] == {
+        'hour': HOUR, 'host': 'web-1', 'rule_id': '5710', 'severity': 'high', 'level': 10, 'description': 'sshd: bad user',
+        'count': 3, 'alert_ids': ['1700000000.100', '1700000000.200'], 'last_seen': HOUR + 30,
+    }
+
+
+def test_alert_rollups_are_split_by_hour_host_rule_and_severity(es_server):
+    with store(es_server.url) as findings:
+        findings.add_alert(alert('a', 10))
+        findings.add_alert(alert('b', 3600))
+        findings.add_alert(alert('c', 10, host='db-1'))
+        findings.add_alert(alert('d', 10, level=3))
+
+    assert set(updates(es_server, fs.ALERTS_ROLLUP_INDEX)) == {
+        f'{HOUR}|web-1|5710|high', f'{HOUR + 3600}|web-1|5710|high', f'{HOUR}|db-1|5710|high', f'{HOUR}|web-1|5710|low',
+    }
+
+
+def test_cve_rollup_upsert_lists_distinct_cves(es_server):
+    report = {'ArtifactName': 'nginx:1.25', 'Results': [
+        {'Target': 'debian', 'Vulnerabilities': [
+            {'VulnerabilityID': 'CVE-2024-2', 'PkgName': 'openssl', 'Severity': 'HIGH'},
+            {'VulnerabilityID': 'CVE-2024-1', 'PkgName': 'libssl3', 'Severity': 'HIGH'},
+            {'VulnerabilityID': 'CVE-2024-2', 'PkgName': 'libssl3', 'Severity': 'HIGH'},
+            {'VulnerabilityID': 'CVE-2024-9', 'PkgName': 'zlib', 'Severity': 'LOW'},
+        ]},
+    ]}
+    with store(es_server.url) as findings:
+        for finding in fs.trivy_findings(report):
+            findings.add_cve(finding)
+
+    rollups = updates(es_server, fs.CVES_ROLLUP_INDEX)
+    assert sorted(rollups) == ['nginx:1.25|high', 'nginx:1.25|low']
+    body = rollups['nginx:1.25|high']
+    assert body['script']['source'] == fs.CVE_ROLLUP_SCRIPT
+    assert body['script']['params']['cve_ids'] == ['CVE-2024-1', 'CVE-2024-2']
+    assert body['upsert']['count'] == 2
+    assert body['upsert']['cve_ids'] == ['CVE-2024-1', 'CVE-2024-2']
+
+
+def test_alert_summary_parses_term_buckets(es_server):
+    es_server.responses.append(lambda method, path, body: (200, {'aggregations': {'groups': {'buckets': [
+        {'key': 'web-1', 'doc_count': 4, 'alerts': {'value': 120.0}},
+        {'key': 'db-1', 'doc_count': 1, 'alerts': {'value': 7.0}},
+    ]}}}))
+
+    summary = store(es_server.url).alert_summary(hours=6, by='rule_id', size=5)
+
+    assert summary == [('web-1', 120), ('db-1', 7)]
+    method, path, body = es_server.requests[-1]
+    assert (method, path) == ('POST', f'/{fs.ALERTS_ROLLUP_INDEX}/_search')
+    query = json.loads(body)
+    assert query['aggs']['groups']['terms'] == {'field': 'rule_id', 'size': 5, 'order': {'alerts': 'desc'}}
+    assert query['query']['range']['hour']['gte'] % 3600 == 0
+
+
+def test_cve_summary_groups_hits_by_image(es_server):
+    es_server.responses.append(lambda method, path, body: (200, {'hits': {'hits': [
+        {'_source': {'image': 'nginx:1.25', 'severity': 'high', 'count': 2}},
+        {'_source': {'image': 'nginx:1.25', 'severity': 'low', 'count': 1}},
+        {'_source': {'image': 'redis:7', 'severity': 'critical', 'count': 3}},
+    ]}}))
+
+    summary = store(es_server.url).cve_summary()
+
+    assert summary == {'nginx:1.25': {'high': 2, 'low': 1}, 'redis:7': {'critical': 3}}
+    assert es_server.requests[-1][1] == f'/{fs.CVES_ROLLUP_INDEX}/_search'
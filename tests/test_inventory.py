@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import inventory as inv
+
+PAGES = {
+    'describe_vpcs': {'Vpcs': [{'VpcId': 'vpc-1', 'CidrBlock': '10.0.0.0/16', 'Tags': [{'Key': 'Name', 'Value': 'lab'}]}]},
+    'describe_subnets': {'Subnets': [{
+        'SubnetId': 'subnet-1', 'VpcId': 'vpc-1', 'CidrBlock': '10.0.1.0/24', 'AvailabilityZone': 'us-east-1a',
+        'MapPublicIpOnLaunch': True, 'Tags': [{'Key': 'Name', 'Value': 'public-1a'}],
+    }]},
+    'describe_security_groups': {'SecurityGroups': [{
+        'GroupId': 'sg-1', 'GroupName': 'app', 'VpcId': 'vpc-1', 'IpPermissionsEgress': [],
+        'IpPermissions': [{'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}],
+    }]},
+}
+
+
+class FakeClient:
+    meta = SimpleNamespace(region_name='us-east-1')
+
+    def get_paginator(self, operation: str):
+        return SimpleNamespace(paginate=lambda Filters: [PAGES[operation]])
+
+
+def test_snapshot_round_trip_keeps_records_and_indexes(tmp_path):
+    path = str(tmp_path / 'snapshot.db')
+    snapshot = inv.collect('vpc-1', FakeClient(), ['vpc', 'subnet', 'security-group'])
+    inv.save(snapshot, path)
+    loaded = inv.load(path)
+
+    assert loaded.meta == snapshot.meta
+    assert sorted(resource.resource_id for resource in loaded) == ['sg-1', 'subnet-1', 'vpc-1']
+    for resource in snapshot:
+        copy = loaded.get(resource.resource_id)
+        assert (copy.resource_type, copy.vpc_id, copy.name, copy.tags, copy.data, copy.digest) == (
+            resource.resource_type, resource.vpc_id, resource.name, resource.tags, resource.data, resource.digest)
+    assert [resource.resource_id for resource in loaded.by_tag('Name', 'public-1a')] == ['subnet-1']
+    assert inv.diff(snapshot, loaded) == {'added': [], 'removed': [], 'changed': []}
+
+
+def test_diff_reports_changed_digests(tmp_path):
+    path = str(tmp_path / 'snapshot.db')
+    inv.save(inv.collect('vpc-1', FakeClient(), ['subnet', 'security-group']), path)
+    old = inv.load(path)
+
+    new = inv.Inventory()
+    new.add(inv.from_subnet({**PAGES['describe_subnets']['Subnets'][0], 'MapPublicIpOnLaunch': False}))
+    new.add(inv.from_vpc(PAGES['describe_vpcs']['Vpcs'][0]))
+
+    assert inv.diff(old, new) == {'added': ['vpc-1'], 'removed': ['sg-1'], 'changed': ['subnet-1']}
@@ -0,0 +1,48 @@
+import os
+
+import ossec_parser
+
+
+def alert(alert_id: int) -> bytes:
+    return (
+        f'** Alert 1714557600.{alert_id}: - syslog,sshd,authentication_failed,\n'
+        f'2024 May 01 10:00:00 (lab01) 10.0.1.10->/var/log/auth.log\n'
+        f"Rule: 5716 (level 5) -> 'SSHD authentication failed.'\n"
+        f'Src IP: 203.0.113.{alert_id}\n'
+        f'Failed password for root from 203.0.113.{alert_id} port 22 ssh2\n\n'
+    ).encode()
+
+
+def ids(path, state_path) -> list[str]:
+    return [record['id'] for record in ossec_parser.read_alerts(str(path), str(state_path))]
+
+
+def test_reading_resumes_after_the_saved_offset(tmp_path):
+    log, state = tmp_path / 'alerts.log', tmp_path / 'offset.json'
+    log.write_bytes(alert(1) + alert(2))
+    assert ids(log, state) == ['1714557600.1', '1714557600.2']
+
+    # The third alert is not complete until its trailing blank line is written
+    with open(log, 'ab') as f:
+        f.write(alert(3)[:-1])
+    assert ids(log, state) == []
+    with open(log, 'ab') as f:
+        f.write(b'\n')
+    assert ids(log, state) == ['1714557600.3']
+    assert ossec_parser.load_state(str(state))['offset'] == log.stat().st_size
+
+
+def test_rotated_or_truncated_logs_are_read_from_the_start(tmp_path):
+    log, state = tmp_path / 'alerts.log', tmp_path / 'offset.json'
+    log.write_bytes(alert(1) + alert(2))
+    assert len(ids(log, state)) == 2
+
+    # logrotate moves the file aside and OSSEC opens a new one under the same name
+    os.rename(log, tmp_path / 'alerts.log.1')
+    log.write_bytes(alert(3) + alert(4) + alert(5))
+    assert ids(log, state) == ['1714557600.3', '1714557600.4', '1714557600.5']
+    assert ossec_parser.load_state(str(state))['inode'] == log.stat().st_ino
+
+    # copytruncate keeps the inode but leaves the file shorter than the saved offset
+    log.write_bytes(alert(6))
+    assert ids(log, state) == ['1714557600.6']
@@ -0,0 +1,74 @@
+import json
+
+import boto3
+from botocore.awsrequest import AWSResponse
+from botocore.stub import Stubber
+
+import planner
+from describe_cache import DescribeCache
+
+DESCRIBE_VPCS_XML = (
+    b'<DescribeVpcsResponse xmlns="http://ec2.amazonaws.com/doc/2016-11-15/">'
+    b'<vpcSet><item><vpcId>vpc-1</vpcId></item></vpcSet></DescribeVpcsResponse>'
+)
+RUNNING = {'Reservations': [{'Instances': [{'InstanceId': 'i-1', 'State': {'Name': 'running'}}]}]}
+
+
+class RawBody:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+def recorded(path) -> list[str]:
+    return [json.loads(line)['operation'] for line in path.read_text().splitlines()]
+
+
+def test_recorder_learns_waiters_and_keeps_dry_runs_apart(tmp_path):
+    path = tmp_path / 'latencies.jsonl'
+    client = boto3.client('ec2', region_name='us-east-1', aws_access_key_id='test', aws_secret_access_key='test')
+    planner.LatencyRecorder(str(path)).install(client)
+
+    with Stubber(client) as stub:
+        stub.add_response('describe_vpcs', {'Vpcs': []}, {'DryRun': True})
+        stub.add_response('describe_vpcs', {'Vpcs': []}, {})
+        stub.add_response('describe_instances', RUNNING, {'InstanceIds': ['i-1']})
+        client.describe_vpcs(DryRun=True)
+        client.describe_vpcs()
+        client.get_waiter('instance_running').wait(InstanceIds=['i-1'])
+
+    assert recorded(path) == ['DryRun:DescribeVpcs', 'DescribeVpcs', 'DescribeInstances', 'wait:instance_running']
+    assert 'wait:instance_running' in planner.load_latencies(str(path))
+
+
+def test_plan_covers_preflight_profile_check_and_placement_groups():
+    actions = [op.action for op in planner.build_plan(app_profile='standard', db_profile='dev').operations]
+    assert actions[0] == 'preflight'
+    assert actions.count('DescribeInstanceTypes') == 1
+    # standard spreads the app servers, dev places the DB servers anywhere
+    assert actions.count('CreatePlacementGroup') == 1
+
+    actions = [op.action for op in planner.build_plan(app_profile='dev', db_profile='dev', preflight=False).operations]
+    assert 'preflight' not in actions and 'CreatePlacementGroup' not in actions
+
+
+def test_recorder_skips_describe_cache_hits(tmp_path):
+    path = tmp_path / 'latencies.jsonl'
+    client = boto3.client('ec2', region_name='us-east-1', aws_access_key_id='test', aws_secret_access_key='test')
+    DescribeCache().install(client)
+    planner.LatencyRecorder(str(path)).install(client)
+    sent = []
+
+    def send(request, **kwargs):
+        # Answers on the wire, below the cache's before-call hook
+        sent.append(request)
+        return AWSResponse(request.url, 200, {}, RawBody(DESCRIBE_VPCS_XML))
+
+    client.meta.events.register('before-send.ec2', send)
+    client.describe_vpcs()
+    client.describe_vpcs()
+
+    assert len(sent) == 1
+    assert recorded(path) == ['DescribeVpcs']
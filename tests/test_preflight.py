@@ -0,0 +1,73 @@
+from botocore.exceptions import ClientError
+
+import preflight
+from lab_layout import PERFORMANCE_PROFILES
+
+PLAN = {
+    'vpc_id': 'vpc-1', 'key_name': 'polystudent-keypair', 'amis': ['ami-1'], 'instance_types': ['t2.micro'],
+    'launches': [('ami-1', PERFORMANCE_PROFILES['dev']['app'])], 'placements': ['spread'],
+    'zones': ['us-east-1a'], 'iam_profile': 'LabInstanceProfile', 'cidr': '10.0.0.0/24',
+}
+
+
+class FakeEC2:
+    """Describes one stand-in of each kind and answers every DryRun with the configured error code"""
+
+    def __init__(self, stand_ins: bool = True, codes: dict | None = None):
+        self.stand_ins = stand_ins
+        self.codes = codes or {}
+        self.calls = {}
+
+    def describe_subnets(self, **kwargs):
+        return {'Subnets': [{'SubnetId': 'subnet-1'}] if self.stand_ins else []}
+
+    def describe_security_groups(self, **kwargs):
+        return {'SecurityGroups': [{'GroupId': 'sg-default'}]}
+
+    def describe_route_tables(self, **kwargs):
+        return {'RouteTables': [{'RouteTableId': 'rtb-main'}]}
+
+    def describe_internet_gateways(self, **kwargs):
+        return {'InternetGateways': [{'InternetGatewayId': 'igw-1'}] if self.stand_ins else []}
+
+    def describe_key_pairs(self, **kwargs):
+        return {'KeyPairs': []}
+
+    def __getattr__(self, method: str):
+        def call(**kwargs):
+            self.calls[method] = kwargs
+            operation = ''.join(part.title() for part in method.split('_'))
+            raise ClientError({'Error': {'Code': self.codes.get(operation, 'DryRunOperation'), 'Message': ''}}, operation)
+        return call
+
+
+def test_calls_on_created_resources_are_dry_run_against_stand_ins():
+    ec2 = FakeEC2()
+    checks = preflight.build_checks(ec2, None, PLAN)
+    results = {name: checks[name]() for name in ('AuthorizeSecurityGroupIngress', 'CreateRoute', 'AssociateRouteTable')}
+
+    assert all(result == (True, 'allowed') for result in results.values())
+    assert ec2.calls['authorize_security_group_ingress']['GroupId'] == 'sg-default'
+    assert ec2.calls['create_route']['GatewayId'] == 'igw-1'
+    assert ec2.calls['associate_route_table'] == {'DryRun': True, 'RouteTableId': 'rtb-main', 'SubnetId': 'subnet-1'}
+    assert 'CreatePlacementGroup spread' in checks
+
+
+def test_only_permission_errors_fail_stand_in_checks():
+    ec2 = FakeEC2(codes={'CreateRoute': 'UnauthorizedOperation', 'AssociateRouteTable': 'Resource.AlreadyAssociated'})
+    checks = preflight.build_checks(ec2, None, PLAN)
+
+    assert checks['CreateRoute']() == (False, 'missing permission (UnauthorizedOperation)')
+    ok, reason = checks['AssociateRouteTable']()
+    assert ok is None and reason.startswith('not verified: Resource.AlreadyAssociated')
+
+
+def test_missing_stand_ins_are_reported_not_failed():
+    ec2 = FakeEC2(stand_ins=False)
+    checks = preflight.build_checks(ec2, None, PLAN)
+
+    assert checks['CreateRoute']() == (None, 'not verified: no existing GatewayId in the VPC to check against')
+    assert checks['AssociateRouteTable']() == (None, 'not verified: no existing SubnetId in the VPC to check against')
+    ok, reason = checks['RunInstances t2.micro ami-1']()
+    assert ok and reason == 'allowed (without SubnetId, SecurityGroupIds, KeyName)'
+    assert 'create_route' not in ec2.calls
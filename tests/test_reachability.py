@@ -0,0 +1,110 @@
+import inventory as inv
+import reachability as rb
+
+VPC_ID = 'vpc-1'
+APP_SUBNET = 'subnet-app'
+DB_SUBNET = 'subnet-db'
+ALLOW_ALL = [{'IpProtocol': '-1', 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}]
+
+
+def instance(instance_id: str, subnet_id: str, ip: str, group_id: str, public_ip: str | None = None) -> dict:
+    return {
+        'InstanceId': instance_id, 'VpcId': VPC_ID, 'SubnetId': subnet_id, 'PrivateIpAddress': ip, 'PublicIpAddress': public_ip,
+        'State': {'Name': 'running'}, 'SecurityGroups': [{'GroupId': group_id}], 'Tags': [{'Key': 'Name', 'Value': instance_id}],
+    }
+
+
+def acl_entry(number: int, egress: bool, action: str, cidr: str) -> dict:
+    return {'RuleNumber': number, 'Egress': egress, 'Protocol': '-1', 'RuleAction': action, 'CidrBlock': cidr}
+
+
+def lab(app_egress: list, app_acl_entries: list | None = None, app_ingress: list | None = None) -> rb.ReachabilityGraph:
+    """One public app instance and two DB instances sharing a subnet and a security group open to the app on tcp/1433"""
+    inventory = inv.Inventory()
+    inventory.add(inv.from_internet_gateway({'InternetGatewayId': 'igw-1', 'Attachments': [{'VpcId': VPC_ID}]}))
+    inventory.add(inv.from_route_table({
+        'RouteTableId': 'rtb-public', 'VpcId': VPC_ID, 'Associations': [{'SubnetId': APP_SUBNET}],
+        'Routes': [{'DestinationCidrBlock': '0.0.0.0/0', 'GatewayId': 'igw-1'}],
+    }))
+    inventory.add(inv.from_subnet({'SubnetId': APP_SUBNET, 'VpcId': VPC_ID, 'CidrBlock': '10.0.0.0/24', 'AvailabilityZone': 'a'}))
+    inventory.add(inv.from_subnet({'SubnetId': DB_SUBNET, 'VpcId': VPC_ID, 'CidrBlock': '10.0.128.0/24', 'AvailabilityZone': 'a'}))
+    inventory.add(inv.from_security_group({
+        'GroupId': 'sg-app', 'GroupName': 'app', 'VpcId': VPC_ID, 'IpPermissions': app_ingress or [], 'IpPermissionsEgress': app_egress,
+    }))
+    inventory.add(inv.from_security_group({
+        'GroupId': 'sg-db', 'GroupName': 'db', 'VpcId': VPC_ID, 'IpPermissionsEgress': ALLOW_ALL,
+        'IpPermissions': [{'IpProtocol': 'tcp', 'FromPort': 1433, 'ToPort': 1433, 'UserIdGroupPairs': [{'GroupId': 'sg-app'}]}],
+    }))
+    if app_acl_entries is not None:
+        inventory.add(inv.from_network_acl({
+            'NetworkAclId': 'acl-app', 'VpcId': VPC_ID, 'Entries': app_acl_entries, 'Associations': [{'SubnetId': APP_SUBNET}],
+        }))
+    inventory.add(inv.from_instance(instance('i-app', APP_SUBNET, '10.0.0.10', 'sg-app', '203.0.113.10')))
+    inventory.add(inv.from_instance(instance('i-db1', DB_SUBNET, '10.0.128.5', 'sg-db')))
+    inventory.add(inv.from_instance(instance('i-db2', DB_SUBNET, '10.0.128.6', 'sg-db')))
+    return rb.ReachabilityGraph(inventory)
+
+
+def open_pairs(graph: rb.ReachabilityGraph) -> dict:
+    return {(source, destination): rb.format_ports(ports) for source, destination, ports in graph.all_pairs().pairs()}
+
+
+def test_nacl_deny_of_one_destination_address_blocks_it():
+    graph = lab(ALLOW_ALL, [
+        acl_entry(100, True, 'deny', '10.0.128.5/32'),
+        acl_entry(200, True, 'allow', '0.0.0.0/0'),
+        acl_entry(100, False, 'allow', '0.0.0.0/0'),
+    ])
+
+    assert rb.format_ports(graph.query('i-app', 'i-db1')) == 'none'
+    assert rb.format_ports(graph.query('i-app', 'i-db2')) == 'tcp/1433'
+    pairs = open_pairs(graph)
+    assert ('i-app', 'i-db1') not in pairs
+    assert pairs[('i-app', 'i-db2')] == 'tcp/1433'
+
+
+def test_egress_rule_to_one_destination_address_allows_it():
+    graph = lab([{'IpProtocol': 'tcp', 'FromPort': 1433, 'ToPort': 1433, 'IpRanges': [{'CidrIp': '10.0.128.5/32'}]}])
+
+    assert rb.format_ports(graph.query('i-app', 'i-db1')) == 'tcp/1433'
+    assert rb.format_ports(graph.query('i-app', 'i-db2')) == 'none'
+    pairs = open_pairs(graph)
+    assert pairs[('i-app', 'i-db1')] == 'tcp/1433'
+    assert ('i-app', 'i-db2') not in pairs
+
+
+def test_subnet_wide_rules_keep_instances_interchangeable():
+    graph = lab(ALLOW_ALL)
+
+    assert graph.split_subnets == set()
+    assert open_pairs(graph) == {('i-app', 'i-db1'): 'tcp/1433', ('i-app', 'i-db2'): 'tcp/1433'}
+
+
+def test_nacl_deny_of_one_public_address_leaves_the_internet_open():
+    ssh_from_anywhere = [{'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}]
+    graph = lab(ALLOW_ALL, [
+        acl_entry(90, False, 'deny', '198.51.100.7/32'),
+        acl_entry(100, False, 'allow', '0.0.0.0/0'),
+        acl_entry(100, True, 'allow', '0.0.0.0/0'),
+    ], ssh_from_anywhere)
+
+    assert rb.format_ports(graph.query(rb.INTERNET, 'i-app')) == 'tcp/22'
+    assert open_pairs(graph)[(rb.INTERNET, 'i-app')] == 'tcp/22'
+
+
+def test_security_group_rule_for_one_public_address_counts_as_internet_access():
+    ssh_from_office = [{'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'IpRanges': [{'CidrIp': '198.51.100.7/32'}]}]
+    graph = lab(ALLOW_ALL, app_ingress=ssh_from_office)
+
+    assert rb.format_ports(graph.query(rb.INTERNET, 'i-app')) == 'tcp/22'
+
+
+def test_nacl_deny_of_the_whole_internet_blocks_it():
+    ssh_from_anywhere = [{'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}]
+    graph = lab(ALLOW_ALL, [
+        acl_entry(90, False, 'deny', '0.0.0.0/0'),
+        acl_entry(100, False, 'allow', '198.51.100.0/24'),
+        acl_entry(100, True, 'allow', '0.0.0.0/0'),
+    ], ssh_from_anywhere)
+
+    assert rb.format_ports(graph.query(rb.INTERNET, 'i-app')) == 'none'